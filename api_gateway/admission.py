@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, status
+
+from metrics import ADMISSION_REJECTIONS, QUEUE_DEPTH
+from shared.rate_limit import TokenBucketLimiter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _env_limit(name: str, queue_name: str, default: int) -> int:
+    """Lê o limite da fila (ex.: ADMISSION_HARD_LIMIT_QUEUE_EMAIL) ou o padrão global"""
+    return int(os.getenv(f"{name}_{queue_name.upper()}", os.getenv(name, default)))
+
+
+class QueueDepthMonitor:
+    """Mantém em cache a profundidade das filas, atualizada em background
+
+    Consulta ``client.queue_depths`` (``queue_declare`` passivo no RabbitMQ) a cada
+    ``interval`` segundos, então checar a profundidade por requisição não custa nada.
+    Também considera o broker "bloqueado" quando há lotes aguardando confirm
+    há mais de ``stall_timeout`` segundos (alarme de memória/disco do RabbitMQ).
+    Uma fila lógica particionada (``members``) tem como profundidade a soma dos shards.
+    """
+
+    def __init__(self, client, queues, interval=1.0, stall_timeout=5.0, members=None):
+        self.client = client
+        self.queues = list(queues)
+        self.members = members or {}
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.depths: Dict[str, int] = {}
+        self.drain_rates: Dict[str, float] = {}
+        self.updated_at = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                if self.client.connected:
+                    await self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao atualizar profundidade das filas: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self):
+        now = time.monotonic()
+        members = {queue_name: self.members.get(queue_name, (queue_name,)) for queue_name in self.queues}
+        counts = await self.client.queue_depths([member for names in members.values() for member in names])
+        for queue_name, names in members.items():
+            depth = sum(counts[member] for member in names)
+            previous = self.depths.get(queue_name)
+            if previous is not None and self.updated_at is not None:
+                # Taxa de escoamento observada (mensagens/s), usada para estimar o Retry-After
+                self.drain_rates[queue_name] = max(0.0, (previous - depth) / (now - self.updated_at))
+            self.depths[queue_name] = depth
+            QUEUE_DEPTH.labels(queue_name).set(depth)
+        self.updated_at = now
+
+    @property
+    def blocked(self) -> bool:
+        return self.client.oldest_pending_age() > self.stall_timeout
+
+
+class AdmissionController:
+    """Controle de admissão do API Gateway (responde 429 + Retry-After)
+
+    - Acima do limite *soft* de profundidade, rejeita uma fração crescente das
+      requisições (0% no soft, 100% no hard), em vez de cair de uma vez;
+    - Com o broker bloqueado, rejeita tudo até os confirms voltarem;
+    - Com ``client_rate`` > 0, aplica um token bucket por cliente;
+    - Enquanto ``ready()`` for falso (broker ainda conectando, worker encerrando),
+      responde 503 + Retry-After sem esperar pelo broker.
+    """
+
+    def __init__(self, monitor: QueueDepthMonitor, client_rate=0.0, client_burst=0.0, retry_after=5, max_retry_after=60,
+                 ready=None):
+        self.monitor = monitor
+        self.ready = ready
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self.limiter = TokenBucketLimiter(client_rate, client_burst or client_rate) if client_rate > 0 else None
+        self.limits = {
+            queue_name: (
+                _env_limit('ADMISSION_SOFT_LIMIT', queue_name, 50000),
+                _env_limit('ADMISSION_HARD_LIMIT', queue_name, 200000)
+            )
+            for queue_name in monitor.queues
+        }
+
+    @classmethod
+    def from_env(cls, client, queues, members=None, ready=None):
+        monitor = QueueDepthMonitor(
+            client,
+            queues,
+            interval=float(os.getenv('ADMISSION_REFRESH_INTERVAL', 1)),
+            stall_timeout=float(os.getenv('ADMISSION_STALL_TIMEOUT', 5)),
+            members=members
+        )
+        return cls(
+            monitor,
+            client_rate=float(os.getenv('ADMISSION_CLIENT_RATE', 0)),
+            client_burst=float(os.getenv('ADMISSION_CLIENT_BURST', 0)),
+            retry_after=int(os.getenv('ADMISSION_RETRY_AFTER', 5)),
+            ready=ready
+        )
+
+    def _queue_retry_after(self, queue_name: str, excess: int) -> int:
+        rate = self.monitor.drain_rates.get(queue_name)
+        if not rate:
+            return self.retry_after
+        return max(1, min(self.max_retry_after, math.ceil(excess / rate)))
+
+    def check(self, queue_name: str, client_id: str, depth: bool = True) -> Optional[int]:
+        """Retorna ``None`` se a requisição pode seguir, ou o Retry-After em segundos"""
+        if self.monitor.blocked:
+            ADMISSION_REJECTIONS.labels(queue_name, 'broker_blocked').inc()
+            return self.retry_after
+
+        if depth:
+            retry_after = self.check_depth(queue_name)
+            if retry_after is not None:
+                return retry_after
+
+        if self.limiter is not None:
+            wait = self.limiter.acquire(client_id)
+            if wait > 0:
+                ADMISSION_REJECTIONS.labels(queue_name, 'client_rate').inc()
+                return max(1, math.ceil(wait))
+
+        return None
+
+    def check_depth(self, queue_name: str) -> Optional[int]:
+        """Descarte gradual entre os limites soft e hard da fila; ``None`` ou o Retry-After"""
+        soft, hard = self.limits.get(queue_name, (None, None))
+        depth = self.monitor.depths.get(queue_name)
+        if depth is not None and soft is not None and depth >= soft:
+            shed_fraction = 1.0 if depth >= hard else (depth - soft) / max(1, hard - soft)
+            if random.random() < shed_fraction:
+                ADMISSION_REJECTIONS.labels(queue_name, 'queue_depth').inc()
+                return self._queue_retry_after(queue_name, depth - soft)
+        return None
+
+    @staticmethod
+    def _overloaded(queue_name: str, retry_after: int) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Queue '{queue_name}' is overloaded, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def admit(self, queue_name: str):
+        """Aplica o descarte por profundidade à fila que a mensagem vai ocupar de fato
+
+        Chamado pelo endpoint depois do roteamento: uma mensagem urgente só é
+        recusada se a fila expressa estiver cheia, não pelo backlog da fila normal.
+        """
+        retry_after = self.check_depth(queue_name)
+        if retry_after is not None:
+            raise self._overloaded(queue_name, retry_after)
+
+    def guard(self, queue_name: str, depth: bool = True):
+        """Dependência FastAPI que aplica a admissão ao endpoint da fila
+
+        Com ``depth=False`` a profundidade fica para ``admit``, depois do roteamento.
+        """
+        async def dependency(request: Request):
+            if self.ready is not None and not self.ready():
+                ADMISSION_REJECTIONS.labels(queue_name, 'not_ready').inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Gateway is not ready (broker unavailable or shutting down)",
+                    headers={"Retry-After": str(self.retry_after)}
+                )
+            client_id = request.headers.get('x-client-id') or (request.client.host if request.client else 'unknown')
+            retry_after = self.check(queue_name, client_id, depth=depth)
+            if retry_after is not None:
+                raise self._overloaded(queue_name, retry_after)
+        return dependency
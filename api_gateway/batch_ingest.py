@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Type
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Itens validados acumulados antes de cada publicação em lote
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 1000))
+# Limite de itens por requisição; o excedente é rejeitado sem validação
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 50000))
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def is_ndjson(request: Request) -> bool:
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    return content_type in NDJSON_CONTENT_TYPES
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[bytes]:
+    """Lê o corpo NDJSON de forma incremental, uma linha por item"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def _iter_lines(body: bytes) -> AsyncIterator[bytes]:
+    for line in body.split(b"\n"):
+        if line.strip():
+            yield line
+
+
+async def _iter_list(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+async def open_batch(request: Request, buffered: bool = False) -> AsyncIterator[Any]:
+    """Prepara a iteração dos itens brutos: linhas NDJSON (bytes) ou elementos de um array JSON
+
+    O array JSON é lido e validado aqui, antes da resposta começar, para que um
+    corpo inválido ainda resulte em 400. O NDJSON é lido de forma incremental,
+    exceto com ``buffered``: dentro de uma StreamingResponse o Starlette escuta
+    a desconexão do cliente no mesmo canal do corpo, então ele é lido antes.
+    """
+    if is_ndjson(request):
+        if buffered:
+            return _iter_lines(await request.body())
+        return _iter_ndjson(request)
+
+    try:
+        items = json.loads(await request.body())
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid JSON body: {e}"
+        )
+
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Batch body must be a JSON array or NDJSON"
+        )
+
+    return _iter_list(items)
+
+
+def _validate(model: Type[BaseModel], item: Any) -> BaseModel:
+    if isinstance(item, (bytes, str)):
+        return model.model_validate_json(item)
+    return model.model_validate(item)
+
+
+def _rejected(index: int, errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"index": index, "status": "rejected", "errors": errors}
+
+
+async def ingest_batch(
+    items: AsyncIterator[Any],
+    model: Type[BaseModel],
+    queue_name: str,
+    build_message: Callable[[BaseModel, int], Dict[str, Any]],
+    publisher
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Valida os itens do lote e publica os válidos em blocos
+
+    Gera, para cada bloco, a lista de resultados por item (na ordem de chegada)
+    assim que os confirms do broker daquele bloco são recebidos.
+    """
+    results = []
+    pending = []  # (posição em results, mensagem)
+
+    async def flush():
+        nonlocal results, pending
+        if pending:
+            try:
+                confirms = await publisher.publish_many(queue_name, [message for _, message in pending])
+            except Exception as e:
+                # Uma falha no bloco não interrompe o lote: os itens dele voltam como não publicados
+                logger.error(f"❌ Erro ao publicar bloco do lote: {e!r}")
+                confirms = [False] * len(pending)
+            for (position, message), confirmed in zip(pending, confirms):
+                if confirmed:
+                    results[position]["status"] = "accepted"
+                else:
+                    results[position] = _rejected(
+                        results[position]["index"],
+                        [{"type": "publish_failed", "msg": "Failed to publish message to queue"}]
+                    )
+        chunk, results, pending = results, [], []
+        return chunk
+
+    index = -1
+    async for item in items:
+        index += 1
+        if index >= BATCH_MAX_ITEMS:
+            results.append(_rejected(index, [{"type": "batch_limit", "msg": f"Batch limit of {BATCH_MAX_ITEMS} items exceeded"}]))
+        else:
+            try:
+                message = build_message(_validate(model, item), index)
+                results.append({"index": index, "status": "pending", "message_id": message["message_id"]})
+                pending.append((len(results) - 1, message))
+            except ValidationError as e:
+                results.append(_rejected(index, [
+                    {"loc": list(error["loc"]), "msg": error["msg"], "type": error["type"]}
+                    for error in e.errors()
+                ]))
+
+        if len(pending) >= BATCH_CHUNK_SIZE or len(results) >= BATCH_CHUNK_SIZE * 2:
+            yield await flush()
+
+    if results:
+        yield await flush()
+
+    logger.info(f"📦 Lote com {index + 1} itens processado para a fila '{queue_name}'")
+
+
+async def collect_batch(chunks: AsyncIterator[List[Dict[str, Any]]], queue_name: str) -> Dict[str, Any]:
+    """Consolida todos os blocos em uma única resposta JSON"""
+    results = []
+    async for chunk in chunks:
+        results.extend(chunk)
+
+    accepted = sum(1 for result in results if result["status"] == "accepted")
+    return {
+        "status": "processed",
+        "queue": queue_name,
+        "total": len(results),
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results
+    }
+
+
+async def stream_batch(chunks: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """Emite os resultados por item como NDJSON à medida que cada bloco é confirmado"""
+    async for chunk in chunks:
+        yield "".join(json.dumps(result) + "\n" for result in chunk).encode()
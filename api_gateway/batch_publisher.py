@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from typing import List, Tuple
+
+import aio_pika
+
+from metrics import BATCH_SIZE, CONFIRM_LATENCY, INFLIGHT_PUBLISHES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BatchPublisher:
+    """Agrupa publicações em micro-lotes e aguarda os confirms do broker de forma assíncrona
+
+    Cada chamada a ``publish`` recebe um future que só é resolvido quando o broker
+    confirma (ou rejeita) aquela mensagem. O lote fecha quando atinge
+    ``max_batch_size`` mensagens ou quando a janela ``max_delay`` expira.
+    """
+
+    def __init__(self, pool, max_batch_size=500, max_delay=0.002, confirm_timeout=10.0):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        # Limite de espera pelos confirms: com o broker bloqueado a requisição falha em vez de travar
+        self.confirm_timeout = confirm_timeout
+        self._queue = None
+        self._task = None
+        self._closing = False
+        self._inflight = {}  # tarefa do lote -> instante de início
+
+    def start(self):
+        """Inicia a tarefa que monta os lotes (deve ser chamado dentro do event loop)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def publish(self, exchange: str, routing_key: str, message: aio_pika.Message) -> bool:
+        """Enfileira uma mensagem e aguarda o confirm do broker ('' = exchange padrão)"""
+        results = await self.publish_many([(exchange, routing_key, message)])
+        return results[0]
+
+    async def publish_many(self, items: List[Tuple[str, str, aio_pika.Message]]) -> List[bool]:
+        """Enfileira várias mensagens ``(exchange, routing_key, mensagem)`` e aguarda o confirm de cada uma
+
+        Depois de ``close`` nada mais entra na fila: cada mensagem volta como não confirmada.
+        """
+        if self._closing:
+            logger.warning(f"⚠️ Publicador em lote encerrando: {len(items)} mensagem(ns) recusada(s)")
+            return [False] * len(items)
+        if self._task is None or self._task.done():
+            raise ConnectionError("Publicador em lote não foi iniciado")
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for exchange, routing_key, message in items:
+            future = loop.create_future()
+            self._queue.put_nowait((exchange, routing_key, message, future))
+            futures.append(future)
+
+        return list(await asyncio.gather(*futures))
+
+    async def _run(self):
+        try:
+            await self._assemble()
+        finally:
+            # Nada pode ficar esperando um lote que não será mais montado
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None and not item[3].done():
+                    item[3].set_result(False)
+
+    async def _assemble(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            closing = False
+            deadline = loop.time() + self.max_delay
+
+            while len(batch) < self.max_batch_size:
+                # Drena o que já está disponível antes de esperar pela janela
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                # None sinaliza encerramento: publica o lote atual e sai
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+
+            # O lote aguarda os confirms em paralelo enquanto o próximo é montado
+            task = asyncio.create_task(self._publish_batch(batch))
+            self._inflight[task] = loop.time()
+            task.add_done_callback(self._forget)
+
+            if closing:
+                return
+
+    def _forget(self, task):
+        self._inflight.pop(task, None)
+
+    def oldest_pending_age(self) -> float:
+        """Há quanto tempo (s) o lote mais antigo aguarda confirm; 0 se nenhum"""
+        if not self._inflight:
+            return 0.0
+        return asyncio.get_running_loop().time() - min(self._inflight.values())
+
+    async def _publish_batch(self, batch):
+        BATCH_SIZE.observe(len(batch))
+        INFLIGHT_PUBLISHES.inc(len(batch))
+        started = asyncio.get_running_loop().time()
+        try:
+            async with self.pool.acquire() as channel:
+                exchanges = {'': channel.default_exchange}
+                for name, _, _, _ in batch:
+                    if name not in exchanges:
+                        # Sem round-trip: a exchange já foi declarada na conexão
+                        exchanges[name] = await channel.get_exchange(name, ensure=False)
+                results = await asyncio.wait_for(
+                    asyncio.gather(
+                        *(
+                            exchanges[name].publish(message, routing_key=routing_key)
+                            for name, routing_key, message, _ in batch
+                        ),
+                        return_exceptions=True
+                    ),
+                    self.confirm_timeout
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            INFLIGHT_PUBLISHES.dec(len(batch))
+        CONFIRM_LATENCY.observe(asyncio.get_running_loop().time() - started)
+
+        failures = 0
+        for (_, _, _, future), result in zip(batch, results):
+            confirmed = not isinstance(result, BaseException)
+            if not confirmed:
+                failures += 1
+            if not future.done():
+                future.set_result(confirmed)
+
+        if failures:
+            logger.error(f"❌ Lote de {len(batch)} mensagens com {failures} falhas de confirmação")
+        else:
+            logger.debug(f"📦 Lote de {len(batch)} mensagens confirmado pelo broker")
+
+    async def close(self):
+        """Publica o que ainda está pendente e encerra a tarefa de montagem dos lotes"""
+        if self._task is None:
+            return
+
+        self._closing = True
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ChannelPool:
+    """Pool limitado de conexões e canais do RabbitMQ com checkout por requisição"""
+
+    def __init__(self, connection_factory, pool_connections=2, pool_channels=16, publisher_confirms=True):
+        self.connection_factory = connection_factory
+        self.pool_connections = pool_connections
+        self.pool_channels = pool_channels
+        self.publisher_confirms = publisher_confirms
+        self.connections = []
+        self._channels = None
+        self._next_connection = 0
+
+    async def open(self):
+        """Abre as conexões do pool; os canais são criados sob demanda no checkout"""
+        self.connections = [await self.connection_factory() for _ in range(self.pool_connections)]
+
+        # Cada slot começa vazio (None) e recebe um canal no primeiro checkout
+        self._channels = asyncio.Queue(maxsize=self.pool_channels)
+        for _ in range(self.pool_channels):
+            self._channels.put_nowait(None)
+
+        logger.info(
+            f"🏊 Pool RabbitMQ aberto: {self.pool_connections} conexões, até {self.pool_channels} canais"
+        )
+
+    async def _new_channel(self):
+        """Abre um canal em uma conexão saudável, distribuindo em round-robin"""
+        for _ in range(len(self.connections)):
+            index = self._next_connection % len(self.connections)
+            self._next_connection += 1
+            connection = self.connections[index]
+
+            if connection.is_closed:
+                logger.warning(f"⚠️ Conexão {index} do pool fechada, reabrindo...")
+                connection = await self.connection_factory()
+                self.connections[index] = connection
+
+            try:
+                return await connection.channel(publisher_confirms=self.publisher_confirms)
+            except Exception as e:
+                logger.error(f"❌ Falha ao abrir canal na conexão {index}: {e}")
+
+        raise ConnectionError("Nenhuma conexão do pool conseguiu abrir um canal")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Faz checkout de um canal saudável e o devolve ao pool ao final"""
+        if self._channels is None:
+            raise ConnectionError("Pool RabbitMQ não foi aberto")
+
+        channels = self._channels
+        channel = await channels.get()
+        try:
+            # Health check: canais fechados pelo broker são substituídos
+            if channel is None or channel.is_closed:
+                channel = await self._new_channel()
+        except Exception:
+            channels.put_nowait(None)
+            raise
+
+        try:
+            yield channel
+        except Exception:
+            # Após um erro o canal pode estar inconsistente; descarta e libera o slot
+            await self._discard(channel)
+            channel = None
+            raise
+        finally:
+            channels.put_nowait(channel)
+
+    async def _discard(self, channel):
+        try:
+            if not channel.is_closed:
+                await channel.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao descartar canal: {e}")
+
+    @property
+    def healthy(self):
+        """Indica se ao menos uma conexão do pool está aberta"""
+        return any(not connection.is_closed for connection in self.connections)
+
+    async def close(self):
+        """Fecha canais ociosos e todas as conexões do pool"""
+        if self._channels is not None:
+            while not self._channels.empty():
+                channel = self._channels.get_nowait()
+                if channel is not None:
+                    await self._discard(channel)
+            self._channels = None
+
+        for connection in self.connections:
+            if not connection.is_closed:
+                await connection.close()
+        self.connections = []
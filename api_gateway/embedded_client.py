@@ -0,0 +1,116 @@
+import logging
+import time
+from typing import Dict, Any, List
+
+from routing import QUEUES, SHARDED_QUEUES, resolve
+from metrics import PUBLISH_LATENCY, PUBLISHED_MESSAGES, PUBLISH_ERRORS
+from shared.logging_config import event
+from shared.codecs import default_codec
+from shared.payloads import PayloadCodec
+from shared.embedded_queue import EmbeddedTransport, Properties, get_broker
+from shared.topology import queue_arguments
+from shared.transport import TransportError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddedClient:
+    """Cliente do gateway para o broker embarcado (TRANSPORT=embedded)
+
+    Mesma interface do ``AsyncRabbitMQClient``, mas publicar é só enfileirar no
+    broker do próprio processo: não há rede, pool, micro-lote nem confirm a
+    aguardar. Serve para rodar gateway e consumers em um único processo
+    (``run_embedded.py``) em nós de borda ou em benchmarks sem RabbitMQ.
+    """
+
+    def __init__(self, broker=None):
+        self.transport = EmbeddedTransport(broker or get_broker())
+        self.connected = False
+        self.codec = default_codec()
+        self.payloads = PayloadCodec.from_env()
+        self.channel = None
+
+    async def connect(self, max_retries=None):
+        """Declara filas e shards no broker embarcado"""
+        if self.connected:
+            return True
+        self.channel = self.transport.connect().channel()
+        try:
+            for queue_name in QUEUES:
+                self.channel.queue_declare(queue=queue_name, durable=True, arguments=queue_arguments(queue_name))
+            for sharding in SHARDED_QUEUES.values():
+                sharding.declare(self.channel)
+        except TransportError as e:
+            logger.error(f"❌ Topologia não suportada pelo transporte embarcado: {e}")
+            return False
+
+        self.connected = True
+        logger.info("✅ Gateway usando o broker embarcado")
+        return True
+
+    def _publish(self, queue_name: str, message: Dict[str, Any], packed) -> bool:
+        body, content_encoding, headers = packed
+        exchange, routing_key, schedule = resolve(queue_name, message)
+        if schedule:
+            headers = {**(headers or {}), **schedule}
+        try:
+            self.channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=Properties(
+                    delivery_mode=2,  # Gravada no log em disco, se EMBEDDED_LOG_DIR estiver configurado
+                    content_type=self.codec.content_type,
+                    content_encoding=content_encoding,
+                    headers=headers,
+                    message_id=message.get('message_id')
+                )
+            )
+            return True
+        except TransportError as e:
+            logger.error(f"❌ Falha ao publicar na fila '{queue_name}': {e}")
+            self.payloads.release(headers)
+            return False
+
+    async def publish_message(self, queue_name: str, message: Dict[str, Any]):
+        results = await self.publish_many(queue_name, [message])
+        return results[0]
+
+    async def publish_many(self, queue_name: str, messages: List[Dict[str, Any]]) -> List[bool]:
+        """Publica várias mensagens na mesma fila; retorna o resultado de cada uma"""
+        if not self.connected:
+            if not await self.connect():
+                raise ConnectionError("Não foi possível usar o broker embarcado")
+
+        started = time.perf_counter()
+        results = [
+            self._publish(queue_name, message, await self.payloads.pack_async(self.codec.encode(message)))
+            for message in messages
+        ]
+        PUBLISH_LATENCY.labels(queue_name).observe(time.perf_counter() - started)
+
+        confirmed = results.count(True)
+        PUBLISHED_MESSAGES.labels(queue_name).inc(confirmed)
+        if confirmed < len(results):
+            PUBLISH_ERRORS.labels(queue_name).inc(len(results) - confirmed)
+        logger.info(
+            "📤 %d mensagem(ns) enfileirada(s) na fila '%s'", confirmed, queue_name,
+            extra=event('published', queue=queue_name, count=confirmed)
+        )
+        return results
+
+    async def queue_depths(self, queue_names):
+        return {
+            queue_name: self.channel.queue_declare(queue=queue_name, passive=True).method.message_count
+            for queue_name in queue_names
+        }
+
+    def oldest_pending_age(self) -> float:
+        # Não há confirms pendentes: a publicação embarcada é síncrona
+        return 0.0
+
+    async def close(self):
+        # O broker é do processo (consumers podem seguir usando); quem o fecha é run_embedded.py
+        self.connected = False
+        logger.info("🔌 Gateway desconectado do broker embarcado")
@@ -1,33 +1,69 @@
-from fastapi import FastAPI, HTTPException, status
-from pydantic import BaseModel, EmailStr
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from typing import Optional, List
+import asyncio
 import logging
+import signal
+import threading
+import time
+import uuid
 from datetime import datetime
-from rabbitmq_client import rabbitmq_client
+from rabbitmq_client import QUEUES, async_rabbitmq_client as rabbitmq_client
+from routing import SHARDED_QUEUES, admission_queue
+from batch_ingest import open_batch, ingest_batch, collect_batch, stream_batch
+from admission import AdmissionController
+from metrics import mark_worker_dead, multiprocess_dir, prepare_multiprocess_dir, render_metrics
+from shared.logging_config import configure_logging
+from shared.topology import is_stream
 import os
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
-logging.basicConfig(level=logging.INFO)
+configure_logging('api-gateway')
 logger = logging.getLogger(__name__)
 
 
 # Modelos Pydantic
-class EmailNotification(BaseModel):
+class Schedulable(BaseModel):
+    """Agendamento opcional: ``send_at`` (sem fuso = horário local do gateway) ou ``delay`` em segundos"""
+    send_at: Optional[datetime] = None
+    delay: Optional[float] = Field(None, ge=0)
+
+    @model_validator(mode='after')
+    def check_schedule(self):
+        if self.send_at is not None and self.delay is not None:
+            raise ValueError("use send_at or delay, not both")
+        return self
+
+    def deliver_at(self, now: float) -> Optional[float]:
+        """Horário de entrega em epoch (segundos), ou ``None`` para entrega imediata"""
+        if self.send_at is not None:
+            return self.send_at.timestamp()
+        if self.delay:
+            return now + self.delay
+        return None
+
+
+SCHEDULE_FIELDS = {'send_at', 'delay'}
+
+
+class EmailNotification(Schedulable):
     to: EmailStr
     subject: str
     body: str
     template: Optional[str] = None
+    template_version: Optional[str] = None
     priority: Optional[str] = "normal"
 
 
-class AdminNotification(BaseModel):
+class AdminNotification(Schedulable):
     action: str
     user: str
     details: str
     severity: Optional[str] = "info"  # info, warning, error, critical
 
 
-class Pedido(BaseModel):
+class Pedido(Schedulable):
     pedido_id: str
     cliente: str
     itens: List[str]
@@ -35,21 +71,145 @@ class Pedido(BaseModel):
     status: Optional[str] = "pendente"
 
 
+def new_message_id(kind: str, idempotency_key: Optional[str] = None):
+    """Gera o message_id: derivado do Idempotency-Key quando informado, senão um UUID"""
+    if idempotency_key:
+        return f"{kind}_{idempotency_key}"
+    return f"{kind}_{uuid.uuid4().hex}"
+
+
+def item_key(idempotency_key: Optional[str], index: int):
+    """Chave de idempotência de cada item de um lote"""
+    return f"{idempotency_key}:{index}" if idempotency_key else None
+
+
+def apply_schedule(message, notification: Schedulable):
+    """Grava ``deliver_at`` na mensagem agendada (o roteamento a manda para o scheduler)"""
+    deliver_at = notification.deliver_at(message["enqueued_at"])
+    if deliver_at is not None:
+        message["deliver_at"] = deliver_at
+    return message
+
+
+def build_email_message(email: EmailNotification, idempotency_key: Optional[str] = None):
+    """Monta a mensagem publicada na fila de emails"""
+    message = email.model_dump(exclude=SCHEDULE_FIELDS)
+    message.update(
+        type="email",
+        timestamp=datetime.now().isoformat(),
+        enqueued_at=time.time(),  # epoch em segundos: latência fim a fim medida no consumer
+        message_id=new_message_id("email", idempotency_key)
+    )
+    return apply_schedule(message, email)
+
+
+def build_admin_message(notification: AdminNotification, idempotency_key: Optional[str] = None):
+    """Monta a mensagem publicada na fila administrativa"""
+    message = notification.model_dump(exclude=SCHEDULE_FIELDS)
+    message.update(
+        type="admin",
+        timestamp=datetime.now().isoformat(),
+        enqueued_at=time.time(),
+        message_id=new_message_id("admin", idempotency_key)
+    )
+    return apply_schedule(message, notification)
+
+
+def build_pedido_message(pedido: Pedido, idempotency_key: Optional[str] = None):
+    """Monta a mensagem publicada na fila de pedidos (o pedido_id já é a chave natural)"""
+    message = pedido.model_dump(exclude=SCHEDULE_FIELDS)
+    message.update(
+        type="pedido",
+        timestamp=datetime.now().isoformat(),
+        enqueued_at=time.time(),
+        message_id=new_message_id("pedido", idempotency_key or pedido.pedido_id)
+    )
+    return apply_schedule(message, pedido)
+
+
+# Estado deste worker: com GATEWAY_WORKERS > 1 cada processo tem o seu
+draining = False
+
+
+def accepting_requests() -> bool:
+    """Pronto para tráfego: conectado ao broker e fora do encerramento"""
+    return rabbitmq_client.connected and not draining
+
+
+# Controle de admissão por profundidade de fila / broker bloqueado / cliente.
+# Streams retêm o histórico (a contagem não diminui com o consumo), então ficam de fora;
+# filas particionadas somam a profundidade dos shards
+admission = AdmissionController.from_env(
+    rabbitmq_client,
+    [queue_name for queue_name in QUEUES if not is_stream(queue_name)],
+    members={queue_name: sharding.queues for queue_name, sharding in SHARDED_QUEUES.items()},
+    ready=accepting_requests
+)
+
+
+def install_drain_handler():
+    """Marca o worker como drenando já no SIGTERM, antes de o uvicorn parar de aceitar conexões
+
+    A partir daí ``/health/ready`` e a admissão respondem 503 enquanto as
+    requisições em andamento terminam. O uvicorn trata o sinal pelo event loop
+    (wakeup fd), que continua funcionando com este handler encadeado.
+    Fora do thread principal (``run_embedded.py``, testes) não há sinais a
+    tratar: quem encerra é o processo hospedeiro, e o shutdown do lifespan já
+    marca ``draining``.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        logger.info("ℹ️ Gateway fora do thread principal: handler de drenagem não instalado")
+        return
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(signum)
+
+        def on_signal(received, frame, previous=previous):
+            global draining
+            draining = True
+            if callable(previous):
+                previous(received, frame)
+
+        signal.signal(signum, on_signal)
+
+
+async def connect_broker():
+    """Conecta ao broker em background, repetindo até conseguir"""
+    while not await rabbitmq_client.connect():
+        logger.error("❌ Não foi possível conectar ao RabbitMQ; nova rodada de tentativas...")
+    logger.info("✅ Sistema pronto para receber notificações")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Gerencia ciclo de vida da aplicação"""
+    """Gerencia ciclo de vida da aplicação
+
+    Roda em cada worker, depois do fork: as conexões com o broker são sempre do
+    próprio processo. A inicialização não espera o broker; até conectar,
+    ``/health/ready`` responde 503 e os endpoints recusam com 503 + Retry-After.
+    No SIGTERM o worker passa a responder 503 (``draining``), o uvicorn para de
+    aceitar conexões e aguarda as requisições em
+    andamento (até GATEWAY_SHUTDOWN_TIMEOUT); depois os micro-lotes pendentes
+    são publicados e seus confirms aguardados antes de fechar as conexões.
+    """
+    global draining
     # Inicialização
-    logger.info("🚀 Iniciando Notification System API Gateway...")
-    if rabbitmq_client.connect():
-        logger.info("✅ Sistema pronto para receber notificações")
-    else:
-        logger.error("❌ Falha crítica: Não foi possível conectar ao RabbitMQ")
+    logger.info(f"🚀 Iniciando Notification System API Gateway (pid {os.getpid()})...")
+    draining = False
+    install_drain_handler()
+    connecting = asyncio.create_task(connect_broker())
+    admission.monitor.start()
     
     yield
     
     # Shutdown
-    logger.info("🛑 Encerrando Notification System...")
-    rabbitmq_client.close()
+    draining = True
+    logger.info(f"🛑 Encerrando Notification System (pid {os.getpid()}): drenando publicações pendentes...")
+    connecting.cancel()
+    with suppress(asyncio.CancelledError):
+        await connecting
+    await admission.monitor.stop()
+    await rabbitmq_client.close()
+    mark_worker_dead()
 
 
 app = FastAPI(
@@ -78,12 +238,49 @@ async def health_check():
     return {
         "api": "healthy",
         "rabbitmq": "connected" if rabbitmq_client.connected else "disconnected",
+        "broker_blocked": admission.monitor.blocked,
+        "queue_depths": admission.monitor.depths,
         "timestamp": datetime.now().isoformat()
     }
 
 
-@app.post("/notify/email", status_code=status.HTTP_202_ACCEPTED)
-async def notify_email(email: EmailNotification):
+@app.get("/health/live")
+async def liveness():
+    """Liveness: o processo e o event loop respondem (não depende do broker)"""
+    return {"status": "alive", "pid": os.getpid()}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: 200 só com o broker conectado e fora do encerramento"""
+    ready = accepting_requests()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "rabbitmq": "connected" if rabbitmq_client.connected else "disconnected",
+            "draining": draining,
+            "pid": os.getpid()
+        }
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato Prometheus"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.post(
+    "/notify/email",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admission.guard('queue_email', depth=False))]
+)
+async def notify_email(
+    email: EmailNotification,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Envia notificação por email de forma assíncrona
     
@@ -91,17 +288,16 @@ async def notify_email(email: EmailNotification):
     - **subject**: Assunto do email
     - **body**: Corpo da mensagem
     - **template**: Template opcional
-    - **priority**: Prioridade (normal, alta)
+    - **template_version**: Versão do template (troca força recompilação no consumer)
+    - **priority**: Prioridade (normal, alta); "alta" segue pela fila expressa
+    - **send_at** / **delay**: agenda o envio para uma data/hora ou daqui a N segundos
+    - **Idempotency-Key** (header): reenvios com a mesma chave não são processados duas vezes
     """
+    message = build_email_message(email, idempotency_key)
+    # Profundidade da fila que a mensagem vai ocupar (expressa/agendada), não a da fila normal
+    admission.admit(admission_queue('queue_email', message))
     try:
-        message = {
-            **email.dict(),
-            "type": "email",
-            "timestamp": datetime.now().isoformat(),
-            "message_id": f"email_{datetime.now().timestamp()}"
-        }
-        
-        if rabbitmq_client.publish_message('queue_email', message):
+        if await rabbitmq_client.publish_message('queue_email', message):
             return {
                 "status": "accepted",
                 "message": "Email enqueued for processing",
@@ -122,25 +318,29 @@ async def notify_email(email: EmailNotification):
         )
 
 
-@app.post("/notify/admin", status_code=status.HTTP_202_ACCEPTED)
-async def notify_admin(notification: AdminNotification):
+@app.post(
+    "/notify/admin",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admission.guard('queue_admin', depth=False))]
+)
+async def notify_admin(
+    notification: AdminNotification,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Envia notificação administrativa de forma assíncrona
     
     - **action**: Ação realizada (login, logout, create, delete, update)
     - **user**: Usuário que realizou a ação
     - **details**: Detalhes da ação
-    - **severity**: Severidade (info, warning, error, critical)
+    - **severity**: Severidade (info, warning, error, critical); error/critical seguem pela fila expressa
+    - **send_at** / **delay**: agenda a notificação para uma data/hora ou daqui a N segundos
+    - **Idempotency-Key** (header): reenvios com a mesma chave não são processados duas vezes
     """
+    message = build_admin_message(notification, idempotency_key)
+    admission.admit(admission_queue('queue_admin', message))
     try:
-        message = {
-            **notification.dict(),
-            "type": "admin",
-            "timestamp": datetime.now().isoformat(),
-            "message_id": f"admin_{datetime.now().timestamp()}"
-        }
-        
-        if rabbitmq_client.publish_message('queue_admin', message):
+        if await rabbitmq_client.publish_message('queue_admin', message):
             return {
                 "status": "accepted",
                 "message": "Admin notification enqueued",
@@ -161,8 +361,15 @@ async def notify_admin(notification: AdminNotification):
         )
 
 
-@app.post("/pedidos", status_code=status.HTTP_202_ACCEPTED)
-async def criar_pedido(pedido: Pedido):
+@app.post(
+    "/pedidos",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admission.guard('queue_pedidos', depth=False))]
+)
+async def criar_pedido(
+    pedido: Pedido,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Processa um novo pedido de forma assíncrona
     
@@ -171,16 +378,13 @@ async def criar_pedido(pedido: Pedido):
     - **itens**: Lista de itens do pedido
     - **valor_total**: Valor total do pedido
     - **status**: Status inicial do pedido
+    - **send_at** / **delay**: agenda o processamento para uma data/hora ou daqui a N segundos
+    - **Idempotency-Key** (header): opcional; por padrão o pedido_id é a chave de idempotência
     """
+    message = build_pedido_message(pedido, idempotency_key)
+    admission.admit(admission_queue('queue_pedidos', message))
     try:
-        message = {
-            **pedido.dict(),
-            "type": "pedido",
-            "timestamp": datetime.now().isoformat(),
-            "message_id": f"pedido_{pedido.pedido_id}"
-        }
-        
-        if rabbitmq_client.publish_message('queue_pedidos', message):
+        if await rabbitmq_client.publish_message('queue_pedidos', message):
             return {
                 "status": "accepted",
                 "message": "Pedido enqueued for processing",
@@ -202,6 +406,100 @@ async def criar_pedido(pedido: Pedido):
         )
 
 
+async def _batch_response(request: Request, model, queue_name: str, build_message, stream: bool):
+    items = await open_batch(request, buffered=stream)
+    chunks = ingest_batch(items, model, queue_name, build_message, rabbitmq_client)
+    if stream:
+        # Uma Response devolvida diretamente ignora o status_code da rota: 202 como nos demais
+        return StreamingResponse(
+            stream_batch(chunks), status_code=status.HTTP_202_ACCEPTED, media_type="application/x-ndjson"
+        )
+    return await collect_batch(chunks, queue_name)
+
+
+@app.post(
+    "/notify/email/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admission.guard('queue_email'))]
+)
+async def notify_email_batch(
+    request: Request,
+    stream: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Recebe um lote de notificações por email (array JSON ou NDJSON)
+
+    Cada item é validado como `EmailNotification`; os válidos são publicados em
+    bloco e a resposta traz o resultado por item. Com `stream=true` os resultados
+    são devolvidos como NDJSON à medida que cada bloco é confirmado. Com o
+    header `Idempotency-Key`, cada item usa a chave `<chave>:<índice>`.
+    """
+    return await _batch_response(
+        request, EmailNotification, 'queue_email',
+        lambda item, index: build_email_message(item, item_key(idempotency_key, index)),
+        stream
+    )
+
+
+@app.post(
+    "/notify/admin/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admission.guard('queue_admin'))]
+)
+async def notify_admin_batch(
+    request: Request,
+    stream: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Recebe um lote de notificações administrativas (array JSON ou NDJSON)
+
+    Cada item é validado como `AdminNotification`; veja `/notify/email/batch`.
+    """
+    return await _batch_response(
+        request, AdminNotification, 'queue_admin',
+        lambda item, index: build_admin_message(item, item_key(idempotency_key, index)),
+        stream
+    )
+
+
+@app.post(
+    "/pedidos/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admission.guard('queue_pedidos'))]
+)
+async def criar_pedidos_batch(
+    request: Request,
+    stream: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Recebe um lote de pedidos (array JSON ou NDJSON)
+
+    Cada item é validado como `Pedido`; veja `/notify/email/batch`.
+    """
+    return await _batch_response(
+        request, Pedido, 'queue_pedidos',
+        lambda item, index: build_pedido_message(item, item_key(idempotency_key, index)),
+        stream
+    )
+
+
 if __name__ == "__main__":
+    import tempfile
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # GATEWAY_WORKERS > 1: um processo por worker, cada um com o seu pool de conexões ao broker
+    workers = int(os.getenv('GATEWAY_WORKERS', 1))
+    if workers > 1 and not multiprocess_dir():
+        # Os workers herdam o ambiente: /metrics agrega os processos pelo diretório compartilhado
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(tempfile.gettempdir(), 'gateway-metrics')
+    if multiprocess_dir():
+        prepare_multiprocess_dir(multiprocess_dir())
+    uvicorn.run(
+        "main:app",
+        host=os.getenv('API_HOST', '0.0.0.0'),
+        port=int(os.getenv('API_PORT', 8000)),
+        workers=workers,
+        timeout_graceful_shutdown=int(os.getenv('GATEWAY_SHUTDOWN_TIMEOUT', 30))
+    )
\ No newline at end of file
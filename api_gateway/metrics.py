@@ -0,0 +1,70 @@
+import glob
+import os
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Tempo total de publish_many (fila lógica), do enfileiramento no lote até o confirm
+PUBLISH_LATENCY = Histogram(
+    'gateway_publish_latency_seconds', 'Latência de publicação até o confirm, por chamada', ['queue'],
+    buckets=LATENCY_BUCKETS
+)
+PUBLISHED_MESSAGES = Counter('gateway_published_messages_total', 'Mensagens confirmadas pelo broker', ['queue'])
+PUBLISH_ERRORS = Counter('gateway_publish_errors_total', 'Mensagens sem confirmação do broker', ['queue'])
+
+# Visão do micro-lote (BatchPublisher)
+CONFIRM_LATENCY = Histogram(
+    'gateway_confirm_latency_seconds', 'Tempo entre o envio de um lote e o último confirm',
+    buckets=LATENCY_BUCKETS
+)
+BATCH_SIZE = Histogram(
+    'gateway_publish_batch_size', 'Mensagens por micro-lote publicado',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+INFLIGHT_PUBLISHES = Gauge(
+    'gateway_inflight_publishes', 'Mensagens publicadas aguardando confirm', multiprocess_mode='livesum'
+)
+
+RECONNECTS = Counter('gateway_reconnects_total', 'Reconexões ao RabbitMQ')
+ADMISSION_REJECTIONS = Counter(
+    'gateway_admission_rejections_total', 'Requisições rejeitadas com 429', ['queue', 'reason']
+)
+# Todos os workers observam as mesmas filas: no modo multiprocesso vale o maior valor
+QUEUE_DEPTH = Gauge(
+    'gateway_queue_depth', 'Profundidade das filas observada pelo monitor de admissão', ['queue'],
+    multiprocess_mode='max'
+)
+
+
+def multiprocess_dir():
+    return os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+
+def prepare_multiprocess_dir(directory):
+    """Cria/limpa o diretório de métricas compartilhado antes de subir os workers"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        os.remove(path)
+
+
+def mark_worker_dead():
+    """Remove os gauges "vivos" deste worker ao encerrar (modo multiprocesso)"""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render_metrics():
+    """Retorna ``(corpo, content_type)`` no formato de exposição do Prometheus
+
+    Com GATEWAY_WORKERS > 1 cada worker grava as métricas em
+    PROMETHEUS_MULTIPROC_DIR e a resposta soma todos os processos, não só o
+    worker que atendeu o scrape.
+    """
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,83 +1,104 @@
 import pika
-import json
+import aio_pika
+import asyncio
 import logging
 import time
-from typing import Dict, Any
+from typing import Dict, Any, List
 import os
+import threading
+
+from channel_pool import ChannelPool
+from batch_publisher import BatchPublisher
+from routing import QUEUES, SHARDED_QUEUES, resolve
+from metrics import PUBLISH_LATENCY, PUBLISHED_MESSAGES, PUBLISH_ERRORS, RECONNECTS
+from shared.logging_config import event
+from shared.codecs import default_codec
+from shared.payloads import PayloadCodec
+from shared.broker import BrokerSettings, ConnectionManager
+from shared.topology import queue_arguments
+from shared.transport import transport_name
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tentativas de conexão na inicialização (o intervalo cresce com backoff e jitter)
+CONNECT_ATTEMPTS = int(os.getenv('RABBITMQ_CONNECT_ATTEMPTS', 10))
 
 class RabbitMQClient:
     def __init__(self):
         self.connection = None
         self.channel = None
         self.connected = False
+        self.connection_manager = ConnectionManager()
+        # Codec de publicação (MESSAGE_CONTENT_TYPE): o consumer decodifica pelo content_type
+        self.codec = default_codec()
+        self.payloads = PayloadCodec.from_env()
+        # BlockingConnection não é thread-safe; serializa o uso fora do event loop
+        self._lock = threading.RLock()
         
-    def connect(self, max_retries=5, retry_delay=5):
-        """Estabelece conexão com RabbitMQ com tentativas de reconexão"""
-        credentials = pika.PlainCredentials(
-            username=os.getenv('RABBITMQ_USER', 'admin'),
-            password=os.getenv('RABBITMQ_PASSWORD', 'admin123')
-        )
-        
-        for attempt in range(max_retries):
-            try:
-                self.connection = pika.BlockingConnection(
-                    pika.ConnectionParameters(
-                        host=os.getenv('RABBITMQ_HOST', 'rabbitmq'),
-                        port=int(os.getenv('RABBITMQ_PORT', 5672)),
-                        credentials=credentials,
-                        heartbeat=600,
-                        blocked_connection_timeout=300
-                    )
-                )
-                
-                self.channel = self.connection.channel()
-                
-                # Declarar filas duráveis
-                self.channel.queue_declare(queue='queue_email', durable=True)
-                self.channel.queue_declare(queue='queue_admin', durable=True)
-                self.channel.queue_declare(queue='queue_pedidos', durable=True)
-                
-                self.connected = True
-                logger.info("✅ Conectado ao RabbitMQ com sucesso")
-                return True
-                
-            except Exception as e:
-                logger.error(f"❌ Tentativa {attempt + 1}/{max_retries}: Falha ao conectar ao RabbitMQ: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
+    def connect(self, max_retries=None):
+        """Estabelece conexão com RabbitMQ (failover entre nós e backoff com jitter)"""
+        self.connection = self.connection_manager.connect(max_attempts=max_retries or CONNECT_ATTEMPTS)
+        if self.connection is None:
+            return False
+
+        try:
+            self.channel = self.connection.channel()
+            
+            # Declarar filas duráveis
+            for queue_name in QUEUES:
+                self.channel.queue_declare(queue=queue_name, durable=True, arguments=queue_arguments(queue_name))
+            for sharding in SHARDED_QUEUES.values():
+                sharding.declare(self.channel)
+        except pika.exceptions.AMQPError as e:
+            logger.error(f"❌ Falha ao declarar filas: {e!r}")
+            return False
         
-        return False
+        self.connected = True
+        return True
     
     def publish_message(self, queue_name: str, message: Dict[str, Any]):
         """Publica uma mensagem na fila especificada"""
-        if not self.connected:
-            if not self.connect():
-                raise ConnectionError("Não foi possível conectar ao RabbitMQ")
+        with self._lock:
+            if not self.connected:
+                if not self.connect():
+                    raise ConnectionError("Não foi possível conectar ao RabbitMQ")
         
-        try:
-            self.channel.basic_publish(
-                exchange='',
-                routing_key=queue_name,
-                body=json.dumps(message),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Torna a mensagem persistente
-                    content_type='application/json'
+            headers = None
+            try:
+                body, content_encoding, headers = self.payloads.pack(self.codec.encode(message))
+                exchange, routing_key, schedule = resolve(queue_name, message)
+                if schedule:
+                    headers = {**(headers or {}), **schedule}
+                self.channel.basic_publish(
+                    exchange=exchange,
+                    routing_key=routing_key,
+                    body=body,
+                    properties=pika.BasicProperties(
+                        delivery_mode=2,  # Torna a mensagem persistente
+                        content_type=self.codec.content_type,
+                        content_encoding=content_encoding,
+                        headers=headers,
+                        message_id=message.get('message_id')
+                    )
                 )
-            )
-            logger.info(f"📤 Mensagem publicada na fila '{queue_name}': {message}")
-            return True
+                # O payload (com o corpo do email) só é registrado em DEBUG
+                logger.info(
+                    "📤 Mensagem %s publicada na fila '%s'", message.get('message_id'), queue_name,
+                    extra=event('published', queue=queue_name, message_id=message.get('message_id'))
+                )
+                logger.debug("📤 Payload publicado na fila '%s': %s", queue_name, message)
+                return True
             
-        except Exception as e:
-            logger.error(f"❌ Erro ao publicar mensagem: {e}")
-            # Tentar reconectar e reenviar
-            self.connected = False
-            if self.connect():
-                return self.publish_message(queue_name, message)
-            return False
+            except Exception as e:
+                logger.error(f"❌ Erro ao publicar mensagem: {e}")
+                # O blob (claim-check) desta tentativa não será referenciado; o reenvio grava outro
+                self.payloads.release(headers)
+                # Tentar reconectar e reenviar
+                self.connected = False
+                if self.connect():
+                    return self.publish_message(queue_name, message)
+                return False
     
     def close(self):
         """Fecha a conexão com RabbitMQ"""
@@ -91,5 +112,195 @@ class RabbitMQClient:
             logger.error(f"❌ Erro ao fechar conexão: {e}")
 
 
+class AsyncRabbitMQClient:
+    """Cliente RabbitMQ assíncrono (aio-pika) que não bloqueia o event loop"""
+
+    def __init__(self):
+        self.pool = ChannelPool(
+            self._open_connection,
+            pool_connections=int(os.getenv('RABBITMQ_POOL_CONNECTIONS', 2)),
+            pool_channels=int(os.getenv('RABBITMQ_POOL_CHANNELS', 16)),
+            publisher_confirms=os.getenv('RABBITMQ_PUBLISHER_CONFIRMS', 'true').lower() == 'true'
+        )
+        # Micro-lotes: fecha com PUBLISH_BATCH_SIZE mensagens ou após PUBLISH_BATCH_WINDOW_MS
+        self.publisher = BatchPublisher(
+            self.pool,
+            max_batch_size=int(os.getenv('PUBLISH_BATCH_SIZE', 500)),
+            max_delay=float(os.getenv('PUBLISH_BATCH_WINDOW_MS', 2)) / 1000,
+            confirm_timeout=float(os.getenv('PUBLISH_CONFIRM_TIMEOUT', 10))
+        )
+        self.connected = False
+        self.settings = BrokerSettings.from_env()
+        self.codec = default_codec()
+        # Compressão acima de PAYLOAD_COMPRESS_THRESHOLD e claim-check acima de PAYLOAD_CLAIM_CHECK_THRESHOLD
+        self.payloads = PayloadCodec.from_env()
+        self._connect_lock = None
+
+    async def _open_connection(self):
+        """Abre uma conexão robusta no primeiro nó disponível (RABBITMQ_HOSTS)
+
+        A ordem dos nós gira a cada chamada, espalhando as conexões do pool pelo
+        cluster. Depois de aberta, o aio-pika reconecta sozinho em
+        ``reconnect_interval`` e recupera canais, QoS e filas declaradas.
+        """
+        last_error = None
+        for host, port in self.settings.failover_order():
+            try:
+                return await aio_pika.connect_robust(
+                    host=host,
+                    port=port,
+                    login=self.settings.username,
+                    password=self.settings.password,
+                    virtualhost=self.settings.virtual_host,
+                    timeout=self.settings.socket_timeout,
+                    heartbeat=self.settings.heartbeat,
+                    reconnect_interval=self.settings.reconnect_initial
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Nó RabbitMQ {host}:{port} indisponível: {e!r}")
+                last_error = e
+        raise ConnectionError(f"Nenhum nó RabbitMQ disponível: {last_error!r}")
+
+    async def connect(self, max_retries=None):
+        """Estabelece conexão com RabbitMQ sem bloquear o event loop"""
+        # O lock é criado sob demanda para ficar associado ao loop em execução
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            # Outra requisição pode ter reconectado enquanto aguardávamos o lock
+            if self.connected:
+                return True
+
+            max_retries = max_retries or CONNECT_ATTEMPTS
+            backoff = self.settings.backoff()
+            for attempt in range(max_retries):
+                try:
+                    await self.pool.close()
+                    await self.pool.open()
+
+                    # Declarar filas duráveis
+                    async with self.pool.acquire() as channel:
+                        for queue_name in QUEUES:
+                            await channel.declare_queue(queue_name, durable=True, arguments=queue_arguments(queue_name))
+                        for sharding in SHARDED_QUEUES.values():
+                            await sharding.declare_async(channel)
+
+                    self.publisher.start()
+                    self.connected = True
+                    logger.info("✅ Conectado ao RabbitMQ (modo assíncrono) com sucesso")
+                    return True
+
+                except Exception as e:
+                    logger.error(f"❌ Tentativa {attempt + 1}/{max_retries}: Falha ao conectar ao RabbitMQ: {e}")
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(backoff.next_delay())
+
+            return False
+
+    async def _routed(self, queue_name: str, message: Dict[str, Any]):
+        """``(exchange, routing_key, aio_pika.Message)``: fila expressa, shard ou scheduler"""
+        exchange, routing_key, schedule = resolve(queue_name, message)
+        return exchange, routing_key, await self._build_message(message, schedule)
+
+    async def _route_all(self, queue_name: str, messages: List[Dict[str, Any]]):
+        # Corpos pequenos não suspendem; só os grandes vão para uma thread (compressão/blob)
+        return [await self._routed(queue_name, message) for message in messages]
+
+    def _release_failed(self, routed, results):
+        """Remove os blobs das mensagens sem confirm (ninguém vai consumi-los)"""
+        for (_, _, message), ok in zip(routed, results):
+            if not ok:
+                self.payloads.release(message.headers)
+
+    async def _build_message(self, message: Dict[str, Any], extra_headers=None):
+        body, content_encoding, headers = await self.payloads.pack_async(self.codec.encode(message))
+        if extra_headers:
+            headers = {**(headers or {}), **extra_headers}
+        return aio_pika.Message(
+            body=body,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,  # Torna a mensagem persistente
+            content_type=self.codec.content_type,
+            content_encoding=content_encoding,
+            headers=headers,
+            message_id=message.get('message_id')
+        )
+
+    async def publish_message(self, queue_name: str, message: Dict[str, Any]):
+        """Publica uma mensagem e aguarda o confirm do broker (via micro-lote)"""
+        results = await self.publish_many(queue_name, [message])
+        return results[0]
+
+    async def publish_many(self, queue_name: str, messages: List[Dict[str, Any]]) -> List[bool]:
+        """Publica várias mensagens na mesma fila; retorna o confirm de cada uma"""
+        if not self.connected:
+            if not await self.connect():
+                raise ConnectionError("Não foi possível conectar ao RabbitMQ")
+
+        # Mensagens urgentes seguem pela fila expressa correspondente; agendadas, pelo scheduler
+        started = time.perf_counter()
+        routed = await self._route_all(queue_name, messages)
+        results = await self.publisher.publish_many(routed)
+        PUBLISH_LATENCY.labels(queue_name).observe(time.perf_counter() - started)
+
+        if all(results):
+            PUBLISHED_MESSAGES.labels(queue_name).inc(len(results))
+            logger.info(
+                "📤 %d mensagem(ns) confirmada(s) na fila '%s'", len(messages), queue_name,
+                extra=event('published', queue=queue_name, count=len(messages))
+            )
+            return results
+
+        logger.error(f"❌ {results.count(False)} mensagem(ns) sem confirmação na fila '{queue_name}'")
+        self._release_failed(routed, results)
+        # Reconecta apenas se o pool inteiro caiu; canais ruins já foram descartados
+        if not self.pool.healthy:
+            self.connected = False
+            RECONNECTS.inc()
+            if await self.connect():
+                pending = [message for message, ok in zip(messages, results) if not ok]
+                routed = await self._route_all(queue_name, pending)
+                retried = await self.publisher.publish_many(routed)
+                self._release_failed(routed, retried)
+                retried = iter(retried)
+                results = [ok or next(retried) for ok in results]
+
+        confirmed = results.count(True)
+        PUBLISHED_MESSAGES.labels(queue_name).inc(confirmed)
+        PUBLISH_ERRORS.labels(queue_name).inc(len(results) - confirmed)
+        return results
+
+    async def queue_depths(self, queue_names):
+        """Mensagens prontas em cada fila (``queue_declare`` passivo em um canal do pool)"""
+        depths = {}
+        async with self.pool.acquire() as channel:
+            for queue_name in queue_names:
+                queue = await channel.declare_queue(queue_name, passive=True)
+                depths[queue_name] = queue.declaration_result.message_count
+        return depths
+
+    def oldest_pending_age(self) -> float:
+        """Há quanto tempo o lote mais antigo aguarda confirm (broker bloqueado)"""
+        return self.publisher.oldest_pending_age()
+
+    async def close(self):
+        """Fecha a conexão com RabbitMQ"""
+        try:
+            await self.publisher.close()
+            await self.pool.close()
+            self.connected = False
+            logger.info("🔌 Conexão com RabbitMQ fechada")
+        except Exception as e:
+            logger.error(f"❌ Erro ao fechar conexão: {e}")
+
+
 # Instância global do cliente RabbitMQ
-rabbitmq_client = RabbitMQClient()
\ No newline at end of file
+rabbitmq_client = RabbitMQClient()
+
+# Instância global do cliente assíncrono, usada pelos endpoints do API Gateway
+# (TRANSPORT=embedded troca o RabbitMQ pelo broker em processo)
+if transport_name() == 'embedded':
+    from embedded_client import EmbeddedClient
+    async_rabbitmq_client = EmbeddedClient()
+else:
+    async_rabbitmq_client = AsyncRabbitMQClient()
\ No newline at end of file
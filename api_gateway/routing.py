@@ -0,0 +1,68 @@
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from shared.scheduling import MIN_DELAY, SCHEDULED_QUEUE, schedule_headers
+from shared.sharding import sharded_queues
+from shared.topology import is_stream
+
+# Filas expressas: mensagens urgentes não esperam atrás do backlog da fila normal.
+# Uma fila stream (ex.: auditoria em queue_admin) precisa receber tudo para poder
+# ser relida, então não tem fila expressa
+URGENT_LANES = {
+    queue_name: lane
+    for queue_name, lane in (('queue_email', 'queue_email_urgent'), ('queue_admin', 'queue_admin_urgent'))
+    if not is_stream(queue_name)
+}
+
+# Filas declaradas pelo gateway; o tipo (classic/quorum/stream) vem de QUEUE_TYPE_<FILA>
+QUEUES = ('queue_email', 'queue_admin', 'queue_pedidos', *URGENT_LANES.values(), SCHEDULED_QUEUE)
+
+# Filas particionadas por consistent hash (SHARDS_<FILA>)
+SHARDED_QUEUES = sharded_queues()
+
+URGENT_EMAIL_PRIORITIES = {'alta'}
+URGENT_ADMIN_SEVERITIES = {'error', 'critical'}
+
+
+def is_urgent(queue_name: str, message: Dict[str, Any]) -> bool:
+    """Indica se a mensagem deve ir para a fila expressa"""
+    if queue_name == 'queue_email':
+        return message.get('priority') in URGENT_EMAIL_PRIORITIES
+    if queue_name == 'queue_admin':
+        return message.get('severity') in URGENT_ADMIN_SEVERITIES
+    return False
+
+
+def route(queue_name: str, message: Dict[str, Any]) -> Tuple[str, str]:
+    """Resolve ``(exchange, routing_key)``: shard por hash, fila expressa ou a própria fila"""
+    sharding = SHARDED_QUEUES.get(queue_name)
+    if sharding is not None:
+        return sharding.exchange, sharding.routing_key(message)
+    if queue_name in URGENT_LANES and is_urgent(queue_name, message):
+        return '', URGENT_LANES[queue_name]
+    return '', queue_name
+
+
+def resolve(queue_name: str, message: Dict[str, Any]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """Resolve ``(exchange, routing_key, headers)`` incluindo o agendamento
+
+    Com ``deliver_at`` no futuro a mensagem vai para o scheduler, levando nos
+    headers o horário e o destino que ``route`` escolheria; sem agendamento os
+    headers extras são ``None``.
+    """
+    exchange, routing_key = route(queue_name, message)
+    deliver_at = message.get('deliver_at')
+    if deliver_at is None or deliver_at - time.time() < MIN_DELAY:
+        return exchange, routing_key, None
+    return '', SCHEDULED_QUEUE, schedule_headers(deliver_at, exchange, routing_key)
+
+
+def admission_queue(queue_name: str, message: Dict[str, Any]) -> str:
+    """Fila cuja profundidade decide a admissão: a expressa, a de agendamento ou a própria fila
+
+    Shards de uma fila particionada contam juntos, sob o nome lógico.
+    """
+    _, routing_key, schedule = resolve(queue_name, message)
+    if schedule or routing_key in URGENT_LANES.values():
+        return routing_key
+    return queue_name
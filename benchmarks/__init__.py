@@ -0,0 +1,12 @@
+"""Benchmarks do Notification System, executados a partir da raiz do repositório
+
+    python -m benchmarks.http_load --concurrency 64 --duration 30 --output http.json
+    python -m benchmarks.publish_bench --count 10000 --output publish.json
+    python -m benchmarks.consume_bench pedidos --count 5000 --output consume.json
+    python -m benchmarks.compare baseline.json atual.json --tolerance 0.1
+
+Cada execução grava um JSON com parâmetros, commit e, por cenário, vazão,
+latências p50/p99/p999 e (no consumo) a latência fim a fim a partir do
+``enqueued_at`` que o gateway grava em cada mensagem. Com ``TRANSPORT=embedded``
+o ``consume_bench`` roda sem RabbitMQ (broker em processo), isolando o custo do runtime.
+"""
@@ -0,0 +1,119 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_service(name):
+    """Coloca a raiz do repositório e o diretório do serviço (módulos planos) no sys.path"""
+    for path in (ROOT, os.path.join(ROOT, name)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por posição mais próxima em uma lista já ordenada"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(latencies):
+    """Resumo em milissegundos (p50/p99/p999/máximo/média) de latências em segundos"""
+    values = sorted(latencies)
+    if not values:
+        return {"p50": None, "p99": None, "p999": None, "max": None, "mean": None}
+    return {
+        "p50": percentile(values, 0.50) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "p999": percentile(values, 0.999) * 1000,
+        "max": values[-1] * 1000,
+        "mean": sum(values) / len(values) * 1000,
+    }
+
+
+def summarize(count, errors, elapsed, latencies, end_to_end=None):
+    result = {
+        "count": count,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_per_s": count / elapsed if elapsed > 0 else None,
+        "latency_ms": latency_summary(latencies),
+    }
+    if end_to_end is not None:
+        result["end_to_end_ms"] = latency_summary(end_to_end)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(benchmark, params, results, output=None):
+    """Grava (ou imprime) o resultado em JSON, com o contexto necessário para comparar execuções"""
+    document = {
+        "benchmark": benchmark,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    print(text)
+    return document
+
+
+def sample_payload(kind, index):
+    """Corpo de requisição/mensagem representativo de cada endpoint"""
+    if kind == 'email':
+        return {
+            "to": f"usuario{index % 1000}@example.com",
+            "subject": f"Benchmark #{index}",
+            "body": "Olá! " * 40,
+            "priority": "normal",
+        }
+    if kind == 'admin':
+        return {
+            "action": "login",
+            "user": f"user{index % 100}",
+            "details": f"Benchmark #{index}",
+            "severity": "info",
+        }
+    if kind == 'pedido':
+        return {
+            "pedido_id": index,
+            "cliente": f"Cliente {index % 500}",
+            "itens": [f"item-{n}" for n in range(5)],
+            "valor_total": 199.9,
+            "status": "pendente",
+        }
+    raise ValueError(f"Tipo desconhecido: {kind}")
+
+
+def sample_message(kind, index):
+    """Mensagem já no formato publicado pelo gateway (com enqueued_at para latência fim a fim)"""
+    message = sample_payload(kind, index)
+    message.update(
+        type=kind,
+        timestamp=datetime.now().isoformat(),
+        enqueued_at=time.time(),
+        message_id=f"{kind}_bench_{index}",
+    )
+    return message
@@ -0,0 +1,61 @@
+import argparse
+import json
+import sys
+
+# (caminho da métrica, True se maior é melhor)
+METRICS = [
+    (('throughput_per_s',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p99'), False),
+    (('end_to_end_ms', 'p99'), False),
+]
+
+
+def _get(result, path):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(baseline, current, tolerance):
+    """Lista as regressões além de ``tolerance`` (fração) entre dois arquivos de resultado"""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        for path, higher_is_better in METRICS:
+            old, new = _get(before, path), _get(result, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            line = f"{name} {'.'.join(path)}: {old:.3f} -> {new:.3f} ({change:+.1%})"
+            print(("❌ " if worse > tolerance else "   ") + line)
+            if worse > tolerance:
+                regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmark e falha em caso de regressão")
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Piora máxima aceita (fração, padrão 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+
+    regressions = compare(baseline, current, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressão(ões) acima de {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
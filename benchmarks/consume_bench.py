@@ -0,0 +1,127 @@
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import sample_message, summarize, use_service, write_results
+
+use_service('consumers')
+os.environ.setdefault('METRICS_PORT', '0')
+
+import pika  # noqa: E402
+
+from admin_consumer import AdminConsumer  # noqa: E402
+from consumer_runtime import ConsumerRuntime  # noqa: E402
+from email_consumer import EmailConsumer  # noqa: E402
+from pedidos_consumer import PedidosConsumer  # noqa: E402
+from shared.transport import create_transport  # noqa: E402
+from shared.codecs import default_codec  # noqa: E402
+from shared.topology import queue_arguments  # noqa: E402
+
+CONSUMERS = {
+    'email': (EmailConsumer, 'email'),
+    'admin': (AdminConsumer, 'admin'),
+    'pedidos': (PedidosConsumer, 'pedido'),
+}
+
+
+def prefill(queue_name, kind, count):
+    """Enche a fila com ``count`` mensagens (com publisher confirms) antes de consumir"""
+    codec = default_codec()
+    connection = create_transport().connect(max_attempts=5)
+    if connection is None:
+        raise SystemExit("❌ Não foi possível conectar ao RabbitMQ")
+    channel = connection.channel()
+    channel.queue_declare(queue=queue_name, durable=True, arguments=queue_arguments(queue_name))
+    channel.confirm_delivery()
+    properties = pika.BasicProperties(delivery_mode=2, content_type=codec.content_type)
+    for index in range(count):
+        channel.basic_publish(exchange='', routing_key=queue_name, body=codec.encode(sample_message(kind, index)), properties=properties)
+    connection.close()
+
+
+class Recorder:
+    """Envolve os handlers registrados: mede cada chamada e encerra o runtime ao atingir ``count``"""
+
+    def __init__(self, runtime, count):
+        self.runtime = runtime
+        self.count = count
+        self.done = 0
+        self.errors = 0
+        self.latencies = []
+        self.end_to_end = []
+        self.first_at = None
+        self.last_at = None
+        self._lock = threading.Lock()
+
+    def wrap(self, spec):
+        handler = spec.handler
+
+        def single(message):
+            before = time.perf_counter()
+            ok = handler(message)
+            self.record([message], [ok], time.perf_counter() - before)
+            return ok
+
+        def batch(messages):
+            before = time.perf_counter()
+            results = handler(messages)
+            self.record(messages, results, time.perf_counter() - before)
+            return results
+
+        spec.handler = batch if spec.batch_size else single
+
+    def record(self, messages, results, duration):
+        now = time.time()
+        with self._lock:
+            if self.first_at is None:
+                self.first_at = time.perf_counter() - duration
+            for message, ok in zip(messages, results):
+                self.done += 1
+                self.errors += 0 if ok else 1
+                self.latencies.append(duration / len(messages))
+                if isinstance(message.get('enqueued_at'), (int, float)):
+                    self.end_to_end.append(now - message['enqueued_at'])
+            self.last_at = time.perf_counter()
+            if self.done >= self.count:
+                self.runtime.stop()
+
+
+def bench(name, count, fill):
+    consumer_class, kind = CONSUMERS[name]
+    consumer = consumer_class()
+    if fill:
+        prefill(consumer.queue_name, kind, count)
+
+    runtime = ConsumerRuntime(f'Benchmark {name}')
+    consumer.register(runtime)
+    recorder = Recorder(runtime, count)
+    for spec in runtime.handlers:
+        recorder.wrap(spec)
+    runtime.start()
+
+    # Com a fila pré-carregada, o fim a fim inclui o tempo de espera na fila desde a carga
+    elapsed = (recorder.last_at - recorder.first_at) if recorder.first_at is not None else 0.0
+    return summarize(recorder.done - recorder.errors, recorder.errors, elapsed, recorder.latencies, recorder.end_to_end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drena uma fila pré-carregada com a classe de consumer real")
+    parser.add_argument('consumer', choices=sorted(CONSUMERS))
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--no-fill', action='store_true', help="Não pré-carrega; consome o que já está na fila")
+    parser.add_argument('--output', help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    # Workers, prefetch, lote, backend de email etc. vêm das mesmas variáveis de ambiente dos consumers
+    results = {args.consumer: bench(args.consumer, args.count, not args.no_fill)}
+    params = dict(vars(args), env={
+        key: value for key, value in os.environ.items()
+        if key.startswith(('CONSUMER_', 'EMAIL_', 'SMTP_', 'RETRY_', 'DEDUP_', 'MESSAGE_', 'PAYLOAD_', 'SHARDS_'))
+        and 'PASSWORD' not in key
+    })
+    write_results(f'consume_{args.consumer}', params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
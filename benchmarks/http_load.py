@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import sample_payload, summarize, write_results
+
+ENDPOINTS = {
+    'email': ('/notify/email', 'email'),
+    'admin': ('/notify/admin', 'admin'),
+    'pedidos': ('/pedidos', 'pedido'),
+}
+
+
+async def run_endpoint(client, endpoint, concurrency, total, duration, rate):
+    """Gerador de carga em malha fechada (``concurrency`` requisições simultâneas)
+
+    Com ``rate`` > 0 as requisições são disparadas em ritmo fixo (malha aberta) e a
+    latência é medida a partir do instante agendado, sem esconder o tempo de fila
+    do próprio cliente (coordinated omission).
+    """
+    path, kind = ENDPOINTS[endpoint]
+    counter = itertools.count()
+    latencies = []
+    statuses = Counter()
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+    interval = 1.0 / rate if rate else None
+
+    async def worker():
+        while True:
+            index = next(counter)
+            if total is not None and index >= total:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+
+            scheduled = started + index * interval if interval else time.perf_counter()
+            wait = scheduled - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                response = await client.post(path, json=sample_payload(kind, index))
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - scheduled)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    accepted = statuses.get(202, 0)
+    result = summarize(accepted, sum(statuses.values()) - accepted, elapsed, latencies)
+    result["statuses"] = {str(status): count for status, count in statuses.items()}
+    return result
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        for endpoint in args.endpoint:
+            results[endpoint] = await run_endpoint(
+                client, endpoint, args.concurrency, args.requests, args.duration, args.rate
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga HTTP nos endpoints do API Gateway")
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS), help="Repetível; padrão: todos")
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=None, help="Total de requisições por endpoint")
+    parser.add_argument('--duration', type=float, default=None, help="Duração por endpoint (s); padrão 30 sem --requests")
+    parser.add_argument('--rate', type=float, default=None, help="Requisições/s em malha aberta (padrão: malha fechada)")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+    args.endpoint = args.endpoint or sorted(ENDPOINTS)
+    if args.requests is None and args.duration is None:
+        args.duration = 30
+
+    results = asyncio.run(main_async(args))
+    write_results('http_load', vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import sample_message, summarize, use_service, write_results
+
+use_service('api_gateway')
+
+from rabbitmq_client import AsyncRabbitMQClient, RabbitMQClient  # noqa: E402
+
+KINDS = {'queue_email': 'email', 'queue_admin': 'admin', 'queue_pedidos': 'pedido'}
+
+
+def bench_sync(queue_name, count):
+    """``RabbitMQClient.publish_message`` em laço (uma publicação por vez)"""
+    client = RabbitMQClient()
+    if not client.connect():
+        raise SystemExit("❌ Não foi possível conectar ao RabbitMQ")
+
+    kind = KINDS[queue_name]
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for index in range(count):
+        before = time.perf_counter()
+        if not client.publish_message(queue_name, sample_message(kind, index)):
+            errors += 1
+        latencies.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - started
+    client.close()
+    return summarize(count - errors, errors, elapsed, latencies)
+
+
+async def bench_async(queue_name, count, concurrency):
+    """``AsyncRabbitMQClient.publish_message`` com ``concurrency`` publicações simultâneas (micro-lotes + confirms)"""
+    client = AsyncRabbitMQClient()
+    if not await client.connect():
+        raise SystemExit("❌ Não foi possível conectar ao RabbitMQ")
+
+    kind = KINDS[queue_name]
+    latencies, errors = [], 0
+    next_index = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for index in next_index:
+            before = time.perf_counter()
+            if not await client.publish_message(queue_name, sample_message(kind, index)):
+                errors += 1
+            latencies.append(time.perf_counter() - before)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+    return summarize(count - errors, errors, elapsed, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de publicação (sem HTTP), cliente síncrono e assíncrono")
+    parser.add_argument('--queue', action='append', choices=sorted(KINDS), help="Repetível; padrão: todas")
+    parser.add_argument('--count', type=int, default=10000, help="Mensagens por fila e por cliente")
+    parser.add_argument('--concurrency', type=int, default=256, help="Publicações simultâneas no cliente assíncrono")
+    parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    parser.add_argument('--output', help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+    args.queue = args.queue or sorted(KINDS)
+
+    results = {}
+    for queue_name in args.queue:
+        if args.mode in ('sync', 'both'):
+            results[f"{queue_name}/sync"] = bench_sync(queue_name, args.count)
+        if args.mode in ('async', 'both'):
+            results[f"{queue_name}/async"] = asyncio.run(bench_async(queue_name, args.count, args.concurrency))
+    write_results('publish', vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
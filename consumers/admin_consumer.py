@@ -1,10 +1,12 @@
-import pika
-import json
 import logging
-import time
 import os
+import time
 from datetime import datetime
 
+from consumer_runtime import ConsumerRuntime
+from shared.logging_config import event
+from shared.topology import is_stream
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -13,41 +15,27 @@ logger = logging.getLogger(__name__)
 
 
 class AdminConsumer:
-    def __init__(self):
-        self.connection = None
-        self.channel = None
-        self.queue_name = 'queue_admin'
-        
-    def connect(self):
-        """Estabelece conexão com RabbitMQ"""
-        credentials = pika.PlainCredentials(
-            username=os.getenv('RABBITMQ_USER', 'admin'),
-            password=os.getenv('RABBITMQ_PASSWORD', 'admin123')
+    queue_name = 'queue_admin'
+    # Mensagens com falha são descartadas (não são reenfileiradas)
+    requeue_on_failure = False
+    # Fila expressa (severity error/critical), com canal e workers próprios
+    urgent_queue_name = 'queue_admin_urgent'
+    
+    def register(self, runtime):
+        """Registra o handler desta fila no runtime de consumers"""
+        if is_stream(self.queue_name):
+            # Auditoria como stream: cada leitor (ADMIN_STREAM_READER) relê o histórico no próprio ritmo.
+            # Sem fila expressa: o gateway manda error/critical para o próprio stream
+            return runtime.register_stream(
+                self.queue_name, self.process_admin_notification,
+                reader=os.getenv('ADMIN_STREAM_READER', 'admin-consumer'),
+                start_offset=os.getenv('ADMIN_STREAM_OFFSET', 'first')
+            )
+        runtime.register(
+            self.urgent_queue_name, self.process_admin_notification,
+            requeue_on_failure=self.requeue_on_failure, workers=runtime.urgent_workers, prefetch=runtime.urgent_workers
         )
-        
-        while True:
-            try:
-                self.connection = pika.BlockingConnection(
-                    pika.ConnectionParameters(
-                        host=os.getenv('RABBITMQ_HOST', 'rabbitmq'),
-                        port=int(os.getenv('RABBITMQ_PORT', 5672)),
-                        credentials=credentials,
-                        heartbeat=600,
-                        blocked_connection_timeout=300
-                    )
-                )
-                
-                self.channel = self.connection.channel()
-                self.channel.queue_declare(queue=self.queue_name, durable=True)
-                self.channel.basic_qos(prefetch_count=1)
-                
-                logger.info(f"✅ Consumer Administrativo conectado à fila '{self.queue_name}'")
-                return True
-                
-            except Exception as e:
-                logger.error(f"❌ Falha ao conectar ao RabbitMQ: {e}")
-                logger.info("🔄 Tentando reconectar em 5 segundos...")
-                time.sleep(5)
+        return runtime.register(self.queue_name, self.process_admin_notification, requeue_on_failure=self.requeue_on_failure)
     
     def process_admin_notification(self, message):
         """Processa notificações administrativas"""
@@ -57,76 +45,32 @@ class AdminConsumer:
             severity = message.get('severity', 'info')
             details = message.get('details', '')
             
-            logger.info(f"📊 Notificação Administrativa Recebida:")
-            logger.info(f"   Ação: {action}")
-            logger.info(f"   Usuário: {user}")
-            logger.info(f"   Severidade: {severity}")
-            logger.info(f"   Detalhes: {details}")
-            
-            # Registrar no log com formatação apropriada
-            log_message = f"[{action}] User: {user} - {details}"
-            
+            # O registro de auditoria é a própria função deste consumer: uma linha por
+            # notificação, no nível da severidade, com os campos estruturados
+            fields = event('admin_action', action=action, user=user, severity=severity, message_id=message.get('message_id'))
             if severity == 'error' or severity == 'critical':
-                logger.error(log_message)
+                logger.error("[%s] User: %s - %s", action, user, details, extra=fields)
                 # Aqui poderia enviar para um serviço de monitoramento (Sentry, etc.)
             elif severity == 'warning':
-                logger.warning(log_message)
+                logger.warning("[%s] User: %s - %s", action, user, details, extra=fields)
             else:
-                logger.info(log_message)
+                logger.info("[%s] User: %s - %s", action, user, details, extra=fields)
             
             # Simular processamento adicional
             time.sleep(0.5)
             
-            logger.info(f"✅ Notificação administrativa processada: {message.get('message_id')}")
+            logger.debug("✅ Notificação administrativa processada: %s", message.get('message_id'))
             return True
             
         except Exception as e:
             logger.error(f"❌ Erro ao processar notificação administrativa: {e}")
             return False
     
-    def callback(self, ch, method, properties, body):
-        """Callback chamado quando uma mensagem é recebida"""
-        try:
-            message = json.loads(body.decode())
-            
-            if self.process_admin_notification(message):
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-            else:
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-                
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Erro ao decodificar JSON: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-        except Exception as e:
-            logger.error(f"❌ Erro inesperado no callback: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-    
     def start_consuming(self):
         """Inicia o consumo de mensagens"""
-        if not self.connect():
-            logger.error("❌ Não foi possível iniciar o consumer administrativo")
-            return
-        
-        try:
-            self.channel.basic_consume(
-                queue=self.queue_name,
-                on_message_callback=self.callback,
-                auto_ack=False
-            )
-            
-            logger.info("🔄 Admin Consumer aguardando mensagens...")
-            logger.info("Pressione CTRL+C para sair")
-            
-            self.channel.start_consuming()
-            
-        except KeyboardInterrupt:
-            logger.info("👋 Encerrando Admin Consumer...")
-            if self.connection:
-                self.connection.close()
-        except Exception as e:
-            logger.error(f"❌ Erro no consumer administrativo: {e}")
-            if self.connection:
-                self.connection.close()
+        runtime = ConsumerRuntime('Admin Consumer')
+        self.register(runtime)
+        runtime.start()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """Executa o processamento em um pool de threads e devolve o ack à thread da conexão
+
+    O pika ``BlockingConnection`` não é thread-safe: ``basic_ack``/``basic_nack``
+    precisam rodar na thread que chama ``start_consuming``. Por isso o resultado de
+    cada worker é agendado com ``connection.add_callback_threadsafe``.
+    Mesmo com ``workers=1`` o handler roda fora da thread da conexão: assim uma
+    fila lenta não atrasa as outras filas do mesmo processo nem os heartbeats.
+    """
+
+    def __init__(self, workers=1, name='consumer'):
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{name}-worker")
+
+    def submit(self, connection, work, on_done):
+        """Roda ``work()`` em um worker e chama ``on_done(resultado)`` na thread da conexão"""
+        def run():
+            result = self._run(work)
+            try:
+                connection.add_callback_threadsafe(functools.partial(on_done, result))
+            except Exception as e:
+                # Conexão caiu durante o processamento: o broker reentregará a mensagem
+                logger.warning(f"⚠️ Não foi possível confirmar a mensagem: {e}")
+
+        self.executor.submit(run)
+
+    def _run(self, work):
+        try:
+            return work()
+        except Exception as e:
+            logger.error(f"❌ Erro inesperado no worker: {e}")
+            return False
+
+    def shutdown(self, wait=True):
+        """Aguarda os workers terminarem as mensagens em andamento"""
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,61 @@
+import logging
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MESSAGES_RECEIVED = Counter(
+    'consumer_messages_received_total', 'Mensagens entregues pelo broker', ['queue']
+)
+MESSAGES_SETTLED = Counter(
+    'consumer_messages_settled_total',
+    'Mensagens finalizadas por desfecho (acked, nacked, requeued, retried, deferred, dead_lettered, duplicates)',
+    ['queue', 'outcome']
+)
+HANDLER_DURATION = Histogram(
+    'consumer_handler_duration_seconds', 'Duração do handler por chamada (mensagem ou lote)', ['queue', 'mode'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+BATCH_SIZE = Histogram(
+    'consumer_batch_size', 'Mensagens por lote entregue ao handler de lote', ['queue'],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+END_TO_END = Histogram(
+    'consumer_end_to_end_seconds', 'Do enqueued_at gravado pelo gateway até o ack da mensagem', ['queue'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+INFLIGHT = Gauge('consumer_inflight_messages', 'Mensagens recebidas e ainda sem ack', ['queue'])
+PREFETCH = Gauge('consumer_prefetch_count', 'Prefetch configurado no canal', ['queue'])
+PREFETCH_UTILISATION = Gauge(
+    'consumer_prefetch_utilisation', 'Fração do prefetch ocupada por mensagens em andamento', ['queue']
+)
+RECONNECTS = Counter('consumer_reconnects_total', 'Reconexões ao RabbitMQ')
+
+# Envio de emails (agrupamento e limites por destinatário/domínio)
+EMAILS_SENT = Counter('email_sent_total', 'Emails enviados por tipo (single ou digest)', ['kind'])
+EMAILS_COALESCED = Counter('email_coalesced_messages_total', 'Notificações entregues dentro de um email agrupado')
+EMAIL_RATE_LIMITED = Counter(
+    'email_rate_limited_total', 'Envios adiados por limite de taxa', ['scope']
+)
+
+# Scheduler de notificações agendadas
+SCHEDULED_PENDING = Gauge('scheduler_pending_messages', 'Notificações agendadas aguardando o horário')
+SCHEDULED_RELEASED = Counter('scheduler_released_messages_total', 'Notificações agendadas liberadas na fila de destino')
+SCHEDULE_LAG = Histogram(
+    'scheduler_release_lag_seconds', 'Atraso entre o horário agendado e a liberação',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+
+
+def start_metrics_server():
+    """Sobe o servidor HTTP de métricas em METRICS_PORT (0 desliga)"""
+    port = int(os.getenv('METRICS_PORT', 9100))
+    if port <= 0:
+        return
+    start_http_server(port)
+    logger.info(f"📈 Métricas Prometheus disponíveis em :{port}/metrics")
@@ -0,0 +1,643 @@
+import pika
+import functools
+import logging
+import signal
+import time
+import os
+
+from concurrency import WorkerPool
+from dedup import create_dedup_store
+from consumer_metrics import (
+    MESSAGES_RECEIVED, MESSAGES_SETTLED, HANDLER_DURATION, BATCH_SIZE, END_TO_END,
+    INFLIGHT, PREFETCH, PREFETCH_UTILISATION, RECONNECTS, start_metrics_server
+)
+from retry import DeferQueues, RetryPolicy, RETRY_COUNT_HEADER, FAILURE_REASON_HEADER, republish
+from shared.logging_config import configure_logging, event
+from shared.codecs import CodecError, get_codec
+from shared.payloads import PayloadCodec, PayloadError
+from shared.topology import queue_arguments
+from shared.transport import TransportError, create_transport
+from stream_offsets import StreamCursor, StreamOffsetStore
+
+# Todo consumer importa o runtime: o logging do processo é configurado aqui
+configure_logging(os.getenv('SERVICE_NAME', 'consumers'))
+logger = logging.getLogger(__name__)
+
+
+class Delivery:
+    """Mensagem recebida, com o necessário para ack, retentativa ou DLQ"""
+
+    __slots__ = ('method', 'properties', 'body', 'message', 'key')
+
+    def __init__(self, method, properties, body, message=None):
+        self.method = method
+        self.properties = properties
+        self.body = body
+        self.message = message
+        self.key = None
+
+
+class Deferred:
+    """Resultado de handler (falso em contexto booleano): adiar a mensagem por ``delay`` segundos sem gastar uma tentativa"""
+
+    __slots__ = ('delay',)
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def __bool__(self):
+        return False
+
+
+class QueueHandler:
+    """Configuração de um handler registrado no runtime"""
+
+    def __init__(self, queue_name, handler, requeue_on_failure=False, workers=1, prefetch=1,
+                 batch_size=None, batch_timeout=0.2, retry=None, declare=None):
+        self.queue_name = queue_name
+        self.handler = handler
+        # Declaração da topologia a cada (re)conexão: por padrão só a fila, com o tipo configurado
+        self.declare = declare or self.declare_queue
+        self.requeue_on_failure = requeue_on_failure
+        # Com política de retry, falhas vão para filas de atraso/DLQ em vez de nack
+        self.retry = retry
+        self.workers = WorkerPool(workers, name=queue_name)
+        self.prefetch = max(prefetch, self.workers.workers)
+        self.channel = None
+        self.consumer_tag = None
+        # Marcado quando o broker cancela o consumer (ex.: fila removida); o canal é recriado
+        self.cancelled_by_broker = False
+        # Leitura de stream (StreamCursor): sem retry/dedup, o offset é registrado após cada mensagem
+        self.stream = None
+
+        # Modo lote: o handler recebe uma lista e devolve um bool por mensagem
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        if batch_size:
+            # Prefetch folgado para montar o próximo lote enquanto o atual é processado
+            self.prefetch = max(prefetch, batch_size * 2)
+        self.reset_batch()
+        self.inflight = 0
+        self.stats = {
+            "received": 0, "acked": 0, "nacked": 0, "requeued": 0,
+            "retried": 0, "deferred": 0, "dead_lettered": 0, "duplicates": 0, "handler_seconds": 0.0
+        }
+        PREFETCH.labels(queue_name).set(self.prefetch)
+
+    def count(self, outcome, amount=1):
+        """Atualiza as estatísticas locais e o contador Prometheus correspondente"""
+        self.stats[outcome] += amount
+        if outcome == "received":
+            MESSAGES_RECEIVED.labels(self.queue_name).inc(amount)
+        else:
+            MESSAGES_SETTLED.labels(self.queue_name, outcome).inc(amount)
+
+    def observe(self, duration, messages=1):
+        """Registra a duração do handler (por mensagem ou por lote)"""
+        self.stats["handler_seconds"] += duration
+        HANDLER_DURATION.labels(self.queue_name, 'batch' if self.batch_size else 'single').observe(duration)
+        if self.batch_size:
+            BATCH_SIZE.labels(self.queue_name).observe(messages)
+
+    def observe_end_to_end(self, message):
+        if not message:
+            return
+        # Notificações agendadas contam a partir do horário pedido, não do enfileiramento
+        started = [value for value in (message.get('enqueued_at'), message.get('deliver_at')) if isinstance(value, (int, float))]
+        if started:
+            END_TO_END.labels(self.queue_name).observe(max(0.0, time.time() - max(started)))
+
+    def track_inflight(self, delta):
+        self.inflight += delta
+        INFLIGHT.labels(self.queue_name).set(self.inflight)
+        PREFETCH_UTILISATION.labels(self.queue_name).set(self.inflight / self.prefetch if self.prefetch else 0)
+
+    def declare_queue(self, channel):
+        channel.queue_declare(queue=self.queue_name, durable=True, arguments=queue_arguments(self.queue_name))
+
+    def reset_batch(self):
+        """Descarta o estado de lote (mensagens não confirmadas serão reentregues)"""
+        self.buffer = []
+        self.batch_inflight = False
+        self.batch_due = False
+        self.timer = None
+
+
+class ConsumerRuntime:
+    """Runtime compartilhado pelos consumers
+
+    Cuida da conexão, decodificação, política de ack/nack, concorrência,
+    encerramento gracioso e estatísticas. Cada fila só registra o seu handler
+    (``message -> bool``); um mesmo processo pode hospedar vários handlers,
+    cada um em seu próprio canal e com seu próprio prefetch.
+    """
+
+    def __init__(self, name='consumers'):
+        self.name = name
+        self.handlers = []
+        self.connection = None
+        # TRANSPORT=amqp: RabbitMQ com failover entre nós, heartbeat curto e backoff com jitter;
+        # TRANSPORT=embedded: broker em processo (shared.embedded_queue)
+        self.transport = create_transport()
+        # Canal com publisher confirms usado para mover mensagens para retry/DLQ
+        self.retry_channel = None
+        self.retry_policy = RetryPolicy.from_env() if os.getenv('RETRY_ENABLED', 'true').lower() == 'true' else None
+        self.defer_queues = DeferQueues.from_env()
+        self._declared_defer_queues = set()
+        # Idempotência: duplicatas (retry do cliente, redelivery do broker) recebem ack sem reprocessar
+        self.dedup = create_dedup_store()
+        # Descompressão / claim-check (o corpo original é mantido para retry e DLQ)
+        self.payloads = PayloadCodec.from_env()
+        self.inflight = 0
+        self.shutdown_timeout = float(os.getenv('CONSUMER_SHUTDOWN_TIMEOUT', 30))
+        self.stats_interval = float(os.getenv('CONSUMER_STATS_INTERVAL', 60))
+        # Modo lote (desligado com CONSUMER_BATCH_SIZE <= 1)
+        self.batch_size = int(os.getenv('CONSUMER_BATCH_SIZE', 1))
+        self.batch_timeout_ms = float(os.getenv('CONSUMER_BATCH_TIMEOUT_MS', 200))
+        # Workers dedicados às filas expressas, independentes do backlog da fila normal
+        self.urgent_workers = int(os.getenv('URGENT_CONSUMER_WORKERS', 2))
+        self._stopping = False
+        self._cancelled = False
+        self._on_shutdown = []
+
+    def on_shutdown(self, callback):
+        """Registra uma limpeza executada no fim de ``start`` (ex.: fechar sessões SMTP do pool)"""
+        self._on_shutdown.append(callback)
+
+    def register(self, queue_name, handler, requeue_on_failure=False, workers=None, prefetch=None, declare=None):
+        """Registra um handler para a fila; workers/prefetch vêm do ambiente quando omitidos
+
+        ``declare(channel)`` substitui a declaração padrão da fila (ex.: shards com bindings).
+        """
+        spec = QueueHandler(
+            queue_name,
+            handler,
+            requeue_on_failure=requeue_on_failure,
+            workers=workers if workers is not None else int(os.getenv('CONSUMER_WORKERS', 1)),
+            prefetch=prefetch if prefetch is not None else int(os.getenv('CONSUMER_PREFETCH', 1)),
+            retry=self.retry_policy,
+            declare=declare
+        )
+        self.handlers.append(spec)
+        return spec
+
+    def register_batch(self, queue_name, batch_handler, requeue_on_failure=False, batch_size=None,
+                       batch_timeout_ms=None, prefetch=None, declare=None):
+        """Registra um handler de lote (``list[message] -> list[bool]``)
+
+        As mensagens são acumuladas até ``batch_size`` ou ``batch_timeout_ms``; os
+        sucessos são confirmados com um único ``basic_ack(multiple=True)`` e as
+        falhas recebem ``basic_nack`` individual. O lote roda na thread do pool da
+        fila, nunca na da conexão: um lote SMTP mais longo que o heartbeat não
+        derruba a conexão (e com ela a reentrega do lote inteiro).
+        """
+        spec = QueueHandler(
+            queue_name,
+            batch_handler,
+            requeue_on_failure=requeue_on_failure,
+            workers=1,  # Um lote por vez por canal, para o ack múltiplo não cobrir outro lote
+            prefetch=prefetch if prefetch is not None else int(os.getenv('CONSUMER_PREFETCH', 1)),
+            batch_size=batch_size or self.batch_size,
+            batch_timeout=(batch_timeout_ms if batch_timeout_ms is not None else self.batch_timeout_ms) / 1000,
+            retry=self.retry_policy,
+            declare=declare
+        )
+        self.handlers.append(spec)
+        return spec
+
+    def register_stream(self, queue_name, handler, reader, start_offset='first', prefetch=None, offsets=None):
+        """Registra um leitor de stream (fila declarada com QUEUE_TYPE_<FILA>=stream)
+
+        Cada ``reader`` mantém o próprio offset, então vários leitores independentes
+        podem reler o histórico sem publicações duplicadas. O handler roda em um
+        único worker para preservar a ordem; uma falha é registrada e o leitor
+        segue adiante (o offset aparece no log para reprocessar, se preciso).
+        """
+        spec = QueueHandler(
+            queue_name,
+            handler,
+            workers=1,
+            prefetch=prefetch if prefetch is not None else int(os.getenv('STREAM_PREFETCH', 500))
+        )
+        spec.stream = StreamCursor(reader, offsets or StreamOffsetStore.from_env(), start_offset)
+        self.handlers.append(spec)
+        return spec
+
+    def connect(self):
+        """Estabelece conexão com RabbitMQ e abre um canal por handler"""
+        while not self._stopping:
+            self.connection = self.transport.connect(should_stop=lambda: self._stopping)
+            if self.connection is None:
+                break
+            try:
+                self.inflight = 0
+                self._cancelled = False
+                for spec in self.handlers:
+                    spec.track_inflight(-spec.inflight)
+                self._open_retry_channel()
+
+                for spec in self.handlers:
+                    spec.reset_batch()
+                    self._open_channel(spec)
+                    logger.info(
+                        f"✅ Consumer conectado à fila '{spec.queue_name}' "
+                        f"(workers={spec.workers.workers}, prefetch={spec.prefetch}, lote={spec.batch_size or 1})"
+                    )
+                return True
+
+            except pika.exceptions.AMQPError as e:
+                # A conexão caiu durante a declaração da topologia: recomeça com backoff
+                logger.error(f"❌ Falha ao declarar filas/consumers: {e!r}")
+                if self.connection.is_open:
+                    self.connection.close()
+
+            except TransportError as e:
+                # Topologia que o transporte não suporta (ex.: stream no embarcado): não adianta repetir
+                logger.error(f"❌ Topologia não suportada pelo transporte: {e}")
+                self.connection.close()
+                break
+
+        return False
+
+    def _open_retry_channel(self):
+        self.retry_channel = self.connection.channel()
+        self.retry_channel.confirm_delivery()
+        self._declared_defer_queues = set()
+
+    def _open_channel(self, spec):
+        """(Re)declara a fila, as filas de retry e o QoS e registra o consumer em um canal novo"""
+        spec.channel = self.connection.channel()
+        spec.cancelled_by_broker = False
+        spec.declare(spec.channel)
+        if spec.retry is not None:
+            spec.retry.declare(self.retry_channel, spec.queue_name)
+        spec.channel.basic_qos(prefetch_count=spec.prefetch)
+        spec.channel.add_on_cancel_callback(functools.partial(self._on_broker_cancel, spec))
+        arguments = None
+        if spec.stream is not None:
+            # Retoma do último offset processado por este leitor (ou da posição inicial)
+            arguments = {'x-stream-offset': spec.stream.resume_offset()}
+            logger.info(f"📜 Leitor '{spec.stream.reader}' do stream '{spec.queue_name}' a partir de {arguments['x-stream-offset']}")
+        spec.consumer_tag = spec.channel.basic_consume(
+            queue=spec.queue_name,
+            on_message_callback=functools.partial(self.callback, spec),
+            auto_ack=False,
+            arguments=arguments
+        )
+
+    def _on_broker_cancel(self, spec, method_frame):
+        logger.warning(f"⚠️ Broker cancelou o consumer da fila '{spec.queue_name}'")
+        spec.cancelled_by_broker = True
+
+    def _recover_channels(self):
+        """Recria na hora canais fechados pelo broker, sem derrubar a conexão inteira
+
+        Mensagens ainda no buffer de lote pertenciam ao canal antigo e serão
+        reentregues pelo broker; as que estão nos workers recebem o aviso de
+        canal fechado em ``finish``.
+        """
+        if self.retry_channel is None or self.retry_channel.is_closed:
+            logger.warning("⚠️ Canal de retry fechado, reabrindo...")
+            self._open_retry_channel()
+
+        for spec in self.handlers:
+            if spec.channel is None or self._cancelled:
+                continue
+            if not (spec.channel.is_closed or spec.cancelled_by_broker):
+                continue
+
+            logger.warning(f"⚠️ Canal da fila '{spec.queue_name}' fechado, recriando consumer...")
+            dropped = len(spec.buffer)
+            self.inflight -= dropped
+            spec.track_inflight(-dropped)
+            if spec.timer is not None:
+                self.connection.remove_timeout(spec.timer)
+            spec.reset_batch()
+            if spec.channel.is_open:
+                spec.channel.close()
+            self._open_channel(spec)
+            RECONNECTS.inc()
+
+    def callback(self, spec, ch, method, properties, body):
+        """Callback chamado quando uma mensagem é recebida"""
+        spec.count("received")
+        delivery = Delivery(method, properties, body)
+        try:
+            payload = self.payloads.unpack(body, properties.content_encoding, properties.headers)
+            # O codec é escolhido pelo content_type de cada mensagem (JSON, msgpack...)
+            delivery.message = get_codec(properties.content_type).decode(payload)
+        except (PayloadError, CodecError) as e:
+            # Mensagem malformada nunca vai funcionar: vai direto para a DLQ
+            logger.error(f"❌ Erro ao decodificar mensagem da fila '{spec.queue_name}': {e}")
+            self.dead_letter(spec, ch, delivery, f"decode: {e}")
+            return
+
+        # Em streams a releitura é intencional: sem deduplicação
+        if self.dedup is not None and spec.stream is None:
+            delivery.key = delivery.message.get('message_id') or properties.message_id
+            if delivery.key and not self.dedup.claim(delivery.key, redelivered=method.redelivered):
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                self.payloads.release(properties.headers)
+                spec.count("duplicates")
+                logger.info(
+                    "♻️ Mensagem duplicada %s ignorada na fila '%s'", delivery.key, spec.queue_name,
+                    extra=event('duplicate', queue=spec.queue_name, message_id=delivery.key)
+                )
+                return
+
+        self.inflight += 1
+        spec.track_inflight(1)
+        if spec.batch_size:
+            spec.buffer.append(delivery)
+            self._schedule_batch(spec)
+            return
+
+        spec.workers.submit(
+            self.connection,
+            functools.partial(self._handle, spec, delivery.message),
+            functools.partial(self.finish, spec, ch, delivery)
+        )
+
+    def _handle(self, spec, message):
+        """Executa o handler no worker e mede sua duração"""
+        started = time.monotonic()
+        try:
+            success = spec.handler(message)
+        except Exception as e:
+            logger.error(f"❌ Erro inesperado no handler da fila '{spec.queue_name}': {e}")
+            success = False
+        return success, time.monotonic() - started
+
+    def finish(self, spec, ch, delivery, outcome):
+        """Aplica a política de ack/nack (executado na thread da conexão)"""
+        success, duration = outcome
+        self.inflight -= 1
+        spec.track_inflight(-1)
+        spec.observe(duration)
+        self._settle_key(delivery, success)
+        if not ch.is_open:
+            logger.warning(f"⚠️ Canal fechado; mensagem {delivery.message.get('message_id')} será reentregue")
+            return
+
+        if spec.stream is not None:
+            # O ack em stream só libera crédito do prefetch; a posição do leitor é o offset salvo
+            ch.basic_ack(delivery_tag=delivery.method.delivery_tag)
+            spec.stream.commit(delivery.properties)
+            if success:
+                spec.count("acked")
+                spec.observe_end_to_end(delivery.message)
+            else:
+                spec.count("nacked")
+                logger.error(
+                    f"❌ Falha no leitor '{spec.stream.reader}' do stream '{spec.queue_name}' "
+                    f"no offset {StreamCursor.offset_of(delivery.properties)}"
+                )
+            return
+
+        if success:
+            ch.basic_ack(delivery_tag=delivery.method.delivery_tag)
+            self.payloads.release(delivery.properties.headers)
+            spec.count("acked")
+            spec.observe_end_to_end(delivery.message)
+        elif isinstance(success, Deferred):
+            self.defer(spec, ch, delivery, success.delay)
+        else:
+            self.fail(spec, ch, delivery)
+
+    def _settle_key(self, delivery, success):
+        """Marca a chave de idempotência como concluída ou a libera para nova tentativa"""
+        if self.dedup is None or not delivery.key:
+            return
+        if success:
+            self.dedup.complete(delivery.key)
+        else:
+            self.dedup.release(delivery.key)
+
+    def fail(self, spec, ch, delivery, reason='handler'):
+        """Trata uma falha: retentativa com backoff, DLQ, requeue ou descarte conforme a política"""
+        message_id = delivery.message.get('message_id') if delivery.message else None
+        tag = delivery.method.delivery_tag
+
+        if spec.retry is not None:
+            target, attempt = spec.retry.next_destination(spec.queue_name, delivery.properties)
+            if self._move(ch, delivery, target, {RETRY_COUNT_HEADER: attempt, FAILURE_REASON_HEADER: reason}):
+                if target == spec.retry.dead_letter_queue(spec.queue_name):
+                    spec.count("dead_lettered")
+                    logger.error(f"☠️ Mensagem {message_id} da fila '{spec.queue_name}' enviada para a DLQ após {attempt - 1} tentativas")
+                else:
+                    spec.count("retried")
+                    logger.warning(
+                        "🔁 Mensagem %s da fila '%s' agendada para a tentativa %d (%s)",
+                        message_id, spec.queue_name, attempt, target
+                    )
+            return
+
+        if spec.requeue_on_failure:
+            ch.basic_nack(delivery_tag=tag, requeue=True)
+            spec.count("requeued")
+            logger.error(f"❌ Falha na mensagem {message_id} da fila '{spec.queue_name}'. Reenfileirando...")
+        else:
+            ch.basic_nack(delivery_tag=tag, requeue=False)
+            self.payloads.release(delivery.properties.headers)
+            spec.count("nacked")
+            logger.error(f"❌ Falha na mensagem {message_id} da fila '{spec.queue_name}'")
+
+    def defer(self, spec, ch, delivery, delay):
+        """Adia a mensagem pela fila de espera que cobre ``delay`` segundos, sem contar tentativa"""
+        target, delay_ms = self.defer_queues.queue_for(spec.queue_name, delay)
+        if target not in self._declared_defer_queues:
+            try:
+                self.defer_queues.declare(self.retry_channel, spec.queue_name, delay_ms)
+            except (pika.exceptions.AMQPError, TransportError) as e:
+                logger.error(f"❌ Falha ao declarar a fila de espera '{target}': {e}")
+                ch.basic_nack(delivery_tag=delivery.method.delivery_tag, requeue=True)
+                spec.count("requeued")
+                return
+            self._declared_defer_queues.add(target)
+        if self._move(ch, delivery, target, {FAILURE_REASON_HEADER: 'deferred'}):
+            spec.count("deferred")
+
+    def dead_letter(self, spec, ch, delivery, reason):
+        """Envia a mensagem direto para a DLQ (ou descarta, sem política de retry)"""
+        if spec.retry is not None:
+            target = spec.retry.dead_letter_queue(spec.queue_name)
+            attempt = spec.retry.attempts(delivery.properties)
+            if self._move(ch, delivery, target, {RETRY_COUNT_HEADER: attempt, FAILURE_REASON_HEADER: reason}):
+                spec.count("dead_lettered")
+            return
+
+        ch.basic_nack(delivery_tag=delivery.method.delivery_tag, requeue=False)
+        spec.count("nacked")
+
+    def _move(self, ch, delivery, target, headers):
+        """Republica na fila de destino (com confirm) e só então confirma a original"""
+        try:
+            republish(self.retry_channel, target, delivery.properties, delivery.body, headers)
+        except (pika.exceptions.AMQPError, TransportError) as e:
+            # Sem confirmação do destino a mensagem não pode ser perdida: devolve para a fila
+            logger.error(f"❌ Falha ao mover mensagem para '{target}': {e}")
+            ch.basic_nack(delivery_tag=delivery.method.delivery_tag, requeue=True)
+            return False
+
+        ch.basic_ack(delivery_tag=delivery.method.delivery_tag)
+        return True
+
+    def _schedule_batch(self, spec):
+        """Despacha o próximo lote se estiver cheio, vencido ou em encerramento; senão arma o timer"""
+        if spec.batch_inflight or not spec.buffer:
+            return
+
+        if len(spec.buffer) >= spec.batch_size or spec.batch_due or self._stopping:
+            self._dispatch_batch(spec)
+        elif spec.timer is None:
+            spec.timer = self.connection.call_later(
+                spec.batch_timeout, functools.partial(self._on_batch_timer, spec)
+            )
+
+    def _on_batch_timer(self, spec):
+        spec.timer = None
+        spec.batch_due = True
+        self._schedule_batch(spec)
+
+    def _dispatch_batch(self, spec):
+        if spec.timer is not None:
+            self.connection.remove_timeout(spec.timer)
+            spec.timer = None
+        spec.batch_due = False
+        spec.batch_inflight = True
+
+        batch, spec.buffer = spec.buffer[:spec.batch_size], spec.buffer[spec.batch_size:]
+        spec.workers.submit(
+            self.connection,
+            functools.partial(self._handle_batch, spec, [delivery.message for delivery in batch]),
+            functools.partial(self.finish_batch, spec, spec.channel, batch)
+        )
+
+    def _handle_batch(self, spec, messages):
+        """Executa o handler de lote no worker; qualquer erro falha o lote inteiro"""
+        started = time.monotonic()
+        try:
+            results = list(spec.handler(messages))
+            if len(results) != len(messages):
+                raise ValueError(f"handler devolveu {len(results)} resultados para {len(messages)} mensagens")
+        except Exception as e:
+            logger.error(f"❌ Erro inesperado no handler de lote da fila '{spec.queue_name}': {e}")
+            results = [False] * len(messages)
+        return results, time.monotonic() - started
+
+    def finish_batch(self, spec, ch, batch, outcome):
+        """Falhas tratadas uma a uma (retry/DLQ/nack) e um único ack múltiplo para os sucessos"""
+        results, duration = outcome
+        spec.batch_inflight = False
+        self.inflight -= len(batch)
+        spec.track_inflight(-len(batch))
+        spec.observe(duration, len(batch))
+        for delivery, success in zip(batch, results):
+            self._settle_key(delivery, success)
+
+        if not ch.is_open:
+            logger.warning(f"⚠️ Canal fechado; lote de {len(batch)} mensagens será reentregue")
+            return
+
+        last_success = None
+        for delivery, success in zip(batch, results):
+            if success:
+                last_success = delivery.method.delivery_tag
+            elif isinstance(success, Deferred):
+                self.defer(spec, ch, delivery, success.delay)
+            else:
+                self.fail(spec, ch, delivery)
+
+        # Lotes saem do buffer em ordem de entrega, então as tags <= last_success
+        # pertencem a este lote (as falhas já foram resolvidas acima)
+        if last_success is not None:
+            ch.basic_ack(delivery_tag=last_success, multiple=True)
+            spec.count("acked", results.count(True))
+            for delivery, success in zip(batch, results):
+                if success:
+                    self.payloads.release(delivery.properties.headers)
+                    spec.observe_end_to_end(delivery.message)
+
+        failures = sum(1 for success in results if not success and not isinstance(success, Deferred))
+        if failures:
+            logger.error(f"❌ Lote da fila '{spec.queue_name}': {failures}/{len(batch)} mensagens com falha")
+
+        self._schedule_batch(spec)
+
+    def log_stats(self):
+        for spec in self.handlers:
+            stats = spec.stats
+            done = stats["acked"] + stats["nacked"] + stats["requeued"] + stats["retried"] + stats["deferred"] + stats["dead_lettered"]
+            average = stats["handler_seconds"] / done if done else 0.0
+            logger.info(
+                f"📊 [{spec.queue_name}] recebidas={stats['received']} ack={stats['acked']} "
+                f"nack={stats['nacked']} requeue={stats['requeued']} retry={stats['retried']} adiadas={stats['deferred']} "
+                f"dlq={stats['dead_lettered']} duplicadas={stats['duplicates']} tempo_medio={average:.3f}s"
+            )
+
+    def stop(self, *args):
+        """Solicita encerramento gracioso (seguro para usar como signal handler)"""
+        self._stopping = True
+
+    def _cancel_consumers(self):
+        """Para de receber novas mensagens; as em andamento ainda recebem ack"""
+        for spec in self.handlers:
+            if spec.channel is not None and spec.channel.is_open and spec.consumer_tag:
+                spec.channel.basic_cancel(spec.consumer_tag)
+            if spec.batch_size:
+                # Processa imediatamente o que já estava acumulado
+                self._schedule_batch(spec)
+        self._cancelled = True
+        logger.info(f"⏳ Aguardando {self.inflight} mensagem(ns) em andamento...")
+
+    def start(self):
+        """Inicia o consumo de todas as filas registradas até receber SIGTERM/SIGINT"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        start_metrics_server()
+
+        logger.info(f"🔄 {self.name} aguardando mensagens...")
+        logger.info("Pressione CTRL+C para sair")
+
+        next_stats = time.monotonic() + self.stats_interval
+        deadline = None
+
+        while self.connect():
+            try:
+                while True:
+                    self.connection.process_data_events(time_limit=1)
+                    self._recover_channels()
+
+                    if time.monotonic() >= next_stats:
+                        self.log_stats()
+                        next_stats = time.monotonic() + self.stats_interval
+
+                    if self._stopping:
+                        if not self._cancelled:
+                            self._cancel_consumers()
+                            deadline = time.monotonic() + self.shutdown_timeout
+                        if self.inflight <= 0 or time.monotonic() >= deadline:
+                            break
+
+                break
+
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as e:
+                RECONNECTS.inc()
+                logger.error(f"❌ Conexão com RabbitMQ perdida: {e!r}")
+                logger.info("🔄 Reconectando...")
+                if self.connection.is_open:
+                    self.connection.close()
+
+        logger.info(f"👋 Encerrando {self.name}...")
+        for spec in self.handlers:
+            spec.workers.shutdown(wait=False)
+            if spec.stream is not None:
+                spec.stream.store.flush()
+        for callback in self._on_shutdown:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"❌ Erro ao encerrar {callback!r}: {e}")
+        self.log_stats()
+        if self.connection and self.connection.is_open:
+            self.connection.close()
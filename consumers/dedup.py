@@ -0,0 +1,106 @@
+import importlib
+import logging
+from abc import ABC, abstractmethod
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+
+
+class DedupStore(ABC):
+    """Interface do armazenamento de idempotência usado pelos consumers
+
+    ``claim`` reserva a chave antes do processamento e devolve ``False`` se ela
+    já foi processada (ou está em processamento); ``complete`` marca o sucesso
+    e ``release`` libera a chave após uma falha, para a retentativa poder rodar.
+    Uma reentrega do broker (``redelivered``) pode retomar uma chave que ficou
+    "em processamento" quando a conexão caiu antes do ack. Um backend que não
+    implemente os três métodos falha já na construção.
+    """
+
+    @abstractmethod
+    def claim(self, key, redelivered=False):
+        ...
+
+    @abstractmethod
+    def complete(self, key):
+        ...
+
+    @abstractmethod
+    def release(self, key):
+        ...
+
+
+class InMemoryDedupStore(DedupStore):
+    """Dedup em memória, limitado por quantidade de chaves e com expiração por TTL"""
+
+    def __init__(self, max_entries=100000, ttl=3600, in_progress_ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+        self._entries = OrderedDict()  # chave -> (estado, expira_em), em ordem de inserção
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Entradas mais antigas ficam no início: remove as expiradas e o excesso
+        while self._entries:
+            key, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def claim(self, key, redelivered=False):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                if not (redelivered and entry[0] == IN_PROGRESS):
+                    return False
+            self._entries[key] = (IN_PROGRESS, now + self.in_progress_ttl)
+            self._entries.move_to_end(key)
+            self._evict(now)
+            return True
+
+    def complete(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (DONE, now + self.ttl)
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+    def release(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def create_dedup_store():
+    """Cria o backend configurado em DEDUP_BACKEND: memory, none ou 'modulo:Classe'"""
+    backend = os.getenv('DEDUP_BACKEND', 'memory')
+
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return InMemoryDedupStore(
+            max_entries=int(os.getenv('DEDUP_MAX_ENTRIES', 100000)),
+            ttl=float(os.getenv('DEDUP_TTL_SECONDS', 3600))
+        )
+
+    # Backend plugável (ex.: um store em Redis compartilhado entre réplicas)
+    module_name, _, class_name = backend.partition(':')
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    store = store_class()
+    # Backends sem herdar de DedupStore também são validados na subida, não na primeira mensagem
+    missing = sorted(name for name in DedupStore.__abstractmethods__ if not callable(getattr(store, name, None)))
+    if missing:
+        raise TypeError(f"Backend de deduplicação '{backend}' não implementa: {', '.join(missing)}")
+    logger.info(f"🧷 Backend de deduplicação: {backend}")
+    return store
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import time
+
+from retry import RetryPolicy, RETRY_COUNT_HEADER, FAILURE_REASON_HEADER, republish
+from shared.broker import ConnectionManager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def connect():
+    """Abre uma conexão com o RabbitMQ usando as mesmas variáveis dos consumers"""
+    connection = ConnectionManager().connect(max_attempts=5)
+    if connection is None:
+        raise SystemExit("❌ Não foi possível conectar ao RabbitMQ")
+    return connection
+
+
+def replay(queue_name, rate, limit=None, target=None, dry_run=False):
+    """Republica mensagens de ``<fila>.dlq`` na fila original a ``rate`` mensagens/s
+
+    Cada mensagem é republicada com o contador de tentativas zerado e só é
+    removida da DLQ depois do confirm do broker. Em ``dry_run`` lista no
+    máximo um prefetch de mensagens sem removê-las.
+    """
+    dlq = RetryPolicy.dead_letter_queue(queue_name)
+    target = target or queue_name
+    interval = 1.0 / rate if rate > 0 else 0.0
+
+    connection = connect()
+    source = connection.channel()
+    source.basic_qos(prefetch_count=max(1, min(int(rate) or 1000, 1000)))
+    publisher = connection.channel()
+    publisher.confirm_delivery()
+
+    replayed = 0
+    started = time.monotonic()
+    try:
+        for method, properties, body in source.consume(dlq, auto_ack=False, inactivity_timeout=1):
+            if method is None:
+                # DLQ esvaziou
+                break
+
+            if dry_run:
+                headers = properties.headers or {}
+                logger.info(
+                    f"🔎 {properties.message_id}: tentativas={headers.get(RETRY_COUNT_HEADER)} "
+                    f"motivo={headers.get(FAILURE_REASON_HEADER)}"
+                )
+                # Sem ack: as mensagens voltam para a DLQ quando a conexão fecha
+            else:
+                republish(publisher, target, properties, body, {RETRY_COUNT_HEADER: 0})
+                source.basic_ack(delivery_tag=method.delivery_tag)
+
+            replayed += 1
+            if limit is not None and replayed >= limit:
+                break
+
+            # Controle de taxa: mantém o ritmo médio em 'rate' mensagens/s
+            wait = started + replayed * interval - time.monotonic()
+            if wait > 0:
+                connection.sleep(wait)
+    finally:
+        source.cancel()
+        connection.close()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"✅ {replayed} mensagem(ns) de '{dlq}' republicada(s) em '{target}' em {elapsed:.1f}s")
+    return replayed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Republica mensagens da DLQ na fila original com taxa controlada")
+    parser.add_argument('queue', help="Fila original (ex.: queue_pedidos); lê de <fila>.dlq")
+    parser.add_argument('--rate', type=float, default=100, help="Mensagens por segundo (0 = sem limite)")
+    parser.add_argument('--limit', type=int, default=None, help="Máximo de mensagens a republicar")
+    parser.add_argument('--target', default=None, help="Fila de destino (padrão: a fila original)")
+    parser.add_argument('--dry-run', action='store_true', help="Apenas lista as mensagens, sem republicar")
+    args = parser.parse_args()
+
+    replay(args.queue, args.rate, limit=args.limit, target=args.target, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
-import pika
-import json
 import logging
 import time
 import os
 from datetime import datetime
+from email.message import EmailMessage
+
+from consumer_metrics import EMAILS_COALESCED, EMAILS_SENT
+from consumer_runtime import ConsumerRuntime, Deferred
+from email_throttle import EmailRateLimiter, coalesce
+from smtp_pool import SMTPConnectionPool
+from template_engine import TemplateCache
+from shared.logging_config import event
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,108 +19,197 @@ logger = logging.getLogger(__name__)
 
 
 class EmailConsumer:
+    queue_name = 'queue_email'
+    # Mensagens com falha são descartadas (não são reenfileiradas)
+    requeue_on_failure = False
+    # Fila expressa (priority=alta), com canal e workers próprios
+    urgent_queue_name = 'queue_email_urgent'
+    
     def __init__(self):
-        self.connection = None
-        self.channel = None
-        self.queue_name = 'queue_email'
-        
-    def connect(self):
-        """Estabelece conexão com RabbitMQ"""
-        credentials = pika.PlainCredentials(
-            username=os.getenv('RABBITMQ_USER', 'admin'),
-            password=os.getenv('RABBITMQ_PASSWORD', 'admin123')
+        # EMAIL_BACKEND=smtp envia de verdade usando o pool; "simulated" mantém a simulação
+        self.backend = os.getenv('EMAIL_BACKEND', 'simulated').lower()
+        self.sender = os.getenv('SMTP_FROM', 'notificacoes@localhost')
+        self.smtp_pool = SMTPConnectionPool.from_env() if self.backend == 'smtp' else None
+        self.templates = TemplateCache.from_env()
+        # Agrupamento: notificações para o mesmo destinatário dentro da janela viram um único email
+        self.coalesce_window_ms = float(os.getenv('EMAIL_COALESCE_WINDOW_MS', 0))
+        self.coalesce_max = int(os.getenv('EMAIL_COALESCE_MAX', 20))
+        self.coalesce_batch = int(os.getenv('EMAIL_COALESCE_BATCH', 500))
+        self.digest_subject = os.getenv('EMAIL_DIGEST_SUBJECT', '{count} notificações: {subject}')
+        self.rate_limiter = EmailRateLimiter.from_env()
+    
+    def register(self, runtime):
+        """Registra o handler desta fila no runtime de consumers"""
+        if self.smtp_pool is not None:
+            # Sessões ociosas recebem QUIT ao encerrar, em vez de caírem com o processo
+            runtime.on_shutdown(self.smtp_pool.close)
+        runtime.register(
+            self.urgent_queue_name, self.process_email,
+            requeue_on_failure=self.requeue_on_failure, workers=runtime.urgent_workers, prefetch=runtime.urgent_workers
         )
+        if self.coalesce_window_ms > 0:
+            # A janela é o timeout do lote: as mensagens esperam sem ack no buffer do runtime
+            # (um lote cheio sai antes, então a janela é o atraso máximo, não o mínimo)
+            return runtime.register_batch(
+                self.queue_name, self.process_email_batch, requeue_on_failure=self.requeue_on_failure,
+                batch_size=self.coalesce_batch, batch_timeout_ms=self.coalesce_window_ms
+            )
+        if runtime.batch_size > 1:
+            return runtime.register_batch(self.queue_name, self.process_email_batch, requeue_on_failure=self.requeue_on_failure)
+        return runtime.register(self.queue_name, self.process_email, requeue_on_failure=self.requeue_on_failure)
+    
+    def build_email(self, message, rendered=None):
+        """Monta o EmailMessage a partir da mensagem da fila (renderizando o template, se houver)"""
+        if rendered is None and message.get('template'):
+            rendered = self.templates.render(message)
         
-        while True:
-            try:
-                self.connection = pika.BlockingConnection(
-                    pika.ConnectionParameters(
-                        host=os.getenv('RABBITMQ_HOST', 'rabbitmq'),
-                        port=int(os.getenv('RABBITMQ_PORT', 5672)),
-                        credentials=credentials,
-                        heartbeat=600,
-                        blocked_connection_timeout=300
-                    )
-                )
-                
-                self.channel = self.connection.channel()
-                self.channel.queue_declare(queue=self.queue_name, durable=True)
-                
-                # Configurar QoS para processar uma mensagem por vez
-                self.channel.basic_qos(prefetch_count=1)
-                
-                logger.info(f"✅ Consumer de Email conectado à fila '{self.queue_name}'")
-                return True
-                
-            except Exception as e:
-                logger.error(f"❌ Falha ao conectar ao RabbitMQ: {e}")
-                logger.info("🔄 Tentando reconectar em 5 segundos...")
-                time.sleep(5)
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = message['to']
+        email['Subject'] = message.get('subject', '')
+        if message.get('message_id'):
+            email['X-Notification-Id'] = str(message['message_id'])
+        if message.get('priority') == 'alta':
+            email['X-Priority'] = '1'
+        
+        if rendered is None:
+            email.set_content(message.get('body', ''))
+        elif rendered[1]:
+            # Template HTML: o body original segue como alternativa em texto puro
+            email.set_content(message.get('body', ''))
+            email.add_alternative(rendered[0], subtype='html')
+        else:
+            email.set_content(rendered[0])
+        return email
+    
+    def build_digest(self, messages, rendered):
+        """Junta várias notificações para o mesmo destinatário em um único email de texto"""
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = messages[0]['to']
+        email['Subject'] = self.digest_subject.format(count=len(messages), subject=messages[0].get('subject', ''))
+        email['X-Notification-Id'] = ', '.join(str(message['message_id']) for message in messages if message.get('message_id'))
+        
+        sections = []
+        for message, body in zip(messages, rendered):
+            # Templates HTML entram pelo body em texto puro, como na alternativa do email individual
+            text = body[0] if body is not None and not body[1] else message.get('body', '')
+            subject = message.get('subject', '')
+            sections.append(f"{subject}\n{'-' * len(subject)}\n{text}" if subject else text)
+        email.set_content('\n\n'.join(sections))
+        return email
     
     def process_email(self, message):
-        """Simula o processamento de um email"""
+        """Envia um email (via pool SMTP ou simulação)"""
         try:
-            logger.info(f"📧 Processando email para: {message.get('to')}")
-            logger.info(f"   Assunto: {message.get('subject')}")
-            logger.info(f"   Prioridade: {message.get('priority', 'normal')}")
-            logger.info(f"   ID da mensagem: {message.get('message_id')}")
+            logger.debug(
+                "📧 Processando email %s para %s (assunto=%r, prioridade=%s)",
+                message.get('message_id'), message.get('to'), message.get('subject'), message.get('priority', 'normal')
+            )
+            
+            wait = self.rate_limiter.acquire(message['to']) if message.get('to') else 0
+            if wait:
+                logger.warning("⏳ Email %s adiado %.1fs (limite de envio)", message.get('message_id'), wait)
+                return Deferred(wait)
             
-            # Simular envio de email (em produção, integrar com SendGrid, SMTP, etc.)
-            time.sleep(1)  # Simular tempo de processamento
+            email = self.build_email(message)
             
-            logger.info(f"✅ Email enviado com sucesso para {message.get('to')}")
+            if self.smtp_pool is not None:
+                if not self.smtp_pool.send(email):
+                    return False
+            else:
+                # Simular envio de email
+                time.sleep(1)  # Simular tempo de processamento
+            
+            EMAILS_SENT.labels('single').inc()
+            logger.info(
+                "✅ Email %s enviado com sucesso", message.get('message_id'),
+                extra=event('email_sent', message_id=message.get('message_id'))
+            )
             return True
             
         except Exception as e:
             logger.error(f"❌ Erro ao processar email: {e}")
             return False
     
-    def callback(self, ch, method, properties, body):
-        """Callback chamado quando uma mensagem é recebida"""
+    def process_email_batch(self, messages):
+        """Envia um lote de emails reaproveitando as sessões SMTP do pool
+
+        Com EMAIL_COALESCE_WINDOW_MS, as mensagens do lote para o mesmo
+        destinatário saem em um único email (até EMAIL_COALESCE_MAX cada). Um
+        envio barrado pelo limite de taxa é adiado, não conta como falha.
+        """
         try:
-            message = json.loads(body.decode())
-            logger.info(f"📥 Nova mensagem recebida na fila de emails")
+            logger.info("📧 Enviando lote de %d emails", len(messages))
             
-            if self.process_email(message):
-                # Confirma o processamento da mensagem
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                logger.info(f"✅ Mensagem {message.get('message_id')} processada com sucesso")
+            # Mensagens que compartilham template são renderizadas juntas, uma compilação por template
+            templated = [index for index, message in enumerate(messages) if message.get('template')]
+            rendered = [None] * len(messages)
+            for index, body in zip(templated, self.templates.render_batch([messages[i] for i in templated])):
+                rendered[index] = body
+            
+            valid = [
+                index for index, message in enumerate(messages)
+                if message.get('to') and (not message.get('template') or rendered[index] is not None)
+            ]
+            if self.coalesce_window_ms > 0:
+                groups = coalesce(messages, valid, self.coalesce_max)
             else:
-                # Rejeita a mensagem (não será reenfileirada)
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-                logger.error(f"❌ Falha no processamento da mensagem {message.get('message_id')}")
-                
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Erro ao decodificar JSON: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-        except Exception as e:
-            logger.error(f"❌ Erro inesperado no callback: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-    
-    def start_consuming(self):
-        """Inicia o consumo de mensagens"""
-        if not self.connect():
-            logger.error("❌ Não foi possível iniciar o consumer")
-            return
-        
-        try:
-            self.channel.basic_consume(
-                queue=self.queue_name,
-                on_message_callback=self.callback,
-                auto_ack=False  # Confirmação manual
-            )
+                groups = [[index] for index in valid]
             
-            logger.info("🔄 Email Consumer aguardando mensagens...")
-            logger.info("Pressione CTRL+C para sair")
+            results = [False] * len(messages)
+            sending, emails = [], []
+            for group in groups:
+                wait = self.rate_limiter.acquire(messages[group[0]]['to'])
+                if wait:
+                    for index in group:
+                        results[index] = Deferred(wait)
+                    continue
+                if len(group) == 1:
+                    emails.append(self.build_email(messages[group[0]], rendered[group[0]]))
+                else:
+                    emails.append(self.build_digest([messages[i] for i in group], [rendered[i] for i in group]))
+                sending.append(group)
             
-            self.channel.start_consuming()
+            if self.smtp_pool is not None:
+                sent = self.smtp_pool.send_many(emails)
+            else:
+                # Simular uma única sessão para o lote inteiro
+                if emails:
+                    time.sleep(1)
+                sent = [True] * len(emails)
+            
+            for group, ok in zip(sending, sent):
+                for index in group:
+                    results[index] = ok
+                if ok:
+                    EMAILS_SENT.labels('digest' if len(group) > 1 else 'single').inc()
+                    if len(group) > 1:
+                        EMAILS_COALESCED.inc(len(group))
+            
+            if any(len(group) > 1 for group in sending):
+                logger.info("📦 %d mensagens enviadas em %d emails", sum(len(group) for group in sending), len(emails))
+            for message, ok in zip(messages, results):
+                if ok:
+                    logger.info(
+                        "✅ Email %s enviado com sucesso", message.get('message_id'),
+                        extra=event('email_sent', message_id=message.get('message_id'))
+                    )
+                elif isinstance(ok, Deferred):
+                    logger.warning("⏳ Email %s adiado %.1fs (limite de envio)", message.get('message_id'), ok.delay)
+                else:
+                    logger.error("❌ Falha no envio do email %s", message.get('message_id'))
+            return results
             
-        except KeyboardInterrupt:
-            logger.info("👋 Encerrando Email Consumer...")
-            self.connection.close()
         except Exception as e:
-            logger.error(f"❌ Erro no consumer: {e}")
-            self.connection.close()
+            logger.error(f"❌ Erro ao processar lote de emails: {e}")
+            return [False] * len(messages)
+    
+    def start_consuming(self):
+        """Inicia o consumo de mensagens"""
+        runtime = ConsumerRuntime('Email Consumer')
+        self.register(runtime)
+        runtime.start()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+import logging
+import os
+import threading
+
+from consumer_metrics import EMAIL_RATE_LIMITED
+from shared.rate_limit import TokenBucketLimiter
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def recipient_key(to):
+    return to.strip().lower()
+
+
+def coalesce(messages, indices, max_items):
+    """Agrupa as mensagens por destinatário (na ordem de chegada), em blocos de até ``max_items``"""
+    groups = {}
+    for index in indices:
+        groups.setdefault(recipient_key(messages[index]['to']), []).append(index)
+    size = max(1, max_items)
+    return [group[start:start + size] for group in groups.values() for start in range(0, len(group), size)]
+
+
+class EmailRateLimiter:
+    """Limite de envio por destinatário e por domínio (token bucket)
+
+    Um envio só sai se houver token nos dois buckets; caso contrário nenhum é
+    consumido e ``acquire`` devolve a espera até a liberação. Um email agrupado
+    conta como um único envio. Cada mapa guarda no máximo ``max_keys`` chaves
+    (LRU), então uma rajada para milhões de destinatários não cresce a memória.
+    Taxa 0 desliga o respectivo limite.
+    """
+
+    def __init__(self, recipient_rate=0.0, recipient_burst=5, domain_rate=0.0, domain_burst=100, max_keys=100000):
+        self.recipients = TokenBucketLimiter(recipient_rate, recipient_burst, max_keys) if recipient_rate > 0 else None
+        self.domains = TokenBucketLimiter(domain_rate, domain_burst, max_keys) if domain_rate > 0 else None
+        # A fila expressa usa vários workers: os buckets são compartilhados entre threads
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        # Taxas configuradas por minuto, que é como os provedores costumam publicar os limites
+        return cls(
+            recipient_rate=float(os.getenv('EMAIL_RECIPIENT_RATE_PER_MIN', 0)) / 60,
+            recipient_burst=float(os.getenv('EMAIL_RECIPIENT_BURST', 5)),
+            domain_rate=float(os.getenv('EMAIL_DOMAIN_RATE_PER_MIN', 0)) / 60,
+            domain_burst=float(os.getenv('EMAIL_DOMAIN_BURST', 100)),
+            max_keys=int(os.getenv('EMAIL_RATE_LIMIT_MAX_KEYS', 100000))
+        )
+
+    def acquire(self, to) -> float:
+        """Reserva um envio para ``to``; retorna 0 se permitido ou os segundos até liberar"""
+        recipient = recipient_key(to)
+        buckets = [
+            (scope, limiter, key)
+            for scope, limiter, key in (
+                ('recipient', self.recipients, recipient),
+                ('domain', self.domains, recipient.rpartition('@')[2])
+            )
+            if limiter is not None
+        ]
+        if not buckets:
+            return 0.0
+
+        with self._lock:
+            wait, scope = max((limiter.peek(key), scope) for scope, limiter, key in buckets)
+            if wait > 0:
+                EMAIL_RATE_LIMITED.labels(scope).inc()
+                return wait
+            for _, limiter, key in buckets:
+                limiter.acquire(key)
+        return 0.0
@@ -1,10 +1,13 @@
-import pika
-import json
+import functools
 import logging
-import time
 import os
+import time
 from datetime import datetime
 
+from consumer_runtime import ConsumerRuntime
+from shared.logging_config import event
+from shared.sharding import sharded_queue
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -13,41 +16,41 @@ logger = logging.getLogger(__name__)
 
 
 class PedidosConsumer:
-    def __init__(self):
-        self.connection = None
-        self.channel = None
-        self.queue_name = 'queue_pedidos'
-        
-    def connect(self):
-        """Estabelece conexão com RabbitMQ"""
-        credentials = pika.PlainCredentials(
-            username=os.getenv('RABBITMQ_USER', 'admin'),
-            password=os.getenv('RABBITMQ_PASSWORD', 'admin123')
-        )
-        
-        while True:
-            try:
-                self.connection = pika.BlockingConnection(
-                    pika.ConnectionParameters(
-                        host=os.getenv('RABBITMQ_HOST', 'rabbitmq'),
-                        port=int(os.getenv('RABBITMQ_PORT', 5672)),
-                        credentials=credentials,
-                        heartbeat=600,
-                        blocked_connection_timeout=300
-                    )
+    queue_name = 'queue_pedidos'
+    # Sem política de retry (RETRY_ENABLED=false), pedidos com falha voltam para a fila
+    requeue_on_failure = True
+    
+    def register(self, runtime):
+        """Registra o handler desta fila no runtime de consumers"""
+        sharding = sharded_queue(self.queue_name)
+        if sharding is not None:
+            self.register_shards(runtime, sharding)
+            # Continua drenando a fila única com o que foi publicado antes do particionamento
+            return runtime.register(self.queue_name, self.process_pedido, requeue_on_failure=self.requeue_on_failure, workers=1)
+        if runtime.batch_size > 1:
+            return runtime.register_batch(self.queue_name, self.process_pedidos_batch, requeue_on_failure=self.requeue_on_failure)
+        return runtime.register(self.queue_name, self.process_pedido, requeue_on_failure=self.requeue_on_failure)
+    
+    def register_shards(self, runtime, sharding):
+        """Um worker por shard: pedidos com o mesmo pedido_id são processados em ordem
+
+        PEDIDOS_SHARD_IDS (ex.: "0,1") escolhe os shards desta réplica; por padrão
+        assina todos e o single-active-consumer do broker decide quem fica ativo.
+        """
+        selected = os.getenv('PEDIDOS_SHARD_IDS')
+        indexes = [int(index) for index in selected.split(',') if index.strip()] if selected else range(sharding.shards)
+        for index in indexes:
+            declare = functools.partial(sharding.declare_shard, index=index)
+            if runtime.batch_size > 1:
+                runtime.register_batch(
+                    sharding.queues[index], self.process_pedidos_batch,
+                    requeue_on_failure=self.requeue_on_failure, declare=declare
+                )
+            else:
+                runtime.register(
+                    sharding.queues[index], self.process_pedido,
+                    requeue_on_failure=self.requeue_on_failure, workers=1, declare=declare
                 )
-                
-                self.channel = self.connection.channel()
-                self.channel.queue_declare(queue=self.queue_name, durable=True)
-                self.channel.basic_qos(prefetch_count=1)
-                
-                logger.info(f"✅ Consumer de Pedidos conectado à fila '{self.queue_name}'")
-                return True
-                
-            except Exception as e:
-                logger.error(f"❌ Falha ao conectar ao RabbitMQ: {e}")
-                logger.info("🔄 Tentando reconectar em 5 segundos...")
-                time.sleep(5)
     
     def process_pedido(self, message):
         """Processa um pedido"""
@@ -58,25 +61,23 @@ class PedidosConsumer:
             valor_total = message.get('valor_total', 0)
             status = message.get('status', 'pendente')
             
-            logger.info(f"🛒 Processando Pedido #{pedido_id}")
-            logger.info(f"   Cliente: {cliente}")
-            logger.info(f"   Itens: {len(itens)} itens")
-            logger.info(f"   Valor Total: R$ {valor_total:.2f}")
-            logger.info(f"   Status: {status}")
+            logger.debug(
+                "🛒 Processando Pedido #%s (cliente=%s, itens=%d, valor_total=R$ %.2f, status=%s)",
+                pedido_id, cliente, len(itens), valor_total, status
+            )
             
             # Simular etapas de processamento do pedido
-            logger.info("   📦 Separando itens do estoque...")
+            logger.debug("   📦 Separando itens do estoque...")
             time.sleep(1)
             
-            logger.info("   🏷️ Gerando etiquetas de envio...")
+            logger.debug("   🏷️ Gerando etiquetas de envio...")
             time.sleep(0.5)
             
-            logger.info("   📋 Atualizando sistema de inventário...")
+            logger.debug("   📋 Atualizando sistema de inventário...")
             time.sleep(0.5)
             
             # Atualizar status do pedido (em um sistema real, salvaria no banco)
             new_status = "processado"
-            logger.info(f"   ✅ Pedido #{pedido_id} {new_status.upper()} com sucesso")
             
             # Gerar comprovante
             recibo = {
@@ -89,7 +90,10 @@ class PedidosConsumer:
                 "recibo_id": f"REC-{pedido_id}-{int(time.time())}"
             }
             
-            logger.info(f"   🧾 Comprovante gerado: {recibo['recibo_id']}")
+            logger.info(
+                "✅ Pedido #%s %s com sucesso, comprovante %s", pedido_id, new_status.upper(), recibo['recibo_id'],
+                extra=event('pedido_processed', pedido_id=pedido_id)
+            )
             
             return True
             
@@ -97,51 +101,52 @@ class PedidosConsumer:
             logger.error(f"❌ Erro ao processar pedido: {e}")
             return False
     
-    def callback(self, ch, method, properties, body):
-        """Callback chamado quando uma mensagem é recebida"""
-        try:
-            message = json.loads(body.decode())
-            
-            if self.process_pedido(message):
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                logger.info(f"✅ Pedido {message.get('pedido_id')} processado com sucesso")
+    def process_pedidos_batch(self, messages):
+        """Processa um lote de pedidos com uma única atualização de estoque/inventário"""
+        results = []
+        pedidos = []
+        for message in messages:
+            if message.get('pedido_id') is None:
+                logger.error(f"❌ Pedido sem pedido_id na mensagem {message.get('message_id')}")
+                results.append(False)
             else:
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)  # Reenfileira em caso de falha
-                logger.error(f"❌ Falha no processamento do pedido {message.get('pedido_id')}. Reenfileirando...")
-                
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Erro ao decodificar JSON: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                pedidos.append(message)
+                results.append(True)
+
+        if not pedidos:
+            return results
+
+        try:
+            logger.info("🛒 Processando lote de %d pedidos", len(pedidos))
+
+            # Simular as etapas em lote (uma separação, uma geração de etiquetas e uma escrita no inventário)
+            logger.debug("   📦 Separando itens do estoque...")
+            time.sleep(1)
+
+            logger.debug("   🏷️ Gerando etiquetas de envio...")
+            time.sleep(0.5)
+
+            logger.debug("   📋 Atualizando sistema de inventário...")
+            time.sleep(0.5)
+
+            for message in pedidos:
+                recibo_id = f"REC-{message.get('pedido_id')}-{int(time.time())}"
+                logger.info(
+                    "✅ Pedido #%s PROCESSADO, comprovante %s", message.get('pedido_id'), recibo_id,
+                    extra=event('pedido_processed', pedido_id=message.get('pedido_id'))
+                )
+
+            return results
+
         except Exception as e:
-            logger.error(f"❌ Erro inesperado no callback: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            logger.error(f"❌ Erro ao processar lote de pedidos: {e}")
+            return [False] * len(messages)
     
     def start_consuming(self):
         """Inicia o consumo de mensagens"""
-        if not self.connect():
-            logger.error("❌ Não foi possível iniciar o consumer de pedidos")
-            return
-        
-        try:
-            self.channel.basic_consume(
-                queue=self.queue_name,
-                on_message_callback=self.callback,
-                auto_ack=False
-            )
-            
-            logger.info("🔄 Pedidos Consumer aguardando mensagens...")
-            logger.info("Pressione CTRL+C para sair")
-            
-            self.channel.start_consuming()
-            
-        except KeyboardInterrupt:
-            logger.info("👋 Encerrando Pedidos Consumer...")
-            if self.connection:
-                self.connection.close()
-        except Exception as e:
-            logger.error(f"❌ Erro no consumer de pedidos: {e}")
-            if self.connection:
-                self.connection.close()
+        runtime = ConsumerRuntime('Pedidos Consumer')
+        self.register(runtime)
+        runtime.start()
 
 
 if __name__ == "__main__":
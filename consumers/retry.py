@@ -0,0 +1,133 @@
+import logging
+import os
+
+import pika
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+RETRY_COUNT_HEADER = 'x-retry-count'
+FAILURE_REASON_HEADER = 'x-failure-reason'
+
+
+class RetryPolicy:
+    """Retentativas com backoff exponencial usando filas com TTL + dead-letter-exchange
+
+    Para cada fila ``Q`` existem:
+
+    - ``Q.retry.<delay>ms``: uma fila por nível de atraso, sem consumers, com
+      ``x-message-ttl`` e dead-letter de volta para ``Q`` quando o TTL expira;
+    - ``Q.dlq``: destino final após ``max_attempts`` tentativas.
+
+    O número da tentativa viaja no header ``x-retry-count``. Como o atraso faz
+    parte do nome, mudar a configuração cria filas novas em vez de conflitar
+    com os argumentos das existentes.
+    """
+
+    def __init__(self, max_attempts=5, base_delay_ms=1000, multiplier=2.0, max_delay_ms=300000):
+        self.max_attempts = max_attempts
+        self.base_delay_ms = base_delay_ms
+        self.multiplier = multiplier
+        self.max_delay_ms = max_delay_ms
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_attempts=int(os.getenv('RETRY_MAX_ATTEMPTS', 5)),
+            base_delay_ms=int(os.getenv('RETRY_BASE_DELAY_MS', 1000)),
+            multiplier=float(os.getenv('RETRY_MULTIPLIER', 2)),
+            max_delay_ms=int(os.getenv('RETRY_MAX_DELAY_MS', 300000))
+        )
+
+    def delay_ms(self, attempt):
+        """Atraso antes da tentativa ``attempt`` (1 = primeira retentativa)"""
+        return int(min(self.base_delay_ms * self.multiplier ** (attempt - 1), self.max_delay_ms))
+
+    def retry_queue(self, queue_name, attempt):
+        return f"{queue_name}.retry.{self.delay_ms(attempt)}ms"
+
+    @staticmethod
+    def dead_letter_queue(queue_name):
+        return f"{queue_name}.dlq"
+
+    def declare(self, channel, queue_name):
+        """Declara as filas de retentativa e a DLQ da fila"""
+        channel.queue_declare(queue=self.dead_letter_queue(queue_name), durable=True)
+        for delay in sorted({self.delay_ms(attempt) for attempt in range(1, self.max_attempts + 1)}):
+            channel.queue_declare(
+                queue=f"{queue_name}.retry.{delay}ms",
+                durable=True,
+                arguments={
+                    'x-message-ttl': delay,
+                    'x-dead-letter-exchange': '',
+                    'x-dead-letter-routing-key': queue_name
+                }
+            )
+
+    @staticmethod
+    def attempts(properties):
+        headers = (properties.headers or {}) if properties else {}
+        return int(headers.get(RETRY_COUNT_HEADER, 0))
+
+    def next_destination(self, queue_name, properties):
+        """Retorna ``(fila, tentativa)`` para a próxima etapa de uma mensagem que falhou"""
+        attempt = self.attempts(properties) + 1
+        if attempt > self.max_attempts:
+            return self.dead_letter_queue(queue_name), attempt
+        return self.retry_queue(queue_name, attempt), attempt
+
+
+class DeferQueues:
+    """Filas de espera para mensagens adiadas (``Deferred``), independentes da política de retry
+
+    ``Q.deferred.<delay>ms`` tem ``x-message-ttl`` e dead-letter de volta para
+    ``Q``, como as filas de retentativa, mas a mensagem volta sem contar
+    tentativa e as filas existem mesmo com RETRY_ENABLED=false. São declaradas
+    sob demanda, na primeira vez que a fila adia uma mensagem.
+    """
+
+    def __init__(self, delays_ms=(1000, 5000, 15000, 60000, 300000)):
+        self.delays_ms = sorted(delays_ms)
+
+    @classmethod
+    def from_env(cls):
+        value = os.getenv('DEFER_DELAYS_MS', '1000,5000,15000,60000,300000')
+        return cls([int(item) for item in value.split(',') if item.strip()])
+
+    def queue_for(self, queue_name, delay):
+        """``(fila, atraso_ms)``: a espera mais curta que cobre ``delay`` segundos (ou a mais longa)"""
+        chosen = next((value for value in self.delays_ms if value >= delay * 1000), self.delays_ms[-1])
+        return f"{queue_name}.deferred.{chosen}ms", chosen
+
+    @staticmethod
+    def declare(channel, queue_name, delay_ms):
+        channel.queue_declare(
+            queue=f"{queue_name}.deferred.{delay_ms}ms",
+            durable=True,
+            arguments={
+                'x-message-ttl': delay_ms,
+                'x-dead-letter-exchange': '',
+                'x-dead-letter-routing-key': queue_name
+            }
+        )
+
+
+def republish(channel, routing_key, properties, body, headers):
+    """Republica o corpo original com os headers atualizados (mensagem persistente)"""
+    merged = dict((properties.headers or {}) if properties else {})
+    merged.update(headers)
+    channel.basic_publish(
+        exchange='',
+        routing_key=routing_key,
+        body=body,
+        properties=pika.BasicProperties(
+            delivery_mode=2,
+            content_type=properties.content_type if properties else 'application/json',
+            content_encoding=properties.content_encoding if properties else None,
+            message_id=properties.message_id if properties else None,
+            headers=merged
+        )
+    )
@@ -0,0 +1,48 @@
+import logging
+import os
+
+from consumer_runtime import ConsumerRuntime
+from email_consumer import EmailConsumer
+from admin_consumer import AdminConsumer
+from pedidos_consumer import PedidosConsumer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Handlers disponíveis para hospedar no mesmo processo
+CONSUMERS = {
+    'email': EmailConsumer,
+    'admin': AdminConsumer,
+    'pedidos': PedidosConsumer,
+}
+
+
+def build_runtime():
+    """Runtime com os handlers de CONSUMER_HANDLERS=email,admin,pedidos (``None`` se nenhum for válido)"""
+    names = [name.strip() for name in os.getenv('CONSUMER_HANDLERS', ','.join(CONSUMERS)).split(',') if name.strip()]
+
+    runtime = ConsumerRuntime('Notification Consumers')
+    for name in names:
+        if name not in CONSUMERS:
+            logger.error(f"❌ Handler desconhecido: '{name}' (disponíveis: {', '.join(CONSUMERS)})")
+            continue
+        CONSUMERS[name]().register(runtime)
+
+    if not runtime.handlers:
+        logger.error("❌ Nenhum handler registrado")
+        return None
+    return runtime
+
+
+def main():
+    """Hospeda vários handlers em um único processo"""
+    runtime = build_runtime()
+    if runtime is not None:
+        runtime.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import itertools
+import logging
+import os
+import signal
+import time
+
+import pika
+
+from consumer_metrics import RECONNECTS, SCHEDULED_PENDING, SCHEDULED_RELEASED, SCHEDULE_LAG, start_metrics_server
+from timing_wheel import TimingWheel
+from shared.logging_config import configure_logging
+from shared.embedded_queue import UnroutableError
+from shared.scheduling import (
+    SCHEDULED_QUEUE, DELIVER_AT_HEADER, TARGET_EXCHANGE_HEADER, TARGET_ROUTING_KEY_HEADER, SCHEDULE_HEADERS
+)
+from shared.segment_log import Properties, SegmentLog
+from shared.topology import queue_arguments
+from shared.transport import TransportError, create_transport
+
+configure_logging(os.getenv('SERVICE_NAME', 'scheduler'))
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Libera as notificações agendadas (``queue_scheduled``) na fila de destino no horário
+
+    - Entrada: consome ``queue_scheduled`` com prefetch alto, grava cada mensagem
+      no ``SegmentLog`` e só confirma (um ack múltiplo) depois do ``msync`` do log;
+    - Espera: em memória fica só ``(vencimento, id)`` em uma ``TimingWheel``;
+      o corpo continua no disco até a liberação. Agendamentos distantes não
+      prendem segmentos antigos: o log regrava os segmentos quase vazios
+      (``SCHEDULER_REWRITE_RATIO``) e a leitura é sempre pelo id;
+    - Liberação: a cada tick os vencidos são republicados em blocos de
+      ``release_batch`` em uma transação AMQP (um ``tx.commit`` por bloco, não
+      um round trip por mensagem) e só então marcados como concluídos no log.
+
+    Uma queda entre o commit e a marcação no log republica o bloco: a
+    deduplicação por message_id dos consumers descarta a cópia.
+    """
+
+    def __init__(self, log, wheel, transport=None, prefetch=5000, release_batch=1000):
+        self.log = log
+        self.wheel = wheel
+        self.transport = transport or create_transport()
+        self.prefetch = prefetch
+        self.release_batch = release_batch
+        self.intake = None
+        self.publisher = None
+        self.last_tag = None
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_env(cls):
+        log = SegmentLog(
+            os.getenv('SCHEDULER_DIR', '/data/scheduler'),
+            segment_size=int(os.getenv('SCHEDULER_SEGMENT_SIZE', 64 * 1024 * 1024)),
+            fsync=os.getenv('SCHEDULER_FSYNC', 'interval').lower(),
+            rewrite_ratio=float(os.getenv('SCHEDULER_REWRITE_RATIO', 0.25))
+        )
+        wheel = TimingWheel(
+            tick=float(os.getenv('SCHEDULER_TICK_MS', 100)) / 1000,
+            slots=int(os.getenv('SCHEDULER_WHEEL_SLOTS', 256)),
+            levels=int(os.getenv('SCHEDULER_WHEEL_LEVELS', 4)),
+            now=time.time()
+        )
+        return cls(
+            log,
+            wheel,
+            prefetch=int(os.getenv('SCHEDULER_PREFETCH', 5000)),
+            release_batch=int(os.getenv('SCHEDULER_RELEASE_BATCH', 1000))
+        )
+
+    def load(self):
+        """Reconstrói a roda a partir do log (itens vencidos durante a parada saem no primeiro tick)"""
+        recovered = self.log.recover()
+        for message_id, _, properties, _ in recovered:
+            self.wheel.insert(float(properties.headers[DELIVER_AT_HEADER]), message_id)
+        self._ids = itertools.count(self.log.last_id + 1)
+        SCHEDULED_PENDING.set(len(self.wheel))
+        logger.info(f"⏰ {len(recovered)} notificação(ões) agendada(s) recuperada(s) de '{self.log.directory}'")
+
+    def _open(self, connection):
+        self.publisher = connection.channel()
+        self.publisher.tx_select()
+        self.intake = connection.channel()
+        self.intake.queue_declare(queue=SCHEDULED_QUEUE, durable=True, arguments=queue_arguments(SCHEDULED_QUEUE))
+        self.intake.basic_qos(prefetch_count=self.prefetch)
+        self.intake.basic_consume(queue=SCHEDULED_QUEUE, on_message_callback=self.on_message, auto_ack=False)
+        self.last_tag = None
+
+    def on_message(self, channel, method, properties, body):
+        headers = properties.headers or {}
+        if DELIVER_AT_HEADER not in headers or TARGET_ROUTING_KEY_HEADER not in headers:
+            logger.error(f"❌ Mensagem {properties.message_id} sem destino/horário em '{SCHEDULED_QUEUE}'; descartada")
+            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+
+        message_id = next(self._ids)
+        self.log.append_publish(message_id, headers[TARGET_ROUTING_KEY_HEADER], Properties.copy_of(properties), body)
+        self.wheel.insert(float(headers[DELIVER_AT_HEADER]), message_id)
+        self.last_tag = method.delivery_tag
+
+    def commit_intake(self):
+        """Grava o log em disco e confirma de uma vez tudo o que foi recebido"""
+        if self.last_tag is None:
+            return
+        self.log.flush()
+        self.intake.basic_ack(delivery_tag=self.last_tag, multiple=True)
+        self.last_tag = None
+        SCHEDULED_PENDING.set(len(self.wheel))
+
+    def release(self, now=None):
+        """Republica os itens vencidos em blocos transacionais"""
+        now = now or time.time()
+        due = self.wheel.advance(now)
+        for start in range(0, len(due), self.release_batch):
+            batch = due[start:start + self.release_batch]
+            try:
+                for message_id in batch:
+                    self._publish(message_id, now)
+                self.publisher.tx_commit()
+            except (pika.exceptions.AMQPError, TransportError):
+                # Nada deste bloco em diante foi confirmado: volta para a roda como vencido
+                for item in due[start:]:
+                    self.wheel.insert(0, item)
+                raise
+            for message_id in batch:
+                self.log.append_ack(message_id)
+            SCHEDULED_RELEASED.inc(len(batch))
+        if due:
+            SCHEDULED_PENDING.set(len(self.wheel))
+            logger.info(f"⏰ {len(due)} notificação(ões) agendada(s) liberada(s)")
+
+    def _publish(self, message_id, now):
+        routing_key, properties, body = self.log.read_message(message_id)
+        headers = properties.headers or {}
+        SCHEDULE_LAG.observe(max(0.0, now - float(headers[DELIVER_AT_HEADER])))
+        try:
+            self.publisher.basic_publish(
+                exchange=headers[TARGET_EXCHANGE_HEADER],
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=properties.delivery_mode or 2,
+                    content_type=properties.content_type,
+                    content_encoding=properties.content_encoding,
+                    message_id=properties.message_id,
+                    headers={key: value for key, value in headers.items() if key not in SCHEDULE_HEADERS} or None
+                )
+            )
+        except UnroutableError as e:
+            # Mesmo efeito do RabbitMQ sem 'mandatory': o destino sumiu e a mensagem é descartada
+            logger.error(f"❌ Notificação agendada {properties.message_id} sem destino: {e}")
+
+    def run(self, should_stop=lambda: False):
+        """Consome, agenda e libera até ``should_stop()``; reconecta com backoff em caso de queda"""
+        self.load()
+        while not should_stop():
+            connection = self.transport.connect(should_stop=should_stop)
+            if connection is None:
+                break
+            try:
+                self._open(connection)
+                logger.info(f"✅ Scheduler consumindo '{SCHEDULED_QUEUE}' ({len(self.wheel)} pendente(s))")
+                while not should_stop():
+                    connection.process_data_events(time_limit=self.wheel.tick)
+                    self.commit_intake()
+                    self.release()
+                    self.log.maybe_flush()
+                self.commit_intake()
+            except (pika.exceptions.AMQPError, TransportError) as e:
+                RECONNECTS.inc()
+                logger.error(f"❌ Conexão do scheduler perdida: {e!r}")
+            finally:
+                if connection.is_open:
+                    connection.close()
+        self.log.close()
+        logger.info("👋 Scheduler encerrado")
+
+
+def main():
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *args: stopping.append(True))
+    start_metrics_server()
+    Scheduler.from_env().run(should_stop=lambda: bool(stopping))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import logging
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class PooledSMTPConnection:
+    """Sessão SMTP autenticada com contadores para reciclagem"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SMTPConnectionPool:
+    """Pool de conexões SMTP persistentes
+
+    Mantém até ``pool_size`` sessões já autenticadas (STARTTLS/SSL + LOGIN) e as
+    reutiliza entre mensagens. Uma sessão é reciclada após ``max_messages``
+    envios ou quando fica ociosa por mais de ``idle_timeout`` segundos, o que
+    evita que o servidor a derrube no meio de um envio.
+    """
+
+    def __init__(self, host, port=25, username=None, password=None, starttls=False, use_ssl=False,
+                 pool_size=4, max_messages=100, idle_timeout=30, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._closed = False
+
+    @classmethod
+    def from_env(cls):
+        """Cria o pool a partir das variáveis SMTP_*"""
+        return cls(
+            host=os.getenv('SMTP_HOST', 'localhost'),
+            port=int(os.getenv('SMTP_PORT', 25)),
+            username=os.getenv('SMTP_USER') or None,
+            password=os.getenv('SMTP_PASSWORD') or None,
+            starttls=os.getenv('SMTP_STARTTLS', 'false').lower() == 'true',
+            use_ssl=os.getenv('SMTP_SSL', 'false').lower() == 'true',
+            pool_size=int(os.getenv('SMTP_POOL_SIZE', 4)),
+            max_messages=int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 100)),
+            idle_timeout=float(os.getenv('SMTP_IDLE_TIMEOUT', 30)),
+            timeout=float(os.getenv('SMTP_TIMEOUT', 10))
+        )
+
+    def _open(self):
+        """Abre e autentica uma nova sessão (a parte cara do envio)"""
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+
+        if self.username:
+            smtp.login(self.username, self.password or '')
+
+        logger.info(f"📬 Nova conexão SMTP aberta com {self.host}:{self.port}")
+        return PooledSMTPConnection(smtp)
+
+    def _is_stale(self, connection):
+        return (
+            connection.sent >= self.max_messages
+            or time.monotonic() - connection.last_used > self.idle_timeout
+        )
+
+    @contextmanager
+    def connection(self):
+        """Faz checkout de uma sessão SMTP pronta para uso"""
+        self._slots.acquire()
+        connection = None
+        try:
+            while connection is None:
+                try:
+                    candidate = self._idle.get_nowait()
+                except queue.Empty:
+                    connection = self._open()
+                    break
+                if self._is_stale(candidate):
+                    candidate.close()
+                else:
+                    connection = candidate
+
+            yield connection
+
+        except Exception:
+            # Sessão em estado desconhecido após erro: não volta para o pool
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                if self._closed or self._is_stale(connection):
+                    connection.close()
+                else:
+                    self._idle.put(connection)
+            self._slots.release()
+
+    def send_many(self, messages):
+        """Envia várias mensagens reaproveitando a mesma sessão; retorna um bool por mensagem"""
+        results = []
+        pending = list(messages)
+        disconnects = 0
+
+        while pending:
+            try:
+                with self.connection() as connection:
+                    while pending and connection.sent < self.max_messages:
+                        message = pending[0]
+                        try:
+                            connection.smtp.send_message(message)
+                            results.append(True)
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                            # Falha da mensagem, não da sessão: segue com a próxima
+                            logger.error(f"❌ SMTP recusou a mensagem para {message.get('To')}: {e}")
+                            results.append(False)
+                        finally:
+                            connection.last_used = time.monotonic()
+                        connection.sent += 1
+                        disconnects = 0
+                        pending.pop(0)
+
+            except smtplib.SMTPServerDisconnected as e:
+                # Sessão caiu (ex.: timeout do servidor): reabre e tenta a mesma mensagem uma vez
+                disconnects += 1
+                if disconnects > 1:
+                    logger.error(f"❌ Servidor SMTP desconectou repetidamente: {e}")
+                    results.append(False)
+                    pending.pop(0)
+                    disconnects = 0
+
+            except (smtplib.SMTPException, OSError) as e:
+                logger.error(f"❌ Falha na sessão SMTP com {self.host}:{self.port}: {e}")
+                results.extend([False] * len(pending))
+                break
+
+        return results
+
+    def send(self, message):
+        """Envia uma única mensagem usando uma sessão do pool"""
+        return self.send_many([message])[0]
+
+    def close(self):
+        """Encerra todas as sessões ociosas; as em uso são encerradas quando voltam ao pool"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
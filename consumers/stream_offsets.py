@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+STREAM_OFFSET_HEADER = 'x-stream-offset'
+START_POSITIONS = ('first', 'last', 'next')
+
+
+class StreamOffsetStore:
+    """Último offset processado por leitor de stream, persistido em um arquivo JSON
+
+    Streams não removem mensagens ao consumir: cada leitor (SIEM, dashboard,
+    logger...) guarda o próprio offset e retoma de onde parou. A escrita é
+    atômica e acontece a cada ``flush_every`` offsets e no encerramento.
+    """
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        self._offsets = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._offsets = json.load(f)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv('STREAM_OFFSETS_PATH', 'stream_offsets.json'),
+            flush_every=int(os.getenv('STREAM_OFFSET_FLUSH_EVERY', 100))
+        )
+
+    def get(self, reader):
+        return self._offsets.get(reader)
+
+    def commit(self, reader, offset):
+        with self._lock:
+            self._offsets[reader] = offset
+            self._pending += 1
+            if self._pending < self.flush_every:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.offsets-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._offsets, f)
+            os.replace(tmp_path, self.path)
+            self._pending = 0
+
+
+class StreamCursor:
+    """Posição de um leitor em um stream: de onde (re)começar e o que já foi processado"""
+
+    def __init__(self, reader, store: StreamOffsetStore, start='first'):
+        if start not in START_POSITIONS and not str(start).lstrip('-').isdigit():
+            raise ValueError(f"Offset inicial inválido: {start!r} (use {', '.join(START_POSITIONS)} ou um número)")
+        self.reader = reader
+        self.store = store
+        self.start = start
+
+    def resume_offset(self):
+        """Valor de ``x-stream-offset`` para o basic_consume"""
+        last = self.store.get(self.reader)
+        if last is not None:
+            return last + 1
+        return int(self.start) if str(self.start).lstrip('-').isdigit() else self.start
+
+    @staticmethod
+    def offset_of(properties):
+        headers = properties.headers or {}
+        return headers.get(STREAM_OFFSET_HEADER)
+
+    def commit(self, properties):
+        offset = self.offset_of(properties)
+        if offset is not None:
+            self.store.commit(self.reader, offset)
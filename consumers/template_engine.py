@@ -0,0 +1,144 @@
+import html
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Placeholders no formato {{ campo }}
+PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+TEMPLATE_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+EXTENSIONS = ('.html', '.txt')
+
+
+class TemplateNotFound(Exception):
+    pass
+
+
+class CompiledTemplate:
+    """Template já analisado: lista de trechos literais e nomes de campos
+
+    A análise (regex) acontece uma única vez na compilação; renderizar é só
+    concatenar os trechos com os valores dos campos.
+    """
+
+    def __init__(self, name, source, is_html=False, mtime=None):
+        self.name = name
+        self.is_html = is_html
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+        self.parts = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            self.parts.append((False, source[position:match.start()]))
+            self.parts.append((True, match.group(1)))
+            position = match.end()
+        self.parts.append((False, source[position:]))
+
+    def render(self, fields):
+        escape = html.escape if self.is_html else str
+        return "".join(
+            escape(str(fields.get(value, ''))) if is_field else value
+            for is_field, value in self.parts
+        )
+
+
+class TemplateCache:
+    """Cache LRU de templates compilados, invalidado por mtime ou versão
+
+    A chave é ``(nome, versão)``: publicar com outra ``template_version`` força
+    uma nova compilação. O mtime do arquivo é verificado no máximo a cada
+    ``check_interval`` segundos, para não fazer um ``stat`` por mensagem.
+    """
+
+    def __init__(self, directory, max_size=128, check_interval=2.0):
+        self.directory = directory
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.getenv('EMAIL_TEMPLATES_DIR', os.path.join(os.path.dirname(__file__), 'templates')),
+            max_size=int(os.getenv('EMAIL_TEMPLATE_CACHE_SIZE', 128)),
+            check_interval=float(os.getenv('EMAIL_TEMPLATE_CHECK_INTERVAL', 2))
+        )
+
+    def _path(self, name):
+        if not TEMPLATE_NAME.match(name):
+            raise TemplateNotFound(f"Nome de template inválido: {name!r}")
+        for extension in EXTENSIONS:
+            path = os.path.join(self.directory, name + extension)
+            if os.path.isfile(path):
+                return path
+        raise TemplateNotFound(f"Template '{name}' não encontrado em {self.directory}")
+
+    def _compile(self, name):
+        path = self._path(name)
+        mtime = os.path.getmtime(path)
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        logger.info(f"🧩 Template '{name}' compilado ({path})")
+        return CompiledTemplate(name, source, is_html=path.endswith('.html'), mtime=mtime)
+
+    def get(self, name, version=None):
+        """Retorna o template compilado, recompilando se o arquivo mudou"""
+        key = (name, version)
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                if time.monotonic() - template.checked_at < self.check_interval:
+                    return template
+
+        # Fora do lock: stat/leitura de disco não bloqueiam os outros workers
+        if template is not None:
+            try:
+                if os.path.getmtime(self._path(name)) == template.mtime:
+                    template.checked_at = time.monotonic()
+                    return template
+            except OSError:
+                pass
+
+        template = self._compile(name)
+        with self._lock:
+            self._entries[key] = template
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return template
+
+    def render(self, message):
+        """Renderiza o template da mensagem usando os próprios campos da mensagem"""
+        template = self.get(message['template'], message.get('template_version'))
+        return template.render(message), template.is_html
+
+    def render_batch(self, messages):
+        """Renderiza um lote agrupando por template: cada template é resolvido uma vez
+
+        Retorna, para cada mensagem, ``(corpo, is_html)`` ou ``None`` se falhou.
+        """
+        groups = OrderedDict()
+        for index, message in enumerate(messages):
+            key = (message['template'], message.get('template_version'))
+            groups.setdefault(key, []).append(index)
+
+        rendered = [None] * len(messages)
+        for (name, version), indexes in groups.items():
+            try:
+                template = self.get(name, version)
+            except (TemplateNotFound, OSError) as e:
+                logger.error(f"❌ Falha ao carregar template '{name}': {e}")
+                continue
+            for index in indexes:
+                rendered[index] = (template.render(messages[index]), template.is_html)
+        return rendered
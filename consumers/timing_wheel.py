@@ -0,0 +1,75 @@
+import heapq
+import itertools
+import math
+
+
+class TimingWheel:
+    """Timing wheel hierárquica para milhões de vencimentos sem um timer por item
+
+    ``levels`` rodas de ``slots`` posições: uma posição do nível ``n`` cobre
+    ``slots ** n`` ticks. Um item entra no nível mais baixo que alcança o seu
+    vencimento; quando a roda de baixo completa a volta, a posição correspondente
+    do nível de cima é redistribuída ("cascata"). Inserir e vencer custam O(1)
+    por item, e cada tick só toca a posição atual de cada nível. Vencimentos
+    além do horizonte (``slots ** levels`` ticks) esperam em um heap.
+    """
+
+    def __init__(self, tick=0.1, slots=256, levels=4, now=0.0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.spans = [slots ** level for level in range(levels)]
+        self.horizon = slots ** levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []
+        self.current = int(now // tick)
+        self.due = []
+        self.count = 0
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return self.count
+
+    def insert(self, deliver_at, item):
+        """Agenda ``item`` para ``deliver_at`` (epoch em segundos); nunca sai antes do horário"""
+        self.count += 1
+        self._place(math.ceil(deliver_at / self.tick), item)
+
+    def _place(self, due, item):
+        delta = due - self.current
+        if delta <= 0:
+            self.due.append(item)
+            return
+        for level, span in enumerate(self.spans):
+            if delta < span * self.slots:
+                self.wheels[level][(due // span) % self.slots].append((due, item))
+                return
+        heapq.heappush(self.overflow, (due, next(self._sequence), item))
+
+    def advance(self, now):
+        """Avança até ``now`` e devolve, em bloco, todos os itens vencidos"""
+        target = int(now // self.tick)
+        while self.current < target:
+            if self.count == len(self.due):
+                # Nada esperando nas rodas: pula direto para o tick atual
+                self.current = target
+                break
+            self.current += 1
+            tick = self.current
+            for level in range(self.levels - 1, 0, -1):
+                span = self.spans[level]
+                if tick % span == 0:
+                    index = (tick // span) % self.slots
+                    bucket, self.wheels[level][index] = self.wheels[level][index], []
+                    for due, item in bucket:
+                        self._place(due, item)
+            while self.overflow and self.overflow[0][0] - tick < self.horizon:
+                due, _, item = heapq.heappop(self.overflow)
+                self._place(due, item)
+            index = tick % self.slots
+            bucket, self.wheels[0][index] = self.wheels[0][index], []
+            self.due.extend(item for _, item in bucket)
+
+        released, self.due = self.due, []
+        self.count -= len(released)
+        return released
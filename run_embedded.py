@@ -0,0 +1,62 @@
+"""Gateway e consumers em um único processo, com o broker embarcado
+
+    EMBEDDED_LOG_DIR=/data/queue python run_embedded.py
+
+Para nós de borda e desenvolvimento: sem RabbitMQ, a mensagem vai do endpoint
+ao handler sem sair do processo (``TRANSPORT=embedded``, ver
+``shared/embedded_queue.py``). O gateway (uvicorn) roda em um thread e o
+runtime dos consumers no thread principal, que recebe SIGTERM/SIGINT: os
+consumers terminam as mensagens em andamento, o gateway para e o log em disco
+é descarregado. O scheduler de notificações agendadas roda em outro thread. Streams (QUEUE_TYPE=stream) não são suportados nesse modo.
+"""
+import logging
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+os.environ['TRANSPORT'] = 'embedded'
+# Os serviços usam módulos planos: os dois diretórios entram no path (não há nomes repetidos)
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'api_gateway'), os.path.join(ROOT, 'consumers')]
+
+import uvicorn  # noqa: E402
+
+from shared.logging_config import configure_logging  # noqa: E402
+from shared.embedded_queue import get_broker  # noqa: E402
+
+configure_logging(os.getenv('SERVICE_NAME', 'notification-system'))
+logger = logging.getLogger(__name__)
+
+from main import app  # noqa: E402
+from run_consumers import build_runtime  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+
+
+def main():
+    runtime = build_runtime()
+    if runtime is None:
+        return
+
+    # Fora do thread principal o uvicorn não instala signal handlers: quem para tudo é o runtime
+    server = uvicorn.Server(uvicorn.Config(
+        app, host=os.getenv('API_HOST', '0.0.0.0'), port=int(os.getenv('API_PORT', 8000))
+    ))
+    gateway = threading.Thread(target=server.run, name='api-gateway', daemon=True)
+    gateway.start()
+    stopped = threading.Event()
+    scheduler = threading.Thread(target=Scheduler.from_env().run, kwargs={'should_stop': stopped.is_set}, name='scheduler')
+    scheduler.start()
+
+    try:
+        runtime.start()
+    finally:
+        logger.info("🛑 Encerrando o gateway embarcado...")
+        server.should_exit = True
+        gateway.join(timeout=float(os.getenv('CONSUMER_SHUTDOWN_TIMEOUT', 30)))
+        stopped.set()
+        scheduler.join()
+        get_broker().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Código compartilhado entre o API Gateway e os consumers"""
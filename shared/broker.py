@@ -0,0 +1,139 @@
+import itertools
+import logging
+import os
+import random
+import time
+
+import pika
+
+logger = logging.getLogger(__name__)
+
+
+class Backoff:
+    """Backoff exponencial com jitter ("equal jitter")
+
+    O atraso da tentativa ``n`` fica entre metade e o total de
+    ``min(maximum, initial * multiplier ** n)``: réplicas que perderam a
+    conexão juntas não voltam todas no mesmo instante.
+    """
+
+    def __init__(self, initial=0.1, maximum=10.0, multiplier=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.attempt = 0
+
+    def reset(self):
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        cap = min(self.maximum, self.initial * self.multiplier ** self.attempt)
+        self.attempt += 1
+        return cap / 2 + random.uniform(0, cap / 2)
+
+
+def _parse_hosts(value, default_port):
+    hosts = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
+
+
+class BrokerSettings:
+    """Parâmetros de conexão com o RabbitMQ compartilhados por gateway e consumers
+
+    ``RABBITMQ_HOSTS`` aceita uma lista ``host[:porta]`` separada por vírgulas
+    para failover entre os nós do cluster; sem ela vale ``RABBITMQ_HOST``.
+    Heartbeat curto (``RABBITMQ_HEARTBEAT``) detecta conexões mortas em segundos;
+    ele não precisa cobrir a duração dos handlers, que rodam fora da thread da
+    conexão (``WorkerPool``).
+    """
+
+    def __init__(self, hosts, username='admin', password='admin123', virtual_host='/', heartbeat=10,
+                 blocked_connection_timeout=60, socket_timeout=2.0, reconnect_initial=0.1, reconnect_max=10.0):
+        self.hosts = hosts
+        self.username = username
+        self.password = password
+        self.virtual_host = virtual_host
+        self.heartbeat = heartbeat
+        self.blocked_connection_timeout = blocked_connection_timeout
+        self.socket_timeout = socket_timeout
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self._rotation = itertools.count()
+
+    @classmethod
+    def from_env(cls):
+        port = int(os.getenv('RABBITMQ_PORT', 5672))
+        hosts = _parse_hosts(os.getenv('RABBITMQ_HOSTS') or os.getenv('RABBITMQ_HOST', 'rabbitmq'), port)
+        return cls(
+            hosts,
+            username=os.getenv('RABBITMQ_USER', 'admin'),
+            password=os.getenv('RABBITMQ_PASSWORD', 'admin123'),
+            virtual_host=os.getenv('RABBITMQ_VHOST', '/'),
+            heartbeat=int(os.getenv('RABBITMQ_HEARTBEAT', 10)),
+            blocked_connection_timeout=float(os.getenv('RABBITMQ_BLOCKED_TIMEOUT', 60)),
+            socket_timeout=float(os.getenv('RABBITMQ_SOCKET_TIMEOUT', 2)),
+            reconnect_initial=float(os.getenv('RABBITMQ_RECONNECT_INITIAL', 0.1)),
+            reconnect_max=float(os.getenv('RABBITMQ_RECONNECT_MAX', 10))
+        )
+
+    def backoff(self) -> Backoff:
+        return Backoff(self.reconnect_initial, self.reconnect_max)
+
+    def failover_order(self):
+        """Lista de nós começando por um diferente a cada chamada (espalha as conexões)"""
+        start = next(self._rotation) % len(self.hosts)
+        return self.hosts[start:] + self.hosts[:start]
+
+    def pika_parameters(self):
+        """Um ``ConnectionParameters`` por nó: o pika tenta cada um em sequência"""
+        credentials = pika.PlainCredentials(self.username, self.password)
+        return [
+            pika.ConnectionParameters(
+                host=host,
+                port=port,
+                virtual_host=self.virtual_host,
+                credentials=credentials,
+                heartbeat=self.heartbeat,
+                blocked_connection_timeout=self.blocked_connection_timeout,
+                socket_timeout=self.socket_timeout,
+                connection_attempts=1,
+                retry_delay=0
+            )
+            for host, port in self.failover_order()
+        ]
+
+
+class ConnectionManager:
+    """Abre conexões pika bloqueantes com failover entre nós e backoff com jitter"""
+
+    def __init__(self, settings: BrokerSettings = None):
+        self.settings = settings or BrokerSettings.from_env()
+
+    def connect(self, should_stop=lambda: False, max_attempts=None):
+        """Tenta até conectar (ou ``should_stop()``/``max_attempts``); devolve a conexão ou ``None``"""
+        backoff = self.settings.backoff()
+        for attempt in itertools.count(1):
+            try:
+                connection = pika.BlockingConnection(self.settings.pika_parameters())
+                logger.info(f"✅ Conectado ao RabbitMQ (tentativa {attempt})")
+                return connection
+            except pika.exceptions.AMQPError as e:
+                if max_attempts is not None and attempt >= max_attempts:
+                    logger.error(f"❌ Falha ao conectar ao RabbitMQ após {attempt} tentativas: {e!r}")
+                    return None
+                delay = backoff.next_delay()
+                logger.warning(f"⚠️ Falha ao conectar ao RabbitMQ ({e!r}); nova tentativa em {delay:.2f}s")
+
+            # Dorme em fatias curtas para atender a um pedido de encerramento
+            deadline = time.monotonic() + delay
+            while time.monotonic() < deadline:
+                if should_stop():
+                    return None
+                time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+        return None
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack é opcional
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+# Variações de content_type aceitas na leitura; ausente = JSON (mensagens antigas)
+_ALIASES = {
+    None: JSON,
+    '': JSON,
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+}
+
+
+class CodecError(ValueError):
+    """Corpo que não pôde ser decodificado ou content_type não suportado"""
+
+
+class Codec:
+    """Serialização do corpo das mensagens para um content_type AMQP"""
+
+    def __init__(self, content_type, encode, decode, errors):
+        self.content_type = content_type
+        self._encode = encode
+        self._decode = decode
+        self._errors = errors
+
+    def encode(self, message) -> bytes:
+        return self._encode(message)
+
+    def decode(self, body):
+        """Decodifica direto dos bytes recebidos (sem ``.decode()`` intermediário)"""
+        try:
+            return self._decode(body)
+        except self._errors as e:
+            raise CodecError(f"{self.content_type}: {e}") from e
+
+
+def _json_codec():
+    if orjson is not None:
+        # orjson serializa direto para bytes e aceita bytes na leitura
+        return Codec(JSON, orjson.dumps, orjson.loads, (orjson.JSONDecodeError, TypeError))
+    return Codec(
+        JSON,
+        lambda message: json.dumps(message, separators=(',', ':')).encode(),
+        json.loads,
+        (ValueError, TypeError)
+    )
+
+
+def _msgpack_codec():
+    return Codec(
+        MSGPACK,
+        lambda message: msgpack.packb(message, use_bin_type=True),
+        lambda body: msgpack.unpackb(body, raw=False),
+        (ValueError, TypeError, msgpack.exceptions.UnpackException)
+    )
+
+
+_CODECS = {JSON: _json_codec()}
+if msgpack is not None:
+    _CODECS[MSGPACK] = _msgpack_codec()
+
+
+def get_codec(content_type=None) -> Codec:
+    """Codec para o content_type recebido (parâmetros como ``; charset=utf-8`` são ignorados)"""
+    key = content_type.split(';', 1)[0].strip().lower() if content_type else content_type
+    key = _ALIASES.get(key, key)
+    try:
+        return _CODECS[key]
+    except KeyError:
+        raise CodecError(f"content_type não suportado: {content_type!r}") from None
+
+
+def default_codec() -> Codec:
+    """Codec de publicação configurado em MESSAGE_CONTENT_TYPE (padrão: JSON)"""
+    content_type = os.getenv('MESSAGE_CONTENT_TYPE', JSON)
+    try:
+        return get_codec(content_type)
+    except CodecError:
+        logger.warning(f"⚠️ MESSAGE_CONTENT_TYPE={content_type} indisponível (pacote não instalado?); usando {JSON}")
+        return _CODECS[JSON]
@@ -0,0 +1,490 @@
+import bisect
+import collections
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+import zlib
+
+from shared.segment_log import Properties, SegmentLog
+from shared.transport import TransportError
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(TransportError):
+    """A fila embarcada atingiu a capacidade (EMBEDDED_QUEUE_CAPACITY)"""
+
+
+class UnroutableError(TransportError):
+    """Nenhuma fila recebeu a mensagem (fila ou exchange não declarada)"""
+
+
+class Message:
+    __slots__ = ('id', 'body', 'properties', 'redelivered', 'expires_at', 'persistent')
+
+    def __init__(self, message_id, body, properties, persistent):
+        self.id = message_id
+        self.body = body
+        self.properties = properties
+        self.persistent = persistent
+        self.redelivered = False
+        self.expires_at = None
+
+
+class EmbeddedQueue:
+    """Fila em memória: buffer circular limitado (``deque``) de mensagens prontas"""
+
+    def __init__(self, name, arguments=None, capacity=100000, implicit=False):
+        self.name = name
+        self.capacity = capacity
+        self.ready = collections.deque()
+        self.implicit = implicit
+        self.configure(arguments)
+
+    def configure(self, arguments):
+        arguments = arguments or {}
+        if arguments.get('x-queue-type') == 'stream':
+            raise TransportError(f"fila '{self.name}': streams não são suportados pelo transporte embarcado")
+        # Mesma semântica das filas de retry do RabbitMQ: TTL por fila + dead-letter ao expirar
+        ttl = arguments.get('x-message-ttl')
+        self.ttl = ttl / 1000 if ttl is not None else None
+        self.dead_letter_exchange = arguments.get('x-dead-letter-exchange', '')
+        self.dead_letter_routing_key = arguments.get('x-dead-letter-routing-key')
+        self.implicit = False
+        if self.ttl is not None:
+            deadline = time.monotonic() + self.ttl
+            for message in self.ready:
+                message.expires_at = message.expires_at or deadline
+
+    def __len__(self):
+        return len(self.ready)
+
+
+class ConsistentHashExchange:
+    """Exchange ``x-consistent-hash``: anel de hash com ``peso * POINTS`` pontos por fila"""
+
+    POINTS = 100
+
+    def __init__(self, name):
+        self.name = name
+        self._bindings = {}
+        self._ring = []
+        self._keys = []
+
+    def bind(self, queue, weight):
+        self._bindings[queue] = int(weight or 1)
+        self._ring = sorted(
+            (zlib.crc32(f"{name}:{point}".encode()), name)
+            for name, points in self._bindings.items()
+            for point in range(points * self.POINTS)
+        )
+        self._keys = [point for point, _ in self._ring]
+
+    def route(self, routing_key):
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._keys, zlib.crc32(routing_key.encode())) % len(self._ring)
+        return self._ring[index][1]
+
+
+class EmbeddedBroker:
+    """Broker em processo compartilhado por todas as conexões embarcadas do processo
+
+    Publicar é só anexar a um ``deque`` sob um lock (e, para mensagens
+    persistentes com log configurado, um ``memcpy`` no segmento mmap), sem
+    rede nem serialização AMQP. Suporta a exchange padrão, ``x-consistent-hash``
+    (shards) e TTL + dead-letter (filas de retry).
+    """
+
+    def __init__(self, capacity=100000, log=None):
+        self.capacity = capacity
+        self.log = log
+        self.queues = {}
+        self.exchanges = {}
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self._ids = itertools.count(1)
+        self._consumers = []  # canais com consumers, para acordar quem espera
+        if log is not None:
+            self._recover()
+
+    def _recover(self):
+        recovered = self.log.recover()
+        for message_id, queue_name, properties, location in recovered:
+            _, _, body = self.log.read(location)
+            message = Message(message_id, body, properties, persistent=True)
+            message.redelivered = True
+            self._queue(queue_name, implicit=True).ready.append(message)
+        self._ids = itertools.count(self.log.last_id + 1)
+        if recovered:
+            logger.info(f"💾 {len(recovered)} mensagem(ns) recuperada(s) do log em '{self.log.directory}'")
+
+    def _queue(self, name, arguments=None, implicit=False):
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = EmbeddedQueue(name, arguments, self.capacity, implicit=implicit)
+        elif queue.implicit and not implicit:
+            queue.configure(arguments)
+        return queue
+
+    def declare_queue(self, name, arguments=None, passive=False):
+        with self.lock:
+            if passive:
+                if name not in self.queues:
+                    raise TransportError(f"fila '{name}' não existe")
+                return self.queues[name]
+            return self._queue(name, arguments)
+
+    def declare_exchange(self, name, exchange_type):
+        if exchange_type != 'x-consistent-hash':
+            raise TransportError(f"exchange '{name}': tipo {exchange_type!r} não suportado pelo transporte embarcado")
+        with self.lock:
+            return self.exchanges.setdefault(name, ConsistentHashExchange(name))
+
+    def bind(self, queue, exchange, routing_key):
+        with self.lock:
+            self.exchanges[exchange].bind(queue, routing_key)
+
+    def publish(self, exchange, routing_key, body, properties=None):
+        """Enfileira a mensagem; levanta ``UnroutableError``/``QueueFullError`` em vez de descartar"""
+        properties = Properties.copy_of(properties)
+        with self.changed:
+            if exchange:
+                target = self.exchanges[exchange].route(routing_key) if exchange in self.exchanges else None
+            else:
+                target = routing_key
+            queue = self.queues.get(target)
+            if queue is None:
+                raise UnroutableError(f"nenhuma fila para exchange={exchange!r} routing_key={routing_key!r}")
+            self._enqueue(queue, Message(next(self._ids), bytes(body), properties, properties.delivery_mode == 2))
+            self.changed.notify_all()
+
+    def _enqueue(self, queue, message):
+        if len(queue.ready) >= queue.capacity:
+            raise QueueFullError(f"fila '{queue.name}' cheia ({queue.capacity} mensagens)")
+        if queue.ttl is not None:
+            message.expires_at = time.monotonic() + queue.ttl
+        if message.persistent and self.log is not None:
+            self.log.append_publish(message.id, queue.name, message.properties, message.body)
+        queue.ready.append(message)
+
+    def take(self, queue):
+        """Próxima mensagem pronta da fila (ou ``None``); chamado com o lock"""
+        if not queue.ready or queue.ttl is not None:
+            # Filas com TTL não têm consumers: as mensagens só saem por expiração
+            return None
+        return queue.ready.popleft()
+
+    def settle(self, message):
+        """Conclui a mensagem (ack, nack sem requeue): some do log"""
+        if message.persistent and self.log is not None:
+            with self.lock:
+                self.log.append_ack(message.id)
+
+    def requeue(self, queue, messages):
+        with self.changed:
+            for message in reversed(messages):
+                message.redelivered = True
+                queue.ready.appendleft(message)
+            self.changed.notify_all()
+
+    def expire(self, now):
+        """Move as mensagens vencidas das filas com TTL para o dead-letter; devolve o próximo vencimento"""
+        next_due = None
+        with self.changed:
+            for queue in list(self.queues.values()):
+                if queue.ttl is None:
+                    continue
+                while queue.ready and queue.ready[0].expires_at <= now:
+                    message = queue.ready.popleft()
+                    self.settle(message)
+                    try:
+                        self.publish(queue.dead_letter_exchange, queue.dead_letter_routing_key or queue.name,
+                                     message.body, message.properties)
+                    except TransportError as e:
+                        logger.error(f"❌ Dead-letter da fila '{queue.name}' falhou; mensagem descartada: {e}")
+                if queue.ready:
+                    due = queue.ready[0].expires_at
+                    next_due = due if next_due is None else min(next_due, due)
+        return next_due
+
+    def flush(self):
+        if self.log is not None:
+            with self.lock:
+                self.log.maybe_flush()
+
+    def close(self):
+        if self.log is not None:
+            with self.lock:
+                self.log.close()
+
+
+class Method:
+    """Equivalente ao ``Basic.Deliver`` entregue ao callback"""
+
+    __slots__ = ('delivery_tag', 'redelivered', 'routing_key', 'consumer_tag')
+
+    def __init__(self, delivery_tag, redelivered, routing_key, consumer_tag):
+        self.delivery_tag = delivery_tag
+        self.redelivered = redelivered
+        self.routing_key = routing_key
+        self.consumer_tag = consumer_tag
+
+
+class DeclareOk:
+    """Resposta do ``queue_declare`` (``result.method.message_count``)"""
+
+    def __init__(self, queue):
+        self.method = self
+        self.queue = queue.name
+        self.message_count = len(queue)
+
+
+class EmbeddedChannel:
+    """Canal com a API do ``BlockingChannel`` usada pelo runtime dos consumers"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.prefetch = 0
+        self.consumers = {}  # tag -> (fila, callback)
+        self.unacked = collections.OrderedDict()  # delivery_tag -> (fila, mensagem)
+        self._delivery_tags = itertools.count(1)
+        self._consumer_tags = itertools.count(1)
+        self.is_open = True
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    def confirm_delivery(self):
+        """A publicação embarcada é síncrona: voltar de ``basic_publish`` já é o confirm"""
+
+    def tx_select(self):
+        """Transações são aceitas, mas cada ``basic_publish`` já é aplicado na hora"""
+
+    def tx_commit(self):
+        pass
+
+    def add_on_cancel_callback(self, callback):
+        """O broker embarcado nunca cancela consumers"""
+
+    def queue_declare(self, queue, durable=True, arguments=None, passive=False, **kwargs):
+        return DeclareOk(self.broker.declare_queue(queue, arguments, passive=passive))
+
+    def exchange_declare(self, exchange, exchange_type='direct', durable=True, **kwargs):
+        self.broker.declare_exchange(exchange, exchange_type)
+
+    def queue_bind(self, queue, exchange, routing_key=None, **kwargs):
+        self.broker.bind(queue, exchange, routing_key)
+
+    def basic_qos(self, prefetch_count=0, **kwargs):
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, arguments=None, **kwargs):
+        if arguments and 'x-stream-offset' in arguments:
+            raise TransportError(f"fila '{queue}': streams não são suportados pelo transporte embarcado")
+        tag = f"embedded-{next(self._consumer_tags)}"
+        with self.broker.lock:
+            self.consumers[tag] = (self.broker.declare_queue(queue, passive=True), on_message_callback)
+        return tag
+
+    def basic_cancel(self, consumer_tag):
+        with self.broker.lock:
+            self.consumers.pop(consumer_tag, None)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.broker.publish(exchange, routing_key, body, properties)
+
+    def _settled(self, delivery_tag, multiple):
+        if not multiple:
+            entry = self.unacked.pop(delivery_tag, None)
+            return [entry] if entry else []
+        settled = []
+        while self.unacked:
+            tag = next(iter(self.unacked))
+            if tag > delivery_tag:
+                break
+            settled.append(self.unacked.pop(tag))
+        return settled
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        for _, message in self._settled(delivery_tag, multiple):
+            self.broker.settle(message)
+        self.connection.wake()
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        settled = self._settled(delivery_tag, multiple)
+        for queue, message in settled:
+            if requeue:
+                self.broker.requeue(queue, [message])
+            else:
+                self.broker.settle(message)
+        self.connection.wake()
+
+    def _deliver(self):
+        """Entrega mensagens prontas respeitando o prefetch; devolve quantas entregou"""
+        delivered = 0
+        for tag, (queue, callback) in list(self.consumers.items()):
+            while self.is_open and tag in self.consumers and (not self.prefetch or len(self.unacked) < self.prefetch):
+                with self.broker.lock:
+                    message = self.broker.take(queue)
+                if message is None:
+                    break
+                delivery_tag = next(self._delivery_tags)
+                self.unacked[delivery_tag] = (queue, message)
+                delivered += 1
+                callback(self, Method(delivery_tag, message.redelivered, queue.name, tag), message.properties, message.body)
+        return delivered
+
+    def close(self):
+        """Fecha o canal; mensagens sem ack voltam para as filas (como no RabbitMQ)"""
+        if not self.is_open:
+            return
+        self.is_open = False
+        with self.broker.lock:
+            self.consumers.clear()
+        pending = collections.defaultdict(list)
+        for queue, message in self.unacked.values():
+            pending[queue].append(message)
+        self.unacked.clear()
+        for queue, messages in pending.items():
+            self.broker.requeue(queue, messages)
+
+
+class EmbeddedConnection:
+    """Conexão com a API da ``BlockingConnection`` usada pelo runtime dos consumers
+
+    ``process_data_events`` executa, na thread que a chama, os callbacks
+    agendados por outras threads, os timers vencidos, a expiração das filas com
+    TTL e a entrega aos consumers; sem trabalho, dorme na condição do broker.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.channels = []
+        self._callbacks = collections.deque()
+        self._timers = []
+        self._timer_ids = itertools.count()
+        self._pending_wake = False
+        self.is_open = True
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    def channel(self):
+        channel = EmbeddedChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    def wake(self):
+        self._pending_wake = True
+
+    def add_callback_threadsafe(self, callback):
+        with self.broker.changed:
+            self._callbacks.append(callback)
+            self.broker.changed.notify_all()
+
+    def call_later(self, delay, callback):
+        timer = [time.monotonic() + delay, next(self._timer_ids), callback]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def remove_timeout(self, timer):
+        timer[2] = None
+
+    def _run_timers(self, now):
+        ran = 0
+        while self._timers and self._timers[0][0] <= now:
+            _, _, callback = heapq.heappop(self._timers)
+            if callback is not None:
+                callback()
+                ran += 1
+        return ran
+
+    def _pump(self):
+        worked = 0
+        while self._callbacks:
+            self._callbacks.popleft()()
+            worked += 1
+        now = time.monotonic()
+        worked += self._run_timers(now)
+        next_due = self.broker.expire(now)
+        self.channels = [channel for channel in self.channels if channel.is_open]
+        for channel in self.channels:
+            worked += channel._deliver()
+        self.broker.flush()
+        if self._pending_wake:
+            self._pending_wake = False
+            worked += 1
+        return worked, next_due
+
+    def _has_ready(self):
+        return any(
+            queue.ready and queue.ttl is None and (not channel.prefetch or len(channel.unacked) < channel.prefetch)
+            for channel in self.channels
+            for queue, _ in channel.consumers.values()
+        )
+
+    def process_data_events(self, time_limit=0):
+        deadline = time.monotonic() + (time_limit or 0)
+        while self.is_open:
+            worked, next_due = self._pump()
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if worked:
+                continue
+            wake_at = min(due for due in (deadline, next_due, self._timers[0][0] if self._timers else None) if due is not None)
+            with self.broker.changed:
+                if not self._callbacks and not self._has_ready():
+                    self.broker.changed.wait(max(0.0, wake_at - now))
+
+    def sleep(self, duration):
+        self.process_data_events(time_limit=duration)
+
+    def close(self):
+        for channel in self.channels:
+            channel.close()
+        self.channels = []
+        self.is_open = False
+
+
+class EmbeddedTransport:
+    """Transporte embarcado: conexões para o broker em processo (TRANSPORT=embedded)"""
+
+    def __init__(self, broker=None):
+        self.broker = broker or get_broker()
+
+    def connect(self, should_stop=lambda: False, max_attempts=None):
+        logger.info("✅ Conectado ao broker embarcado")
+        return EmbeddedConnection(self.broker)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Broker embarcado do processo, criado na primeira chamada a partir do ambiente
+
+    ``EMBEDDED_LOG_DIR`` liga o log em disco (sem ele, tudo fica só em memória);
+    ``EMBEDDED_QUEUE_CAPACITY`` limita cada fila, ``EMBEDDED_SEGMENT_SIZE`` o
+    tamanho dos segmentos e ``EMBEDDED_FSYNC`` (always|interval|never) a durabilidade.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            directory = os.getenv('EMBEDDED_LOG_DIR')
+            log = SegmentLog(
+                directory,
+                segment_size=int(os.getenv('EMBEDDED_SEGMENT_SIZE', 64 * 1024 * 1024)),
+                fsync=os.getenv('EMBEDDED_FSYNC', 'interval').lower(),
+                flush_interval=float(os.getenv('EMBEDDED_FSYNC_INTERVAL_MS', 50)) / 1000
+            ) if directory else None
+            _broker = EmbeddedBroker(capacity=int(os.getenv('EMBEDDED_QUEUE_CAPACITY', 100000)), log=log)
+        return _broker
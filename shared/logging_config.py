@@ -0,0 +1,126 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+# Atributos padrão do LogRecord; o que sobrar veio de ``extra`` e vira campo do JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_configured = False
+
+
+def event(name, **fields):
+    """Monta o ``extra`` de um evento estruturado: ``logger.info(msg, extra=event('email_sent', to=...))``"""
+    fields['event'] = name
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos de ``extra`` no nível de cima"""
+
+    def __init__(self, service=None):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if self.service:
+            entry['service'] = self.service
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Amostragem por evento para linhas de sucesso de alto volume
+
+    Só registros com ``event`` e nível abaixo de WARNING são amostrados: a taxa
+    vem de ``LOG_SAMPLE_<EVENTO>`` (ex.: LOG_SAMPLE_EMAIL_SENT=0.01) ou de
+    ``LOG_SAMPLE_RATE``. Registros mantidos levam ``sample_rate`` para que quem
+    agrega os logs possa reponderar as contagens.
+    """
+
+    def __init__(self, default_rate=1.0, rates=None):
+        super().__init__()
+        self.default_rate = default_rate
+        self.rates = rates or {}
+
+    @classmethod
+    def from_env(cls):
+        rates = {
+            key[len('LOG_SAMPLE_'):].lower(): float(value)
+            for key, value in os.environ.items()
+            if key.startswith('LOG_SAMPLE_') and key != 'LOG_SAMPLE_RATE'
+        }
+        return cls(float(os.getenv('LOG_SAMPLE_RATE', 1.0)), rates)
+
+    def filter(self, record):
+        name = getattr(record, 'event', None)
+        if name is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(name, self.default_rate)
+        if rate >= 1.0:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+def configure_logging(service=None):
+    """Configura o logging do processo a partir do ambiente (idempotente)
+
+    - ``LOG_FORMAT``: ``text`` (padrão) ou ``json``;
+    - ``LOG_LEVEL``: nível do logger raiz (padrão INFO; payloads só saem em DEBUG);
+    - ``LOG_ASYNC``: com ``true`` (padrão), o thread que loga só enfileira o
+      registro e a formatação/escrita acontece em um thread do QueueListener;
+    - ``LOG_SAMPLE_RATE`` / ``LOG_SAMPLE_<EVENTO>``: amostragem (ver SamplingFilter).
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        formatter = JsonFormatter(service)
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    if os.getenv('LOG_ASYNC', 'true').lower() in ('1', 'true', 'yes'):
+        # A formatação da mensagem (args) é feita no prepare() do QueueHandler,
+        # e só depois do filtro: registros descartados pela amostragem não custam formatação
+        handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        listener.start()
+        # Descarrega o que ainda estiver na fila ao encerrar o processo
+        atexit.register(listener.stop)
+    else:
+        handler = output
+
+    handler.addFilter(SamplingFilter.from_env())
+    root.addHandler(handler)
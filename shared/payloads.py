@@ -0,0 +1,177 @@
+import asyncio
+import gzip
+import importlib
+import logging
+import os
+import re
+import tempfile
+import uuid
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd é opcional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Header com a referência do corpo guardado no blob store (claim-check)
+CLAIM_CHECK_HEADER = 'x-claim-check'
+BLOB_KEY = re.compile(r"^[0-9a-f]{32}$")
+
+
+class PayloadError(ValueError):
+    """Corpo comprimido inválido, encoding desconhecido ou blob ausente"""
+
+
+class FilesystemBlobStore:
+    """Blob store em um diretório local (ou volume compartilhado entre gateway e consumers)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        if not BLOB_KEY.match(key):
+            raise PayloadError(f"Chave de blob inválida: {key!r}")
+        return os.path.join(self.directory, key)
+
+    def put(self, data: bytes) -> str:
+        key = uuid.uuid4().hex
+        # Escrita atômica: o consumer nunca vê um blob pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return key
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise PayloadError(f"Blob {key} não encontrado em {self.directory}") from None
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+def create_blob_store():
+    """Cria o blob store de BLOB_STORE: 'filesystem' (padrão) ou 'modulo:Classe' (ex.: um cliente S3)"""
+    backend = os.getenv('BLOB_STORE', 'filesystem')
+    if backend == 'filesystem':
+        return FilesystemBlobStore(os.getenv('BLOB_STORE_DIR', '/data/blobs'))
+
+    module_name, _, class_name = backend.partition(':')
+    logger.info(f"🗄️ Blob store: {backend}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class PayloadCodec:
+    """Compressão transparente e claim-check para corpos grandes
+
+    - Acima de ``compress_threshold`` bytes o corpo é comprimido (zstd se o
+      pacote ``zstandard`` estiver instalado, senão gzip) e o algoritmo vai em
+      ``content_encoding``;
+    - Acima de ``claim_check_threshold`` bytes (já comprimido) o corpo vai para
+      o blob store e só a chave trafega, no header ``x-claim-check``.
+
+    Um limite 0 desliga a etapa correspondente. O blob store só é criado na
+    primeira vez que é necessário.
+    """
+
+    def __init__(self, compress_threshold=16384, claim_check_threshold=0, algorithm=None, level=None, blob_store=None):
+        self.compress_threshold = compress_threshold
+        self.claim_check_threshold = claim_check_threshold
+        self.algorithm = algorithm or ('zstd' if zstandard is not None else 'gzip')
+        if self.algorithm == 'zstd' and zstandard is None:
+            logger.warning("⚠️ zstandard não instalado; usando gzip")
+            self.algorithm = 'gzip'
+        self.level = level
+        self._blob_store = blob_store
+
+    @classmethod
+    def from_env(cls):
+        level = os.getenv('PAYLOAD_COMPRESSION_LEVEL')
+        return cls(
+            compress_threshold=int(os.getenv('PAYLOAD_COMPRESS_THRESHOLD', 16384)),
+            claim_check_threshold=int(os.getenv('PAYLOAD_CLAIM_CHECK_THRESHOLD', 0)),
+            algorithm=os.getenv('PAYLOAD_COMPRESSION') or None,
+            level=int(level) if level else None
+        )
+
+    @property
+    def blob_store(self):
+        if self._blob_store is None:
+            self._blob_store = create_blob_store()
+        return self._blob_store
+
+    def _compress(self, body):
+        if self.algorithm == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level or 3).compress(body)
+        return gzip.compress(body, compresslevel=self.level or 5)
+
+    @staticmethod
+    def _decompress(body, encoding):
+        if not encoding or encoding == 'identity':
+            return body
+        try:
+            if encoding == 'gzip':
+                return gzip.decompress(body)
+            if encoding == 'zstd' and zstandard is not None:
+                return zstandard.ZstdDecompressor().decompress(body)
+        except (OSError, EOFError, ValueError) as e:
+            raise PayloadError(f"Corpo {encoding} inválido: {e}") from e
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise PayloadError(f"Corpo {encoding} inválido: {e}") from e
+            raise
+        raise PayloadError(f"content_encoding não suportado: {encoding!r}")
+
+    def pack(self, body: bytes):
+        """Retorna ``(corpo, content_encoding, headers)`` prontos para publicar"""
+        encoding = None
+        if self.compress_threshold and len(body) >= self.compress_threshold:
+            compressed = self._compress(body)
+            # Só vale a pena se realmente diminuiu (ex.: corpos já comprimidos)
+            if len(compressed) < len(body):
+                body, encoding = compressed, self.algorithm
+
+        if self.claim_check_threshold and len(body) >= self.claim_check_threshold:
+            return b'', encoding, {CLAIM_CHECK_HEADER: self.blob_store.put(body)}
+        return body, encoding, None
+
+    def is_heavy(self, size: int) -> bool:
+        """Se ``pack`` de um corpo desse tamanho vai comprimir ou gravar no blob store"""
+        return bool(
+            (self.compress_threshold and size >= self.compress_threshold)
+            or (self.claim_check_threshold and size >= self.claim_check_threshold)
+        )
+
+    async def pack_async(self, body: bytes):
+        """``pack`` para código async: compressão e gravação do blob rodam fora do event loop"""
+        if self.is_heavy(len(body)):
+            return await asyncio.to_thread(self.pack, body)
+        return self.pack(body)
+
+    def unpack(self, body: bytes, content_encoding=None, headers=None) -> bytes:
+        """Busca o corpo no blob store (se for claim-check) e descomprime"""
+        key = headers.get(CLAIM_CHECK_HEADER) if headers else None
+        if key:
+            body = self.blob_store.get(key)
+        return self._decompress(body, content_encoding)
+
+    def release(self, headers=None):
+        """Remove o blob de uma mensagem já processada, ou cuja publicação falhou"""
+        key = headers.get(CLAIM_CHECK_HEADER) if headers else None
+        if key:
+            try:
+                self.blob_store.delete(key)
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao remover blob {key}: {e}")
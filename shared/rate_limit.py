@@ -0,0 +1,45 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Token bucket por chave, com número limitado de chaves (LRU)
+
+    Ao passar de ``max_keys`` a chave usada há mais tempo é descartada, esteja
+    o bucket dela cheio ou não: se voltar, ela recomeça com ``burst`` tokens.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # chave -> (tokens, atualizado_em)
+
+    def _tokens(self, key, now):
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def peek(self, key: str) -> float:
+        """Segundos até haver um token para ``key`` (0 = disponível), sem consumir"""
+        tokens = self._tokens(key, time.monotonic())
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def acquire(self, key: str) -> float:
+        """Consome um token; retorna 0 se permitido ou os segundos até o próximo token"""
+        now = time.monotonic()
+        tokens = self._tokens(key, now)
+        self._buckets.pop(key, None)
+
+        if tokens >= 1:
+            wait = 0.0
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
@@ -0,0 +1,22 @@
+"""Contrato entre o gateway e o scheduler de notificações agendadas
+
+Uma mensagem com ``deliver_at`` (epoch em segundos) no futuro é publicada em
+``queue_scheduled`` em vez da fila de destino; a exchange e a routing key que
+ela teria usado viajam nos headers, então o scheduler não precisa conhecer
+shards nem filas expressas e só a republica no horário.
+"""
+import os
+
+SCHEDULED_QUEUE = 'queue_scheduled'
+
+DELIVER_AT_HEADER = 'x-deliver-at'
+TARGET_EXCHANGE_HEADER = 'x-target-exchange'
+TARGET_ROUTING_KEY_HEADER = 'x-target-routing-key'
+SCHEDULE_HEADERS = (DELIVER_AT_HEADER, TARGET_EXCHANGE_HEADER, TARGET_ROUTING_KEY_HEADER)
+
+# Atrasos menores que isso são publicados direto: passar pelo scheduler só somaria latência
+MIN_DELAY = float(os.getenv('SCHEDULE_MIN_DELAY_MS', 1000)) / 1000
+
+
+def schedule_headers(deliver_at, exchange, routing_key):
+    return {DELIVER_AT_HEADER: deliver_at, TARGET_EXCHANGE_HEADER: exchange, TARGET_ROUTING_KEY_HEADER: routing_key}
@@ -0,0 +1,329 @@
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+# Registro do log: tipo, tamanho do nome da fila, tamanho do payload, id da mensagem, crc32
+RECORD_HEADER = struct.Struct('<BHIQI')
+PROPERTIES_SIZE = struct.Struct('<I')
+PUBLISH, ACK = 1, 2
+
+
+def _checksum(data, message_id):
+    return zlib.crc32(data, message_id & 0xFFFFFFFF)
+
+
+class Properties:
+    """Propriedades de uma mensagem (mesmos atributos do ``pika.BasicProperties``)"""
+
+    __slots__ = ('content_type', 'content_encoding', 'headers', 'message_id', 'delivery_mode')
+
+    def __init__(self, content_type=None, content_encoding=None, headers=None, message_id=None, delivery_mode=None):
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.headers = headers
+        self.message_id = message_id
+        self.delivery_mode = delivery_mode
+
+    @classmethod
+    def copy_of(cls, properties):
+        """Copia de qualquer objeto com esses atributos (pika, aio-pika ou ``None``)"""
+        if properties is None:
+            return cls()
+        headers = getattr(properties, 'headers', None)
+        return cls(
+            content_type=getattr(properties, 'content_type', None),
+            content_encoding=getattr(properties, 'content_encoding', None),
+            headers=dict(headers) if headers else None,
+            message_id=getattr(properties, 'message_id', None),
+            delivery_mode=getattr(properties, 'delivery_mode', None)
+        )
+
+    def to_bytes(self):
+        return json.dumps({name: getattr(self, name) for name in self.__slots__}, separators=(',', ':')).encode()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(**json.loads(data))
+
+
+class SegmentLog:
+    """Log append-only em segmentos mapeados em memória (mmap)
+
+    Cada mensagem guardada grava um registro ``PUBLISH`` e cada conclusão um
+    ``ACK``; na reabertura, ``recover`` devolve as mensagens ainda sem ack com a
+    sua posição no disco, e ``read`` busca a mensagem só quando ela é necessária.
+    Qualquer segmento (menos o atual) é removido assim que todas as suas
+    mensagens recebem ack, mesmo com segmentos mais antigos ainda pendentes:
+    os ``ACK`` dele que anulam ``PUBLISH`` de segmentos que continuam no disco
+    são regravados no segmento atual antes da remoção, para que nunca sumam
+    antes do ``PUBLISH`` correspondente. Com ``rewrite_ratio``, um segmento
+    cujas mensagens pendentes ocupam até essa fração do tamanho do segmento tem
+    essas mensagens regravadas no segmento atual e é liberado: poucas mensagens
+    de vida longa (ex.: agendamentos distantes) não prendem segmentos inteiros.
+    Como a posição muda, quem usa essa opção lê por id (``read_message``).
+    ``fsync``: ``always`` faz ``msync`` a
+    cada registro, ``interval`` no máximo a cada ``flush_interval`` segundos e
+    ``never`` deixa para o SO. A entrega é "pelo menos uma vez": uma mensagem
+    pode reaparecer após uma queda (a deduplicação por message_id dos
+    consumers cobre esse caso).
+    """
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, fsync='interval', flush_interval=0.05, rewrite_ratio=0.0):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.rewrite_ratio = rewrite_ratio
+        os.makedirs(directory, exist_ok=True)
+        self._live = {}        # segmento -> ids das mensagens sem ack
+        self._acks = {}        # segmento -> {segmento do PUBLISH: ids} dos ACK que anulam segmentos mais antigos
+        self._locations = {}   # id da mensagem -> (segmento, offset)
+        self._sizes = {}       # id da mensagem -> tamanho do registro PUBLISH
+        self._live_bytes = {}  # segmento -> bytes das mensagens sem ack
+        self._readers = {}     # segmentos antigos abertos para leitura
+        self._number = None
+        self._file = None
+        self._map = None
+        self._offset = 0
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+        self._compacting = False
+        self._rolled = False   # houve troca de segmento desde a última compactação
+        # Maior id já gravado: ids novos continuam daqui, mesmo após uma reabertura
+        self.last_id = 0
+
+    def __len__(self):
+        return len(self._locations)
+
+    def _path(self, number):
+        return os.path.join(self.directory, f"{number:010d}.log")
+
+    def _segments(self):
+        return sorted(int(name[:-4]) for name in os.listdir(self.directory) if name.endswith('.log'))
+
+    def recover(self):
+        """Lê os segmentos existentes e devolve ``[(id, fila, properties, posição)]`` sem ack, em ordem
+
+        As posições são as de depois da compactação da reabertura (que pode
+        regravar mensagens e remover segmentos), válidas até a próxima gravação.
+        """
+        pending = {}
+        for number in self._segments():
+            self._live[number] = set()
+            self._acks[number] = {}
+            self._live_bytes[number] = 0
+            with open(self._path(number), 'rb') as segment:
+                data = segment.read()
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(data):
+                kind, queue_size, payload_size, message_id, crc = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                end = start + queue_size + payload_size
+                # Fim dos registros (área ainda zerada) ou registro truncado por uma queda
+                if kind not in (PUBLISH, ACK) or end > len(data) or _checksum(data[start:end], message_id) != crc:
+                    break
+                if kind == PUBLISH:
+                    queue = data[start:start + queue_size].decode()
+                    properties_start = start + queue_size + PROPERTIES_SIZE.size
+                    (properties_size,) = PROPERTIES_SIZE.unpack_from(data, start + queue_size)
+                    properties = Properties.from_bytes(data[properties_start:properties_start + properties_size])
+                    pending[message_id] = (queue, properties)
+                    self._track(message_id, (number, offset), end - offset)
+                elif pending.pop(message_id, None) is not None:
+                    self._untrack(message_id, number)
+                self.last_id = max(self.last_id, message_id)
+                offset = end
+
+        self._roll(max(self._segments(), default=0) + 1, self.segment_size)
+        self._compact()
+        return [
+            (message_id, *pending[message_id], self._locations[message_id])
+            for message_id in sorted(pending)
+        ]
+
+    def append_publish(self, message_id, queue, properties, body):
+        """Grava a mensagem e devolve a sua posição ``(segmento, offset)``"""
+        properties_bytes = properties.to_bytes()
+        payload = PROPERTIES_SIZE.pack(len(properties_bytes)) + properties_bytes + body
+        queue = queue.encode()
+        location = self._append(PUBLISH, message_id, queue, payload)
+        self._track(message_id, location, RECORD_HEADER.size + len(queue) + len(payload))
+        self.last_id = max(self.last_id, message_id)
+        if self._rolled:
+            self._compact()
+        return location
+
+    def append_ack(self, message_id):
+        if message_id not in self._locations:
+            return
+        number, _ = self._append(ACK, message_id, b'', b'')
+        if not self._untrack(message_id, number) or self._rolled:
+            self._compact()
+
+    def _track(self, message_id, location, size):
+        previous = self._locations.get(message_id)
+        if previous is not None:
+            # PUBLISH repetido (cópia regravada): vale a posição mais nova
+            self._live[previous[0]].discard(message_id)
+            self._live_bytes[previous[0]] -= self._sizes[message_id]
+        self._locations[message_id] = location
+        self._sizes[message_id] = size
+        self._live[location[0]].add(message_id)
+        self._live_bytes[location[0]] += size
+
+    def _untrack(self, message_id, ack_segment):
+        """Marca o ack; devolve quantas mensagens ainda vivem no segmento do PUBLISH"""
+        number, _ = self._locations.pop(message_id)
+        live = self._live[number]
+        live.discard(message_id)
+        self._live_bytes[number] -= self._sizes.pop(message_id)
+        if number != ack_segment:
+            self._acks[ack_segment].setdefault(number, []).append(message_id)
+        return len(live)
+
+    def read_message(self, message_id):
+        """``(fila, properties, corpo)`` de uma mensagem pendente, onde quer que esteja agora"""
+        return self.read(self._locations[message_id])
+
+    def _segment_data(self, number):
+        if number == self._number:
+            return self._map
+        data = self._readers.get(number)
+        if data is None:
+            with open(self._path(number), 'rb') as segment:
+                data = self._readers[number] = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        return data
+
+    def read(self, location):
+        """``(fila, properties, corpo)`` da mensagem gravada em ``location``"""
+        number, offset = location
+        data = self._segment_data(number)
+        _, queue_size, payload_size, _, _ = RECORD_HEADER.unpack_from(data, offset)
+        queue_start = offset + RECORD_HEADER.size
+        start = queue_start + queue_size
+        (properties_size,) = PROPERTIES_SIZE.unpack_from(data, start)
+        properties_end = start + PROPERTIES_SIZE.size + properties_size
+        return (
+            bytes(data[queue_start:start]).decode(),
+            Properties.from_bytes(data[start + PROPERTIES_SIZE.size:properties_end]),
+            bytes(data[properties_end:start + payload_size])
+        )
+
+    def _append(self, kind, message_id, queue, payload):
+        data = queue + payload
+        size = RECORD_HEADER.size + len(data)
+        if self._offset + size > len(self._map):
+            self._roll(self._number + 1, max(self.segment_size, size))
+        offset = self._offset
+        RECORD_HEADER.pack_into(self._map, offset, kind, len(queue), len(payload), message_id, _checksum(data, message_id))
+        self._map[offset + RECORD_HEADER.size:offset + size] = data
+        self._offset += size
+        self._dirty = True
+        if self.fsync == 'always':
+            self.flush()
+        return self._number, offset
+
+    def _roll(self, number, size):
+        """Fecha o segmento atual e abre o próximo, já com o tamanho final (sem realocar no meio)
+
+        Não compacta: a compactação grava registros, e quem trocou de segmento
+        no meio de ``_append`` ainda vai gravar o seu. Ela roda depois, quando
+        o registro já está no lugar (``_rolled``).
+        """
+        self._close_segment()
+        self._file = open(self._path(number), 'w+b')
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._number = number
+        self._offset = 0
+        self._live.setdefault(number, set())
+        self._acks.setdefault(number, {})
+        self._live_bytes.setdefault(number, 0)
+        self._rolled = True
+
+    def _compact(self):
+        """Remove os segmentos sem mensagens pendentes (nunca o atual), em qualquer posição"""
+        if self._compacting:
+            return
+        self._compacting = True
+        self._rolled = False
+        try:
+            if self.rewrite_ratio > 0 and self._rewrite_sparse():
+                # As cópias precisam estar no disco antes de os segmentos de origem sumirem
+                self.flush()
+            for number in sorted(self._live):
+                if number not in self._live or number == self._number or self._live[number]:
+                    continue
+                # ACKs que ainda anulam PUBLISH em segmentos no disco passam para o segmento atual
+                carried = False
+                for published_in, message_ids in self._acks[number].items():
+                    if published_in not in self._live:
+                        continue
+                    for message_id in message_ids:
+                        ack_segment, _ = self._append(ACK, message_id, b'', b'')
+                        self._acks[ack_segment].setdefault(published_in, []).append(message_id)
+                        carried = True
+                if carried:
+                    # Os ACKs regravados precisam estar no disco antes de o original sumir
+                    self.flush()
+                self._remove(number)
+        finally:
+            self._compacting = False
+
+    def _rewrite_sparse(self):
+        """Regrava no segmento atual as mensagens de segmentos quase vazios; devolve se regravou algo"""
+        limit = self.rewrite_ratio * self.segment_size
+        rewritten = False
+        for number in sorted(self._live):
+            if number == self._number or not self._live.get(number) or self._live_bytes[number] > limit:
+                continue
+            data = self._segment_data(number)
+            for message_id in sorted(self._live[number]):
+                offset = self._locations[message_id][1]
+                _, queue_size, payload_size, _, _ = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                queue = bytes(data[start:start + queue_size])
+                payload = bytes(data[start + queue_size:start + queue_size + payload_size])
+                self._track(message_id, self._append(PUBLISH, message_id, queue, payload), self._sizes[message_id])
+                rewritten = True
+        return rewritten
+
+    def _remove(self, number):
+        del self._live[number]
+        del self._acks[number]
+        del self._live_bytes[number]
+        for acks in self._acks.values():
+            acks.pop(number, None)
+        reader = self._readers.pop(number, None)
+        if reader is not None:
+            reader.close()
+        try:
+            os.remove(self._path(number))
+        except FileNotFoundError:
+            pass
+
+    def maybe_flush(self):
+        if self._dirty and self.fsync == 'interval' and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._map is not None and self._dirty:
+            self._map.flush()
+            self._dirty = False
+        self._flushed_at = time.monotonic()
+
+    def _close_segment(self):
+        if self._map is not None:
+            self.flush()
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def close(self):
+        self._close_segment()
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
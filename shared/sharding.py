@@ -0,0 +1,79 @@
+import os
+
+from shared.topology import is_stream, queue_arguments
+
+# Filas que podem ser particionadas e o campo da mensagem usado como chave de hash
+SHARD_KEYS = {
+    'queue_pedidos': 'pedido_id',
+}
+
+
+class ShardedQueue:
+    """Fila lógica particionada em N filas atrás de uma exchange ``x-consistent-hash``
+
+    A exchange ``<fila>.hash`` distribui pela chave da mensagem (ex.: ``pedido_id``):
+    a mesma chave sempre cai no mesmo shard ``<fila>.shard.<i>``, preservando a
+    ordem por chave. Cada shard é declarado com ``x-single-active-consumer``, então
+    várias réplicas podem assinar o mesmo shard sem quebrar a ordem (uma fica ativa,
+    as outras de reserva). Requer o plugin ``rabbitmq_consistent_hash_exchange``.
+    """
+
+    def __init__(self, queue_name, shards, key_field):
+        self.queue_name = queue_name
+        self.shards = shards
+        self.key_field = key_field
+        self.exchange = f"{queue_name}.hash"
+        self.queues = [f"{queue_name}.shard.{index}" for index in range(shards)]
+
+    def routing_key(self, message):
+        return str(message.get(self.key_field))
+
+    def queue_arguments(self):
+        # Mesmo tipo (classic/quorum; stream é recusado em sharded_queue) da fila lógica
+        arguments = dict(queue_arguments(self.queue_name) or {})
+        arguments['x-single-active-consumer'] = True
+        return arguments
+
+    def declare_shard(self, channel, index):
+        """Declara a exchange, o shard ``index`` e o binding em um canal pika"""
+        channel.exchange_declare(exchange=self.exchange, exchange_type='x-consistent-hash', durable=True)
+        channel.queue_declare(queue=self.queues[index], durable=True, arguments=self.queue_arguments())
+        # Na consistent-hash a routing key do binding é o peso do shard
+        channel.queue_bind(queue=self.queues[index], exchange=self.exchange, routing_key='1')
+
+    def declare(self, channel):
+        """Declara exchange, shards e bindings em um canal pika"""
+        for index in range(self.shards):
+            self.declare_shard(channel, index)
+
+    async def declare_async(self, channel):
+        """Declara exchange, shards e bindings em um canal aio-pika"""
+        exchange = await channel.declare_exchange(self.exchange, type='x-consistent-hash', durable=True)
+        for name in self.queues:
+            queue = await channel.declare_queue(name, durable=True, arguments=self.queue_arguments())
+            await queue.bind(exchange, routing_key='1')
+
+
+def sharded_queue(queue_name):
+    """ShardedQueue configurada em SHARDS_<FILA> (ex.: SHARDS_QUEUE_PEDIDOS=4), ou ``None`` (0/1 = desligado)
+
+    Shards são consumidos de forma destrutiva, com um consumer ativo por vez:
+    combinar com QUEUE_TYPE=stream é recusado na subida (gateway e consumers).
+    """
+    shards = int(os.getenv(f"SHARDS_{queue_name.upper()}", 0))
+    if shards <= 1 or queue_name not in SHARD_KEYS:
+        return None
+    if is_stream(queue_name):
+        raise ValueError(
+            f"SHARDS_{queue_name.upper()}={shards} não é suportado com fila do tipo stream; "
+            f"use classic/quorum (QUEUE_TYPE_{queue_name.upper()}) ou desligue o particionamento"
+        )
+    return ShardedQueue(queue_name, shards, SHARD_KEYS[queue_name])
+
+
+def sharded_queues():
+    return {
+        queue_name: sharding
+        for queue_name in SHARD_KEYS
+        if (sharding := sharded_queue(queue_name)) is not None
+    }
@@ -0,0 +1,36 @@
+import os
+
+QUEUE_TYPES = ('classic', 'quorum', 'stream')
+
+
+def queue_type(queue_name):
+    """Tipo da fila: QUEUE_TYPE_<FILA> (ex.: QUEUE_TYPE_QUEUE_ADMIN=stream) ou QUEUE_TYPE; padrão classic
+
+    Gateway e consumers precisam declarar a fila com os mesmos argumentos, senão o
+    broker recusa a declaração (PRECONDITION_FAILED). Trocar o tipo de uma fila
+    existente exige removê-la (ou migrar para uma fila nova) antes.
+    """
+    value = os.getenv(f"QUEUE_TYPE_{queue_name.upper()}", os.getenv('QUEUE_TYPE', 'classic')).lower()
+    if value not in QUEUE_TYPES:
+        raise ValueError(f"Tipo de fila inválido para '{queue_name}': {value!r} (use {', '.join(QUEUE_TYPES)})")
+    return value
+
+
+def is_stream(queue_name):
+    return queue_type(queue_name) == 'stream'
+
+
+def queue_arguments(queue_name):
+    """Argumentos de ``queue_declare`` para o tipo configurado (``None`` para classic)"""
+    kind = queue_type(queue_name)
+    if kind == 'classic':
+        return None
+
+    arguments = {'x-queue-type': kind}
+    if kind == 'stream':
+        # Retenção do histórico: por idade (ex.: 7D, 12h) e/ou por tamanho total
+        arguments['x-max-age'] = os.getenv('STREAM_MAX_AGE', '7D')
+        max_bytes = int(os.getenv('STREAM_MAX_LENGTH_BYTES', 0))
+        if max_bytes:
+            arguments['x-max-length-bytes'] = max_bytes
+    return arguments
@@ -0,0 +1,39 @@
+"""Camada de transporte usada pelo runtime dos consumers e pelo gateway
+
+Um transporte expõe ``connect(should_stop=..., max_attempts=...)`` e devolve uma
+conexão com o mesmo subconjunto da ``pika.BlockingConnection`` que o runtime usa:
+
+- conexão: ``channel()``, ``process_data_events(time_limit)``, ``sleep()``,
+  ``add_callback_threadsafe()``, ``call_later()``, ``remove_timeout()``,
+  ``is_open``/``is_closed`` e ``close()``;
+- canal: ``queue_declare``, ``exchange_declare``, ``queue_bind``, ``basic_qos``,
+  ``basic_consume``/``basic_cancel``, ``basic_publish``, ``basic_ack``,
+  ``basic_nack``, ``confirm_delivery``, ``tx_select``/``tx_commit``,
+  ``add_on_cancel_callback`` e ``close()``.
+
+Backends (``TRANSPORT``):
+
+- ``amqp`` (padrão): RabbitMQ via pika, com failover/backoff do ``ConnectionManager``;
+- ``embedded``: fila em processo (``shared.embedded_queue``), com log em disco opcional.
+"""
+import os
+
+
+class TransportError(Exception):
+    """Falha de publicação/consumo de um transporte que não é o pika (ex.: fila cheia)"""
+
+
+def transport_name():
+    return os.getenv('TRANSPORT', 'amqp').lower()
+
+
+def create_transport():
+    """Cria o transporte configurado em TRANSPORT"""
+    name = transport_name()
+    if name == 'embedded':
+        from shared.embedded_queue import EmbeddedTransport
+        return EmbeddedTransport()
+    if name == 'amqp':
+        from shared.broker import ConnectionManager
+        return ConnectionManager()
+    raise ValueError(f"TRANSPORT desconhecido: {name!r} (use amqp ou embedded)")
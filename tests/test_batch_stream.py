@@ -0,0 +1,80 @@
+"""Lote NDJSON com ?stream=true atravessando o servidor real (uvicorn + broker embarcado)"""
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+uvicorn = pytest.importorskip("uvicorn")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ['TRANSPORT'] = 'embedded'
+for path in (os.path.join(ROOT, 'api_gateway'), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from main import app  # noqa: E402
+from shared.embedded_queue import get_broker  # noqa: E402
+
+ITEMS = 3000
+
+
+@pytest.fixture(scope="module")
+def gateway():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert server.started, "uvicorn não iniciou"
+    yield sock.getsockname()[1]
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+def wait_ready(port):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        connection.request("GET", "/health/ready")
+        if connection.getresponse().status == 200:
+            return
+        time.sleep(0.05)
+    pytest.fail("gateway não ficou pronto")
+
+
+def queued():
+    broker = get_broker()
+    with broker.lock:
+        return sum(len(queue) for queue in broker.queues.values())
+
+
+def test_ndjson_stream_publishes_every_item(gateway):
+    wait_ready(gateway)
+    before = queued()
+    body = "".join(
+        json.dumps({"to": f"user{i}@example.com", "subject": "lote", "body": "oi"}) + "\n"
+        for i in range(ITEMS)
+    ).encode()
+
+    connection = http.client.HTTPConnection("127.0.0.1", gateway, timeout=30)
+    connection.request(
+        "POST", "/notify/email/batch?stream=true", body=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    response = connection.getresponse()
+    lines = [json.loads(line) for line in response.read().splitlines() if line.strip()]
+
+    assert response.status == 202
+    assert response.getheader("content-type").startswith("application/x-ndjson")
+    assert [line["index"] for line in lines] == list(range(ITEMS))
+    assert all(line["status"] == "accepted" for line in lines)
+    assert queued() - before == ITEMS
@@ -0,0 +1,41 @@
+"""Log em segmentos: compactação disparada pela troca de segmento no meio de uma gravação"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.segment_log import Properties, SegmentLog  # noqa: E402
+
+
+@pytest.mark.parametrize("rewrite_ratio", [0.0, 0.25, 0.5])
+@pytest.mark.parametrize("seed", range(20))
+def test_compaction_during_roll_keeps_pending_messages(tmp_path, rewrite_ratio, seed):
+    rng = random.Random(seed)
+    log = SegmentLog(str(tmp_path), segment_size=1024, fsync='never', rewrite_ratio=rewrite_ratio)
+    log.recover()
+    pending = {}
+    for message_id in range(1, 600):
+        body = os.urandom(rng.randint(0, 120))
+        log.append_publish(message_id, 'queue_email', Properties(message_id=str(message_id)), body)
+        pending[message_id] = body
+        # Acks fora de ordem, com algumas mensagens de vida longa prendendo segmentos antigos
+        for acked in rng.sample(sorted(pending), k=min(len(pending), rng.randint(0, 2))):
+            if acked % 7:
+                log.append_ack(acked)
+                del pending[acked]
+    for message_id, body in pending.items():
+        assert log.read_message(message_id)[2] == body
+    log.close()
+
+    reopened = SegmentLog(str(tmp_path), segment_size=1024, fsync='never', rewrite_ratio=rewrite_ratio)
+    recovered = reopened.recover()
+    assert [message_id for message_id, *_ in recovered] == sorted(pending)
+    for message_id, queue, properties, location in recovered:
+        assert queue == 'queue_email' and properties.message_id == str(message_id)
+        # A posição devolvida já reflete a compactação da reabertura
+        assert reopened.read(location)[2] == pending[message_id]
+        assert reopened.read_message(message_id)[2] == pending[message_id]
+    reopened.close()